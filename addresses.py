@@ -0,0 +1,75 @@
+# addresses.py - Village/city/state parsed from patients.address once, at write time, for address_analytics
+import re
+import sqlite3
+import sys
+
+import rollups
+from schema_migrations import add_missing_columns, columns, update_in_batches
+
+COLUMNS = [("address_village", "TEXT"), ("address_city", "TEXT"), ("address_state", "TEXT")]
+_STATE_END = re.compile(r"\bIndia\b| - ")
+
+
+def parse(address):
+    """(village, city, state) from an add_patient "village, city, state, India - pin" address
+
+    Addresses with fewer than three comma-separated parts give Nones, as do empty parts
+    """
+    parts = [part.strip() for part in (address or "").split(",")]
+    if len(parts) < 3:
+        return None, None, None
+    # "Maharashtra India - 411045" when the country was typed without a comma
+    state = _STATE_END.split(parts[2])[0].strip()
+    return parts[0] or None, parts[1] or None, state or None
+
+
+def ensure_schema(conn):
+    """Parsed columns and the location rollup triggers; True when the columns were just added"""
+    existing = columns(conn, "patients")
+    if "address" not in existing:
+        return False
+    added = not {column for column, _ in COLUMNS} <= existing
+    add_missing_columns(conn, "patients", COLUMNS)
+    rollups.ensure_schema(conn.cursor(), only=("patient_locations",))
+    return added
+
+
+def _part(index):
+    return lambda address: parse(address)[index]
+
+
+def backfill(conn):
+    """Parse every address that has no parsed columns yet, one committed rowid range at a time
+
+    The rollup triggers count each row as it is filled in, so the location counts stay correct
+    while the backfill runs
+    """
+    for index, (column, _) in enumerate(COLUMNS):
+        conn.create_function(f"{column}_of", 1, _part(index), deterministic=True)
+    return update_in_batches(conn, "patients", """
+        UPDATE patients SET address_village = address_village_of(address),
+            address_city = address_city_of(address), address_state = address_state_of(address)
+        WHERE rowid BETWEEN ? AND ? AND address_village IS NULL AND address LIKE '%,%,%'
+    """)
+
+
+def migrate(conn):
+    """Add and backfill the parsed columns on a database that predates them; a no-op afterwards"""
+    if not ensure_schema(conn):
+        return False
+    conn.commit()
+    backfill(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    rollups.rebuild(conn.cursor(), only=("patient_locations",))
+    conn.commit()
+    return True
+
+
+if __name__ == "__main__":
+    # Usage: python addresses.py [database]  - parse addresses written without the columns (imports, fake data)
+    database = sys.argv[1] if len(sys.argv) > 1 else "dental_clinic.db"
+    conn = sqlite3.connect(database)
+    if not migrate(conn):
+        backfill(conn)
+    conn.close()
+    print(f"✅ Parsed addresses in {database}; location counts are up to date")
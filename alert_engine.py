@@ -0,0 +1,452 @@
+# alert_engine.py - Incremental smart_alerts rules over new revenue, visit, feedback and appointment rows
+import argparse
+import json
+import math
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+BATCH_SIZE = 5000
+# Trailing averages are exponentially weighted, so a clinic's state is a few numbers, not its history
+TRAILING_ALPHA = 0.1
+MIN_HISTORY_DAYS = 14
+# Revenue for a day is final once the clinic has a transaction LATE_DAYS newer, or LATE_DAYS have passed
+LATE_DAYS = 2
+REVENUE_DROP = 0.5
+# Days without a transaction are closed days (a weekly holiday, a long weekend), not bad days; this many
+# in a row is an outage, alerted once when it is reached
+OUTAGE_DAYS = 4
+FAST_ALPHA, SLOW_ALPHA = 0.1, 0.02
+MIN_RATINGS = 30
+SATISFACTION_DIP = 0.8
+LOW_RATING = 1
+MIN_APPOINTMENTS = 5
+NO_SHOW_SPIKE = 2.0
+# With a handful of appointments a day, 2 of 6 missed is routine; a spike must also be this unlikely
+# under the clinic's trailing rate (exact binomial tail)
+NO_SHOW_P = 0.001
+# Daily no-show rates are noisy, so their trailing rate averages over a longer span than revenue
+NO_SHOW_ALPHA = 0.05
+
+STATE_TABLES = (
+    # Last row consumed per source: an id, or [date, id] for appointments; REVENUE_CLOSED holds the
+    # calendar horizon revenue days were last closed up to
+    '''CREATE TABLE IF NOT EXISTS alert_watermarks (
+        source TEXT PRIMARY KEY,
+        position TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS alert_state (
+        clinic_id INTEGER NOT NULL,
+        rule TEXT NOT NULL,
+        state TEXT NOT NULL,
+        PRIMARY KEY (clinic_id, rule)
+    ) WITHOUT ROWID''',
+)
+REVENUE_CLOSED = "revenue_analytics:closed"
+DEDUPE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_smart_alerts_dedupe ON smart_alerts (clinic_id, dedupe_key)"
+APPOINTMENT_DATE_INDEX = "CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (appointment_date)"
+
+
+def _day(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def _binomial_tail(k, n, p):
+    """P(X >= k) for X ~ Binomial(n, p)"""
+    return sum(math.comb(n, i) * p ** i * (1 - p) ** (n - i) for i in range(k, n + 1))
+
+
+class RevenueDrop:
+    """A finished day's revenue below REVENUE_DROP of the clinic's trailing daily average, or OUTAGE_DAYS without any
+
+    The trailing average covers trading days only, so regular closed days neither alert nor drag it down
+    """
+
+    name = "revenue_drop"
+    stateful = True
+
+    def initial(self):
+        return {"open": {}, "newest": None, "closed_through": None, "trailing": None, "days": 0, "late": 0,
+                "gap_start": None, "gap_days": 0}
+
+    def update(self, state, row):
+        row_id, clinic_id, when, amount = row
+        day = _day(when)
+        if day is None:
+            return []
+        key = day.isoformat()
+        if state["closed_through"] and key <= state["closed_through"]:
+            # The day was already judged; without its history it cannot be reopened
+            state["late"] += 1
+            return []
+        state["open"][key] = state["open"].get(key, 0.0) + (amount or 0.0)
+        if state["newest"] is not None and key <= state["newest"]:
+            return []
+        state["newest"] = key
+        return self._close(state, clinic_id, day - timedelta(days=LATE_DAYS))
+
+    def close(self, state, clinic_id, today):
+        """Judge the days that are over by the calendar, for clinics without a newer transaction"""
+        return self._close(state, clinic_id, today - timedelta(days=LATE_DAYS))
+
+    def _close(self, state, clinic_id, horizon):
+        """Judge every calendar day before horizon in order; days without transactions only count towards an outage"""
+        if state["closed_through"]:
+            day = date.fromisoformat(state["closed_through"]) + timedelta(days=1)
+        elif state["open"]:
+            day = date.fromisoformat(min(state["open"]))
+        else:
+            return []
+        alerts = []
+        while day < horizon:
+            closing = day.isoformat()
+            value = state["open"].pop(closing, None)
+            day += timedelta(days=1)
+            state["closed_through"] = closing
+            if value is None:
+                alerts.extend(self._gap(state, clinic_id, closing))
+                continue
+            state["gap_start"], state["gap_days"] = None, 0
+            trailing = state["trailing"]
+            if state["days"] >= MIN_HISTORY_DAYS and trailing and value < REVENUE_DROP * trailing:
+                alerts.append((clinic_id, "Revenue Drop",
+                               f"Revenue on {closing} was ₹{value:,.0f}, {1 - value / trailing:.0%} below the ₹{trailing:,.0f} daily average",
+                               "High", None, f"{self.name}:{closing}"))
+            state["trailing"] = value if trailing is None else TRAILING_ALPHA * value + (1 - TRAILING_ALPHA) * trailing
+            state["days"] += 1
+        return alerts
+
+    def _gap(self, state, clinic_id, closing):
+        # States saved before outages were tracked have no gap keys yet
+        if not state.get("gap_days"):
+            state["gap_start"], state["gap_days"] = closing, 0
+        state["gap_days"] += 1
+        if state["days"] < MIN_HISTORY_DAYS or state["gap_days"] != OUTAGE_DAYS:
+            return []
+        # Keyed by the first missing day: one alert per outage however long it lasts
+        return [(clinic_id, "Revenue Drop",
+                 f"No revenue since {state['gap_start']} ({OUTAGE_DAYS} days without a transaction)",
+                 "High", None, f"{self.name}:outage:{state['gap_start']}")]
+
+
+class SatisfactionDip:
+    """Recent ratings (fast average) falling SATISFACTION_DIP points below the long-run (slow) average"""
+
+    name = "satisfaction_dip"
+    stateful = True
+
+    def initial(self):
+        return {"fast": None, "slow": None, "ratings": 0, "alerted_week": None}
+
+    def update(self, state, row):
+        row_id, clinic_id, patient_id, when, rating = row
+        if rating is None or rating == "":
+            return []
+        rating = float(rating)
+        state["fast"] = rating if state["fast"] is None else FAST_ALPHA * rating + (1 - FAST_ALPHA) * state["fast"]
+        state["slow"] = rating if state["slow"] is None else SLOW_ALPHA * rating + (1 - SLOW_ALPHA) * state["slow"]
+        state["ratings"] += 1
+        if state["ratings"] < MIN_RATINGS or state["slow"] - state["fast"] < SATISFACTION_DIP:
+            return []
+        year, week, _ = (_day(when) or date.today()).isocalendar()
+        week = f"{year}-W{week:02d}"
+        # A dip usually lasts; one alert per clinic per week is enough
+        if state["alerted_week"] == week:
+            return []
+        state["alerted_week"] = week
+        return [(clinic_id, "Satisfaction Dip",
+                 f"Recent ratings average {state['fast']:.1f}/5 against a usual {state['slow']:.1f}/5",
+                 "Medium", None, f"{self.name}:{week}")]
+
+
+class LowRating:
+    """Threshold rule: a single rating of LOW_RATING or less"""
+
+    name = "low_rating"
+    stateful = False
+
+    def __init__(self, source):
+        self.source = source
+
+    def update(self, state, row):
+        row_id, clinic_id, patient_id, when, rating = row
+        if rating is None or rating == "" or float(rating) > LOW_RATING:
+            return []
+        return [(clinic_id, "Low Rating", f"Patient #{patient_id} rated their visit {rating}/5 - follow up",
+                 "Medium", patient_id, f"{self.name}:{self.source}:{row_id}")]
+
+
+class NoShowSpike:
+    """A day's no-show rate at NO_SHOW_SPIKE times the trailing rate, and improbable at that rate"""
+
+    name = "no_show_spike"
+    stateful = True
+
+    def initial(self):
+        return {"day": None, "appointments": 0, "no_shows": 0, "trailing": None, "days": 0}
+
+    def _close(self, state, clinic_id):
+        total, missed = state["appointments"], state["no_shows"]
+        rate = missed / total
+        trailing = state["trailing"]
+        alerts = []
+        if (state["days"] >= MIN_HISTORY_DAYS and total >= MIN_APPOINTMENTS and trailing is not None
+                and rate >= trailing * NO_SHOW_SPIKE
+                and _binomial_tail(missed, total, max(trailing, 0.01)) < NO_SHOW_P):
+            alerts.append((clinic_id, "No-show Spike",
+                           f"{missed} of {total} appointments on {state['day']} were no-shows ({rate:.0%} vs {trailing:.0%} usual)",
+                           "High", None, f"{self.name}:{state['day']}"))
+        state["trailing"] = rate if trailing is None else NO_SHOW_ALPHA * rate + (1 - NO_SHOW_ALPHA) * trailing
+        state["days"] += 1
+        return alerts
+
+    def update(self, state, row):
+        row_id, clinic_id, when, no_show = row
+        day = _day(when)
+        if day is None:
+            return []
+        # Appointments are read in date order, so a new day means the previous one is complete
+        alerts = []
+        if state["day"] != day.isoformat():
+            if state["day"] and state["appointments"]:
+                alerts = self._close(state, clinic_id)
+            state.update(day=day.isoformat(), appointments=0, no_shows=0)
+        state["appointments"] += 1
+        state["no_shows"] += bool(no_show)
+        return alerts
+
+
+# source -> (required columns, SELECT after the watermark, rules fed each row)
+SOURCES = {
+    "revenue_analytics": (
+        ("clinic_id", "transaction_date", "final_amount"),
+        "SELECT id, clinic_id, transaction_date, final_amount FROM revenue_analytics WHERE id > ? ORDER BY id LIMIT ?",
+        (RevenueDrop(),),
+    ),
+    "patient_analytics": (
+        ("clinic_id", "patient_id", "visit_date", "satisfaction_rating"),
+        "SELECT id, clinic_id, patient_id, visit_date, satisfaction_rating FROM patient_analytics WHERE id > ? ORDER BY id LIMIT ?",
+        (SatisfactionDip(), LowRating("visit")),
+    ),
+    "patient_feedback": (
+        ("clinic_id", "patient_id", "feedback_date", "rating"),
+        "SELECT id, clinic_id, patient_id, feedback_date, rating FROM patient_feedback WHERE id > ? ORDER BY id LIMIT ?",
+        (SatisfactionDip(), LowRating("feedback")),
+    ),
+    # no_show is set after the visit, so appointments are read by date once the day has passed
+    "appointments": (
+        ("clinic_id", "appointment_date", "no_show"),
+        """SELECT id, clinic_id, appointment_date, no_show FROM appointments
+           WHERE (appointment_date, id) > (?, ?) AND appointment_date < ?
+           ORDER BY appointment_date, id LIMIT ?""",
+        (NoShowSpike(),),
+    ),
+}
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def ensure_schema(cursor):
+    """State tables plus the smart_alerts dedupe key; returns the sources this schema can feed"""
+    for statement in STATE_TABLES:
+        cursor.execute(statement)
+    if "dedupe_key" not in _columns(cursor, "smart_alerts"):
+        cursor.execute("ALTER TABLE smart_alerts ADD COLUMN dedupe_key TEXT")
+    cursor.execute(DEDUPE_INDEX)
+    sources = [source for source, (needed, _, _) in SOURCES.items() if set(needed) <= _columns(cursor, source)]
+    if "appointments" in sources:
+        # Serves the (appointment_date, id) keyset read across all clinics
+        cursor.execute(APPOINTMENT_DATE_INDEX)
+    return sources
+
+
+class AlertWriter:
+    """INSERT OR IGNORE into whichever smart_alerts layout this database has"""
+
+    def __init__(self, cursor):
+        columns = _columns(cursor, "smart_alerts")
+        # simple_clinic.db calls it severity, dental_clinic.db severity_level
+        severity = "severity" if "severity" in columns else "severity_level"
+        names = ["clinic_id", "alert_type", "alert_message", severity, "dedupe_key"]
+        self.patient = "related_patient_id" in columns
+        if self.patient:
+            names.append("related_patient_id")
+        self.action = "action_required" in columns
+        if self.action:
+            names.append("action_required")
+        self.sql = f"INSERT OR IGNORE INTO smart_alerts ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+    def write(self, cursor, alerts):
+        rows = []
+        for clinic_id, alert_type, message, severity, patient_id, key in alerts:
+            row = [clinic_id, alert_type, message, severity, key]
+            if self.patient:
+                row.append(patient_id)
+            if self.action:
+                row.append(int(severity == "High"))
+            rows.append(row)
+        before = cursor.connection.total_changes
+        cursor.executemany(self.sql, rows)
+        return cursor.connection.total_changes - before
+
+
+def _watermark(cursor, source):
+    cursor.execute("SELECT position FROM alert_watermarks WHERE source = ?", (source,))
+    row = cursor.fetchone()
+    if row:
+        return json.loads(row[0])
+    return ["", 0] if source == "appointments" else 0
+
+
+def _load_state(cursor, rules, clinic_ids):
+    state = {}
+    clinic_ids = list(clinic_ids)
+    names = [rule.name for rule in rules]
+    # Chunked IN lists stay under SQLite's bound-parameter limit
+    for start in range(0, len(clinic_ids), 500):
+        chunk = clinic_ids[start:start + 500]
+        cursor.execute(f"""SELECT clinic_id, rule, state FROM alert_state
+            WHERE rule IN ({', '.join('?' * len(names))}) AND clinic_id IN ({', '.join('?' * len(chunk))})""",
+                       (*names, *chunk))
+        for clinic_id, rule, encoded in cursor.fetchall():
+            state[(clinic_id, rule)] = json.loads(encoded)
+    return state
+
+
+def process_batch(conn, source, writer, batch_size=BATCH_SIZE, now=None):
+    """Feed the next batch of one source's rows through its rules; (rows read, alerts raised)"""
+    _, sql, rules = SOURCES[source]
+    cursor = conn.cursor()
+    position = _watermark(cursor, source)
+    if source == "appointments":
+        today = (now or datetime.now()).strftime("%Y-%m-%d")
+        cursor.execute(sql, (position[0], position[1], today, batch_size))
+    else:
+        cursor.execute(sql, (position, batch_size))
+    rows = cursor.fetchall()
+    if not rows:
+        return 0, 0
+
+    state = _load_state(cursor, [rule for rule in rules if rule.stateful], {row[1] for row in rows})
+    touched = set()
+    alerts = []
+    for row in rows:
+        clinic_id = row[1]
+        if clinic_id is None:
+            continue
+        for rule in rules:
+            if not rule.stateful:
+                alerts.extend(rule.update(None, row))
+                continue
+            key = (clinic_id, rule.name)
+            if key not in state:
+                state[key] = rule.initial()
+            alerts.extend(rule.update(state[key], row))
+            touched.add(key)
+
+    last = rows[-1]
+    position = [last[2], last[0]] if source == "appointments" else last[0]
+    # Alerts, rule state and the watermark commit together: a crash replays the batch, the dedupe key absorbs it
+    raised = writer.write(cursor, alerts)
+    cursor.executemany("INSERT OR REPLACE INTO alert_state (clinic_id, rule, state) VALUES (?, ?, ?)",
+                       [(clinic_id, rule, json.dumps(state[(clinic_id, rule)])) for clinic_id, rule in touched])
+    cursor.execute("INSERT OR REPLACE INTO alert_watermarks (source, position) VALUES (?, ?)",
+                   (source, json.dumps(position)))
+    conn.commit()
+    return len(rows), raised
+
+
+def close_revenue_days(conn, writer, now=None):
+    """Judge revenue days by the calendar, so a clinic that stopped taking payments is still evaluated
+
+    Runs after the revenue rows are consumed; returns the alerts raised. Once per calendar day: the
+    horizon it closed up to is kept with the watermarks
+    """
+    rule = SOURCES["revenue_analytics"][2][0]
+    today = _day(now or datetime.now())
+    horizon = (today - timedelta(days=LATE_DAYS)).isoformat()
+    cursor = conn.cursor()
+    if _watermark(cursor, REVENUE_CLOSED) == horizon:
+        return 0
+    cursor.execute("SELECT clinic_id, state FROM alert_state WHERE rule = ?", (rule.name,))
+    alerts, changed = [], []
+    for clinic_id, encoded in cursor.fetchall():
+        state = json.loads(encoded)
+        if state["closed_through"] and state["closed_through"] >= horizon:
+            continue
+        closed_through = state["closed_through"]
+        alerts.extend(rule.close(state, clinic_id, today))
+        if state["closed_through"] != closed_through:
+            changed.append((clinic_id, rule.name, json.dumps(state)))
+    raised = writer.write(cursor, alerts)
+    cursor.executemany("INSERT OR REPLACE INTO alert_state (clinic_id, rule, state) VALUES (?, ?, ?)", changed)
+    cursor.execute("INSERT OR REPLACE INTO alert_watermarks (source, position) VALUES (?, ?)",
+                   (REVENUE_CLOSED, json.dumps(horizon)))
+    conn.commit()
+    return raised
+
+
+def process(conn, batch_size=BATCH_SIZE, now=None):
+    """Consume everything new since the last run, then close revenue days by date; returns {source: (rows, alerts)}"""
+    cursor = conn.cursor()
+    sources = ensure_schema(cursor)
+    conn.commit()
+    writer = AlertWriter(cursor)
+    totals = {}
+    for source in sources:
+        rows = raised = 0
+        while True:
+            batch_rows, batch_alerts = process_batch(conn, source, writer, batch_size, now)
+            if not batch_rows:
+                break
+            rows += batch_rows
+            raised += batch_alerts
+        if source == "revenue_analytics":
+            raised += close_revenue_days(conn, writer, now)
+        totals[source] = (rows, raised)
+    return totals
+
+
+def skip_history(conn):
+    """Start from the current end of every source, for databases whose history should not raise alerts"""
+    cursor = conn.cursor()
+    for source in ensure_schema(cursor):
+        if source == "appointments":
+            cursor.execute("SELECT appointment_date, id FROM appointments ORDER BY appointment_date DESC, id DESC LIMIT 1")
+            row = cursor.fetchone()
+            position = list(row) if row else ["", 0]
+        else:
+            position = cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {source}").fetchone()[0]
+        cursor.execute("INSERT OR REPLACE INTO alert_watermarks (source, position) VALUES (?, ?)",
+                       (source, json.dumps(position)))
+    conn.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raise smart_alerts from rows added since the last run")
+    parser.add_argument("database", nargs="?", default="simple_clinic.db")
+    parser.add_argument("--follow", type=float, metavar="SECONDS", help="keep running, polling every SECONDS")
+    parser.add_argument("--skip-history", action="store_true", help="mark existing rows as seen without evaluating them")
+    options = parser.parse_args()
+    conn = sqlite3.connect(options.database, timeout=30)
+    if options.skip_history:
+        skip_history(conn)
+        print(f"⏭️ Existing rows in {options.database} marked as seen")
+    while True:
+        started = time.perf_counter()
+        totals = process(conn)
+        rows = sum(r for r, _ in totals.values())
+        # Quiet follow passes stay silent, unless closing revenue days by date raised something
+        if rows or sum(a for _, a in totals.values()) or not options.follow:
+            summary = ", ".join(f"{source} {r} rows/{a} alerts" for source, (r, a) in totals.items())
+            print(f"🔔 {summary or 'no source tables'} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        if not options.follow:
+            break
+        time.sleep(options.follow)
+    conn.close()
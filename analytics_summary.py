@@ -0,0 +1,215 @@
+# analytics_summary.py - Every advanced_analytics metric from one scan of patients and one of patient_analytics
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import rollups
+
+# Round trips clinic_summary and address_summary each make; keep it at two as metrics are added
+QUERY_COUNT = 2
+
+
+@dataclass
+class DoctorStats:
+    name: str
+    visits: int = 0
+    revenue: float = 0.0
+    avg_rating: float = 0.0
+
+
+@dataclass
+class DiagnosisStats:
+    diagnosis: str
+    frequency: int = 0
+    avg_cost: float = 0.0
+    success_rate: float = 0.0
+    satisfaction: float = 0.0
+
+
+@dataclass
+class ClinicSummary:
+    # patients
+    total_patients: int = 0
+    avg_age: float = 0.0
+    gender: Dict[str, int] = field(default_factory=dict)
+    treatments: List[Tuple[str, int]] = field(default_factory=list)
+    returning_patients: int = 0
+    avg_visits_per_patient: float = 0.0
+    avg_spent_per_patient: float = 0.0
+    # patient_analytics
+    total_visits: int = 0
+    total_revenue: float = 0.0
+    avg_cost: float = 0.0
+    avg_rating: float = 0.0
+    avg_satisfaction: float = 0.0
+    doctors: List[DoctorStats] = field(default_factory=list)
+    monthly_revenue: List[Tuple[str, float]] = field(default_factory=list)
+    diagnoses: List[DiagnosisStats] = field(default_factory=list)
+
+    @property
+    def retention_rate(self):
+        return self.returning_patients / self.total_patients * 100 if self.total_patients else 0.0
+
+
+class _Acc:
+    """Running sums for one bucket; averages are derived at the end"""
+
+    __slots__ = ("rows", "cost", "cost_n", "positive_cost", "positive_cost_n",
+                 "rating", "rating_n", "positive_rating", "positive_rating_n", "success", "success_n")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def add(self, row):
+        for name, value in zip(self.__slots__, row):
+            setattr(self, name, getattr(self, name) + (value or 0))
+
+
+def _avg(total, count):
+    return total / count if count else 0.0
+
+
+def _patient_pass(cursor, clinic_id, extended):
+    # Grouping by both dimensions lets one scan feed the gender and the treatment breakdowns
+    retention = """,
+            SUM(total_visits > 1), TOTAL(total_visits), COUNT(total_visits),
+            TOTAL(total_spent), COUNT(total_spent)""" if extended else ""
+    cursor.execute(f"""
+        SELECT sex, treatment, COUNT(*),
+            TOTAL(CASE WHEN age IS NOT NULL AND age != '' THEN CAST(age AS INTEGER) END),
+            SUM(age IS NOT NULL AND age != ''){retention}
+        FROM patients WHERE clinic_id = ?
+        GROUP BY sex, treatment
+    """, (clinic_id,))
+    return cursor.fetchall()
+
+
+def _visit_pass(cursor, clinic_id, extended):
+    success = "TOTAL(treatment_success_rate), COUNT(treatment_success_rate)" if extended else "0, 0"
+    cursor.execute(f"""
+        SELECT doctor_assigned, strftime('%Y-%m', visit_date), diagnosis,
+            COUNT(*), TOTAL(treatment_cost), COUNT(treatment_cost),
+            TOTAL(CASE WHEN treatment_cost > 0 THEN treatment_cost END), SUM(treatment_cost > 0),
+            TOTAL(satisfaction_rating), COUNT(satisfaction_rating),
+            TOTAL(CASE WHEN satisfaction_rating > 0 THEN satisfaction_rating END), SUM(satisfaction_rating > 0),
+            {success}
+        FROM patient_analytics WHERE clinic_id = ?
+        GROUP BY 1, 2, 3
+    """, (clinic_id,))
+    return cursor.fetchall()
+
+
+def clinic_summary(cursor, clinic_id, extended=False, treatments=5, months=6, diagnoses=10):
+    """Dashboard metrics for one clinic in QUERY_COUNT round trips
+
+    extended=True also reads the simple_clinic.db-only columns (total_visits, total_spent,
+    treatment_success_rate) for retention and diagnosis success rates
+    """
+    summary = ClinicSummary()
+
+    age_total = age_count = visits_total = visits_n = spent_total = spent_n = 0
+    treatment_counts = {}
+    for row in _patient_pass(cursor, clinic_id, extended):
+        sex, treatment, count, ages, aged = row[:5]
+        summary.total_patients += count
+        age_total += ages
+        age_count += aged or 0
+        if sex:
+            summary.gender[sex] = summary.gender.get(sex, 0) + count
+        if treatment:
+            treatment_counts[treatment] = treatment_counts.get(treatment, 0) + count
+        if extended:
+            returning, visits, visits_count, spent, spent_count = row[5:]
+            summary.returning_patients += returning or 0
+            visits_total += visits
+            visits_n += visits_count
+            spent_total += spent
+            spent_n += spent_count
+    summary.avg_age = _avg(age_total, age_count)
+    summary.avg_visits_per_patient = _avg(visits_total, visits_n)
+    summary.avg_spent_per_patient = _avg(spent_total, spent_n)
+    summary.treatments = sorted(treatment_counts.items(), key=lambda item: -item[1])[:treatments]
+
+    overall = _Acc()
+    by_doctor = {}
+    by_month = {}
+    by_diagnosis = {}
+    for row in _visit_pass(cursor, clinic_id, extended):
+        doctor, month, diagnosis, sums = row[0], row[1], row[2], row[3:]
+        overall.add(sums)
+        if doctor is not None:
+            by_doctor.setdefault(doctor, _Acc()).add(sums)
+        if month is not None:
+            by_month.setdefault(month, _Acc()).add(sums)
+        if diagnosis:
+            by_diagnosis.setdefault(diagnosis, _Acc()).add(sums)
+
+    summary.total_visits = overall.rows
+    summary.total_revenue = overall.cost
+    summary.avg_cost = _avg(overall.positive_cost, overall.positive_cost_n)
+    summary.avg_rating = _avg(overall.positive_rating, overall.positive_rating_n)
+    summary.avg_satisfaction = _avg(overall.rating, overall.rating_n)
+    summary.doctors = [
+        DoctorStats(name, acc.rows, acc.cost, _avg(acc.rating, acc.rating_n))
+        for name, acc in sorted(by_doctor.items())
+    ]
+    summary.monthly_revenue = [
+        (month, acc.positive_cost) for month, acc in sorted(by_month.items(), reverse=True) if acc.positive_cost_n
+    ][:months]
+    summary.diagnoses = sorted(
+        (DiagnosisStats(name, acc.rows, _avg(acc.cost, acc.cost_n), _avg(acc.success, acc.success_n),
+                        _avg(acc.rating, acc.rating_n))
+         for name, acc in by_diagnosis.items()),
+        key=lambda d: -d.frequency,
+    )[:diagnoses]
+    return summary
+
+
+
+@dataclass
+class LocationStats:
+    location: str
+    patients: int = 0
+    avg_cost: float = 0.0
+    avg_rating: float = 0.0
+
+
+@dataclass
+class AddressSummary:
+    patients_with_address: int = 0
+    village_count: int = 0
+    city_count: int = 0
+    state_count: int = 0
+    top_villages: List[Tuple[str, int]] = field(default_factory=list)
+    top_cities: List[Tuple[str, int]] = field(default_factory=list)
+    top_states: List[Tuple[str, int]] = field(default_factory=list)
+    locations: List[LocationStats] = field(default_factory=list)
+
+
+def address_summary(cursor, clinic_id, top=10, locations=15):
+    """address_analytics figures for one clinic in QUERY_COUNT round trips: the location rollup, then the busiest villages"""
+    summary = AddressSummary()
+    summary.patients_with_address, levels = rollups.location_overview(cursor, clinic_id, max(top, locations))
+    summary.village_count, busiest = levels["village"]
+    summary.city_count, cities = levels["city"]
+    summary.state_count, states = levels["state"]
+    summary.top_villages = busiest[:top]
+    summary.top_cities = cities[:top]
+    summary.top_states = states[:top]
+
+    # Visit averages for the busiest villages only: an index range per village, not the clinic's whole history
+    villages = [village for village, _ in busiest[:locations]]
+    if villages:
+        cursor.execute(f"""
+            SELECT p.address_village, COUNT(DISTINCT p.id), AVG(pa.treatment_cost), AVG(pa.satisfaction_rating)
+            FROM patients p
+            LEFT JOIN patient_analytics pa ON pa.patient_id = p.id
+            WHERE p.clinic_id = ? AND p.address_village IN ({", ".join("?" * len(villages))})
+            GROUP BY p.address_village
+            ORDER BY COUNT(DISTINCT p.id) DESC, p.address_village
+        """, (clinic_id, *villages))
+        summary.locations = [
+            LocationStats(village, count, avg_cost or 0.0, avg_rating or 0.0)
+            for village, count, avg_cost, avg_rating in cursor.fetchall()
+        ]
+    return summary
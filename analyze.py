@@ -1,50 +1,101 @@
 # analyze.py
+import argparse
 import sqlite3
+from collections import Counter
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import snapshot_export
 
 DB = "dental.db"
+# The only patient columns the charts use; the Parquet snapshot reads just these
+PATIENT_COLUMNS = ['clinic_id', 'treatment_type', 'age']
+# Fixed 10-year bins, so chunk histograms add up to the whole-table one
+AGE_BINS = np.arange(0, 130, 10)
+CHUNK_SIZE = 50000
 
 def load_tables():
     conn = sqlite3.connect(DB)
     clinics = pd.read_sql("SELECT id, clinic_code, name, location FROM clinics", conn)
-    patients = pd.read_sql("SELECT * FROM patients", conn, parse_dates=['created_at','dob'])
+    if snapshot_export.available():
+        # Appends only rows added or edited since the last run, then reads the columnar files
+        snapshot_export.refresh(conn)
+        patients = snapshot_export.read("patients", PATIENT_COLUMNS)
+    else:
+        print("⚠️ pyarrow is not installed; reading patients from the database")
+        patients = pd.read_sql(f"SELECT {', '.join(PATIENT_COLUMNS)} FROM patients", conn)
     conn.close()
     return clinics, patients
 
-def top_clinics(patients, clinics, n=10):
-    counts = patients.groupby('clinic_id').size().reset_index(name='count').merge(clinics, left_on='clinic_id', right_on='id', how='left')
-    top = counts.sort_values('count', ascending=False).head(n)
+def aggregate(patients):
+    """(patients per clinic, patients per treatment, age histogram over AGE_BINS) of a frame or chunk"""
+    ages = pd.to_numeric(patients['age'], errors='coerce').dropna().astype('float64')
+    return (Counter(patients['clinic_id'].value_counts().to_dict()),
+            Counter(patients['treatment_type'].value_counts().to_dict()),
+            np.histogram(ages, bins=AGE_BINS)[0])
+
+def stream_aggregates(chunksize=CHUNK_SIZE):
+    """aggregate() folded over the patients table chunksize rows at a time; memory does not grow with the table"""
+    conn = sqlite3.connect(DB)
+    clinics = pd.read_sql("SELECT id, clinic_code, name, location FROM clinics", conn)
+    clinic_counts, treatments, ages = Counter(), Counter(), np.zeros(len(AGE_BINS) - 1, dtype=np.int64)
+    for chunk in pd.read_sql(f"SELECT {', '.join(PATIENT_COLUMNS)} FROM patients", conn, chunksize=chunksize):
+        chunk_clinics, chunk_treatments, chunk_ages = aggregate(chunk)
+        clinic_counts.update(chunk_clinics)
+        treatments.update(chunk_treatments)
+        ages += chunk_ages
+    conn.close()
+    return clinics, (clinic_counts, treatments, ages)
+
+def _ranked(counter):
+    # Highest count first, ties by key, so both modes draw bars and slices in the same order
+    return sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+
+def top_clinics(clinic_counts, clinics, n=10):
+    counts = pd.DataFrame(_ranked(clinic_counts), columns=['clinic_id', 'count'])
+    top = counts.head(n).merge(clinics, left_on='clinic_id', right_on='id', how='left')
     top.plot.bar(x='clinic_code', y='count', legend=False)
     plt.title('Top Clinics by Patients')
     plt.tight_layout()
     plt.savefig('top_clinics.png')
+    plt.close()
     print("Saved top_clinics.png")
 
-def treatment_distribution(patients):
-    t = patients['treatment_type'].value_counts()
+def treatment_distribution(treatments):
+    t = pd.Series(dict(_ranked(treatments)))
+    plt.figure()
     t.plot.pie(autopct='%1.1f%%')
     plt.title('Treatment distribution')
     plt.ylabel('')
     plt.tight_layout()
     plt.savefig('treatment_dist.png')
+    plt.close()
     print("Saved treatment_dist.png")
 
-def age_hist(patients):
-    patients['age'] = pd.to_numeric(patients['age'], errors='coerce')
-    patients['age'].dropna().plot.hist(bins=12)
+def age_hist(ages):
+    plt.figure()
+    plt.hist(AGE_BINS[:-1], bins=AGE_BINS, weights=ages)
     plt.title('Age distribution')
     plt.xlabel('Age')
     plt.tight_layout()
     plt.savefig('age_dist.png')
+    plt.close()
     print("Saved age_dist.png")
 
 if __name__ == "__main__":
-    clinics, patients = load_tables()
-    if patients.empty:
+    parser = argparse.ArgumentParser(description="Clinic, treatment and age charts")
+    parser.add_argument("--stream", action="store_true", help="fold the patients table in chunks instead of loading it")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    options = parser.parse_args()
+    if options.stream:
+        clinics, (clinic_counts, treatments, ages) = stream_aggregates(options.chunksize)
+    else:
+        clinics, patients = load_tables()
+        clinic_counts, treatments, ages = aggregate(patients)
+    if not clinic_counts:
         print("No patients found. Run seed_data.py or add patients.")
     else:
-        top_clinics(patients, clinics)
-        treatment_distribution(patients)
-        age_hist(patients)
+        top_clinics(clinic_counts, clinics)
+        treatment_distribution(treatments)
+        age_hist(ages)
         print("Analysis done. Check PNG files.")
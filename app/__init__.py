@@ -1,10 +1,15 @@
 # app/__init__.py
 import os
+from importlib import import_module
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
+import sql_metrics
+import metrics
+import sequences
+from factory import register_features
 
 load_dotenv()  # reads .env in project root if present
 
@@ -12,7 +17,14 @@ db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
 
-def create_app():
+# Feature blueprints, imported only when create_app() is asked to serve them
+FEATURES = {
+    "auth": lambda: import_module(".auth", __name__).auth_bp,
+    "patients": lambda: import_module(".clinics", __name__).clinic_bp,
+    "api": lambda: import_module(".api", __name__).api_bp,
+}
+
+def create_app(features=None):
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev_secret")
     app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///dental.db")
@@ -22,20 +34,26 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    with app.app_context():
+        sql_metrics.init_app(app, db.engine)
+        metrics.init_app(app, engine=db.engine)
 
-    # blueprints
-    from .auth import auth_bp
-    from .clinics import clinic_bp
-    from .api import api_bp
-
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(clinic_bp, url_prefix="/clinic")
-    app.register_blueprint(api_bp, url_prefix="/api")
+    register_features(app, FEATURES, features)
 
-    # Add a root route
-    @app.route("/")
-    def index():
-        from flask import render_template
-        return render_template("index.html")
+    # Add a root route; the page links to the registration and login forms
+    if {"auth", "patients"} <= set(app.config["FEATURES"]):
+        @app.route("/")
+        def index():
+            from flask import render_template
+            return render_template("index.html")
 
     return app
+
+def init_database(app=None):
+    """Create missing tables and seed the code counters; safe to run on every start"""
+    app = app or create_app()
+    with app.app_context():
+        db.create_all()
+        # Seed clinic/patient code counters once from codes issued before the sequences table existed
+        sequences.bootstrap(db.session)
+        db.session.commit()
@@ -5,8 +5,9 @@ from .models import Clinic, Patient
 from . import db
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from datetime import datetime, date
+from sequences import next_patient_number
 
-api_bp = Blueprint("api", __name__)
+api_bp = Blueprint("api", __name__, url_prefix="/api")
 
 @api_bp.route("/token", methods=["POST"])
 def token():
@@ -16,13 +17,14 @@ def token():
     clinic = Clinic.query.filter_by(login_id=login_id).first()
     if not clinic or not check_password_hash(clinic.password_hash, password):
         return jsonify({"msg":"Bad credentials"}), 401
-    access = create_access_token(identity=clinic.id)
+    # PyJWT 2.10+ rejects tokens whose subject is not a string
+    access = create_access_token(identity=str(clinic.id))
     return jsonify({"access_token": access})
 
 @api_bp.route("/patients", methods=["POST"])
 @jwt_required()
 def api_add_patient():
-    clinic_id = get_jwt_identity()
+    clinic_id = int(get_jwt_identity())
     data = request.json or {}
     name = data.get("name")
     sex = data.get("sex")
@@ -32,8 +34,7 @@ def api_add_patient():
     clinic = Clinic.query.get(clinic_id)
     if not clinic:
         return jsonify({"msg":"Clinic not found"}), 404
-    count = Patient.query.filter_by(clinic_id=clinic_id).count() or 0
-    patient_code = f"{clinic.clinic_code}-P{count+1:04d}"
+    patient_code = f"{clinic.clinic_code}-P{next_patient_number(db.session, clinic_id):04d}"
     dob_date = None
     if dob:
         dob_date = datetime.strptime(dob, "%Y-%m-%d").date()
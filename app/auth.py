@@ -4,7 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from . import db
 from .models import Clinic
 import secrets
-from sqlalchemy import func
+from sequences import next_clinic_number
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -21,8 +21,7 @@ def register_clinic():
         name = request.form.get("name","").strip()
         location = request.form.get("location","").strip()
         incharge = request.form.get("incharge","").strip()
-        total = db.session.query(func.count(Clinic.id)).scalar() or 0
-        next_num = total + 1
+        next_num = next_clinic_number(db.session)
         clinic_code = generate_clinic_code(next_num)
         login_id = generate_login_id(name, next_num)
         password = secrets.token_urlsafe(6)
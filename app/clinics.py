@@ -5,8 +5,9 @@ from .models import Clinic, Patient
 from . import db
 from datetime import datetime, date
 from sqlalchemy import func
+from sequences import next_patient_number
 
-clinic_bp = Blueprint("clinic", __name__, template_folder="templates")
+clinic_bp = Blueprint("clinic", __name__, template_folder="templates", url_prefix="/clinic")
 
 def calculate_age(dob):
     if not dob:
@@ -53,9 +54,9 @@ def add_patient():
         dob = datetime.strptime(dob_str, "%Y-%m-%d").date() if dob_str else None
         treatment_type = request.form.get("treatment_type","").strip()
         mobile = request.form.get("mobile_number","").strip()
-        count = Patient.query.filter_by(clinic_id=clinic_id).count() or 0
-        clinic = Clinic.query.get(clinic_id)
-        patient_code = f"{clinic.clinic_code}-P{count+1:04d}"
+        # login() already put the code in the session; only older sessions need the lookup
+        clinic_code = session.get('clinic_code') or Clinic.query.get(clinic_id).clinic_code
+        patient_code = f"{clinic_code}-P{next_patient_number(db.session, clinic_id):04d}"
         age = calculate_age(dob)
         p = Patient(patient_code=patient_code, clinic_id=clinic_id, name=name, sex=sex, dob=dob, age=age, treatment_type=treatment_type, mobile_number=mobile)
         db.session.add(p)
@@ -29,3 +29,9 @@ class Patient(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     clinic = db.relationship("Clinic", back_populates="patients")
+
+class SequenceCounter(db.Model):
+    __tablename__ = "sequences"
+    name = db.Column(db.String(50), primary_key=True)
+    scope = db.Column(db.Integer, primary_key=True, autoincrement=False, default=0)
+    value = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,114 @@
+# bench_alerts.py - Time the incremental smart-alerts engine across thousands of clinics
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import alert_engine
+import ultra_migrations
+from schema_migrations import add_missing_columns
+
+HISTORY_DAYS = 60
+NEW_DAYS = 4
+TRANSACTIONS_PER_DAY = 3
+VISITS_PER_DAY = 3
+APPOINTMENTS_PER_DAY = 6
+# Share of clinics that get a bad stretch in the new days; every other clinic stays normal
+ANOMALY_SHARE = 0.05
+START = date(2024, 1, 1)
+
+
+def build(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    # simple_clinic.db tables without the rollup triggers: the benchmark measures the engine, not inserts
+    ultra_migrations.create_base_tables(conn)
+    add_missing_columns(conn, "appointments", [("no_show", "INTEGER DEFAULT 0")])
+    conn.commit()
+    return conn
+
+
+def day_rows(rnd, clinics, day, anomalous):
+    """One day of revenue, visits and appointments for every clinic"""
+    revenue, visits, appointments = [], [], []
+    stamp = day.isoformat()
+    for clinic_id in range(1, clinics + 1):
+        bad = clinic_id in anomalous
+        for _ in range(TRANSACTIONS_PER_DAY):
+            amount = rnd.gauss(1500, 250) * (0.2 if bad else 1.0)
+            revenue.append((clinic_id, stamp, round(max(amount, 0), 2)))
+        for _ in range(VISITS_PER_DAY):
+            rating = rnd.choice([1, 2]) if bad else rnd.choice([4, 4, 5, 5, 5, 3])
+            visits.append((clinic_id, clinic_id * 1000 + rnd.randint(1, 999), stamp, rating))
+        for slot in range(APPOINTMENTS_PER_DAY):
+            no_show = rnd.random() < (0.8 if bad else 0.08)
+            appointments.append((clinic_id, f"{stamp} {9 + slot:02d}:00:00", int(no_show)))
+    return revenue, visits, appointments
+
+
+def insert(conn, rows):
+    revenue, visits, appointments = rows
+    conn.executemany("INSERT INTO revenue_analytics (clinic_id, transaction_date, final_amount) VALUES (?, ?, ?)", revenue)
+    conn.executemany("INSERT INTO patient_analytics (clinic_id, patient_id, visit_date, satisfaction_rating) VALUES (?, ?, ?, ?)", visits)
+    conn.executemany("INSERT INTO appointments (clinic_id, appointment_date, no_show) VALUES (?, ?, ?)", appointments)
+    conn.commit()
+    return len(revenue) + len(visits) + len(appointments)
+
+
+def alerts_by_type(conn):
+    return dict(conn.execute("SELECT alert_type, COUNT(DISTINCT clinic_id) FROM smart_alerts GROUP BY alert_type").fetchall())
+
+
+def run(clinics, seed=11):
+    rnd = random.Random(seed)
+    path = os.path.join(tempfile.mkdtemp(), "bench_alerts.db")
+    conn = build(path)
+    anomalous = set(rnd.sample(range(1, clinics + 1), max(1, int(clinics * ANOMALY_SHARE))))
+    print(f"\n📊 {clinics:,} clinics, {HISTORY_DAYS} days of history, {len(anomalous)} clinics turn bad afterwards")
+
+    rows = sum(insert(conn, day_rows(rnd, clinics, START + timedelta(days=d), set())) for d in range(HISTORY_DAYS))
+    # "now" is the day after the newest appointment, so each day's appointments count as settled
+    now = START + timedelta(days=HISTORY_DAYS)
+    started = time.perf_counter()
+    alert_engine.process(conn, now=now)
+    catch_up = time.perf_counter() - started
+    print(f"   history: {rows:,} rows in {catch_up:.2f}s ({rows / catch_up:,.0f} rows/s), "
+          f"false alerts on normal clinics: {sum(alerts_by_type(conn).values())}")
+
+    print(f"   {'new day':<12} {'rows':>8} {'engine ms':>10} {'rescan ms':>10}")
+    for offset in range(NEW_DAYS):
+        day = START + timedelta(days=HISTORY_DAYS + offset)
+        added = insert(conn, day_rows(rnd, clinics, day, anomalous))
+        started = time.perf_counter()
+        alert_engine.process(conn, now=day + timedelta(days=1))
+        engine_ms = (time.perf_counter() - started) * 1000
+        # What a stateless rule would re-read every time: each clinic's whole daily revenue history
+        started = time.perf_counter()
+        conn.execute("SELECT clinic_id, date(transaction_date), SUM(final_amount) FROM revenue_analytics GROUP BY 1, 2").fetchall()
+        rescan_ms = (time.perf_counter() - started) * 1000
+        print(f"   {day.isoformat():<12} {added:>8,} {engine_ms:>10.1f} {rescan_ms:>10.1f}")
+
+    flagged = alerts_by_type(conn)
+    caught = {alert_type: conn.execute("SELECT COUNT(DISTINCT clinic_id) FROM smart_alerts WHERE alert_type = ? AND clinic_id IN (%s)"
+                                       % ",".join(map(str, anomalous)), (alert_type,)).fetchone()[0]
+              for alert_type in flagged}
+    for alert_type, count in sorted(flagged.items()):
+        print(f"   🔔 {alert_type:<16} {count:>5} clinics alerted, {caught[alert_type]} of {len(anomalous)} bad clinics caught")
+    replayed = conn.execute("SELECT COUNT(*) FROM smart_alerts").fetchone()[0]
+    conn.execute("DELETE FROM alert_watermarks")
+    conn.execute("DELETE FROM alert_state")
+    conn.commit()
+    alert_engine.process(conn, now=START + timedelta(days=HISTORY_DAYS + NEW_DAYS))
+    duplicates = conn.execute("SELECT COUNT(*) FROM smart_alerts").fetchone()[0] - replayed
+    print(f"   replaying every row from scratch added {duplicates} duplicate alerts")
+    conn.close()
+
+
+if __name__ == "__main__":
+    # Usage: python bench_alerts.py [clinics ...]   (default: 1000 5000)
+    for size in [int(arg) for arg in sys.argv[1:]] or [1_000, 5_000]:
+        run(size)
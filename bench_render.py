@@ -0,0 +1,134 @@
+# bench_render.py - Time the templated pages against any earlier revision's f-string builders
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+FIRST = ["Aarav", "Priya", "Rahul", "Ananya", "Vikram", "Sneha", "John", "Maria", "Ahmed", "Chen"]
+LAST = ["Sharma", "Patel", "Singh", "Kumar", "Reddy", "Nair", "Smith", "Garcia", "Khan", "Müller"]
+TREATMENTS = ["Cleaning", "Filling", "Root Canal", "Extraction", "Crown", "Braces", None]
+
+# (label, app module, url); every request gets a unique _= arg so the page cache never answers
+ROUTES = [
+    ("ultra view_patients", "ultra", "/view_patients?clinic_id=1&per_page=500"),
+    ("ultra view_patients all", "ultra", "/view_patients?clinic_id=1&all=1"),
+    ("ultra analytics", "ultra", "/analytics?clinic_id=1"),
+    ("working view_patients", "working", "/view_patients?clinic_id=1"),
+]
+REPEAT = 5
+
+
+def patients(count, seed=7):
+    rnd = random.Random(seed)
+    for i in range(count):
+        yield (f"CLINIC0001-P{i + 1:05d}", f"{rnd.choice(FIRST)} {rnd.choice(LAST)}", rnd.choice(["Male", "Female"]),
+               rnd.randint(5, 85), f"+91 {rnd.randint(70000, 99999)} {rnd.randint(10000, 99999)}",
+               rnd.choice(TREATMENTS), f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 10:{i % 60:02d}:00")
+
+
+def seed_ultra(count):
+    import ultra_simple_app
+    ultra_simple_app.init_db()
+    conn = sqlite3.connect(ultra_simple_app.DATABASE)
+    conn.execute("INSERT INTO clinics (clinic_code, name, location, incharge, login_id, password) VALUES ('CLINIC0001', 'Bench Dental', 'Pune', 'Dr Bench', 'USER001', 'x')")
+    conn.executemany("INSERT INTO patients (clinic_id, patient_code, name, sex, age, mobile, treatment, created_at) VALUES (1, ?, ?, ?, ?, ?, ?, ?)",
+                     patients(count))
+    conn.commit()
+    conn.close()
+    return ultra_simple_app.app
+
+
+def seed_working(count):
+    import working_app
+    working_app.init_database()
+    conn = sqlite3.connect(working_app.DATABASE)
+    conn.execute("INSERT INTO clinics (name, email, password) VALUES ('Bench Dental', 'bench@example.com', 'x')")
+    conn.executemany("INSERT INTO patients (clinic_id, patient_code, name, sex, age, phone, treatment, created_at) VALUES (1, ?, ?, ?, ?, ?, ?, ?)",
+                     patients(count))
+    conn.commit()
+    conn.close()
+    return working_app.app
+
+
+def measure(count):
+    """Best-of-REPEAT milliseconds per route, run inside whichever tree is the working directory"""
+    apps = {"ultra": seed_ultra(count), "working": seed_working(count)}
+    results = {}
+    for label, app_name, url in ROUTES:
+        client = apps[app_name].test_client()
+        best = first = None
+        for attempt in range(REPEAT + 1):
+            started = time.perf_counter()
+            response = client.get(f"{url}&_={attempt}", buffered=False)
+            pieces = iter(response.response)
+            body = next(pieces, b"")
+            first_byte = time.perf_counter() - started
+            size = len(body) + sum(len(piece) for piece in pieces)
+            elapsed = time.perf_counter() - started
+            response.close()
+            # The first request pays for imports and template compilation; keep it out of the figure
+            if attempt:
+                best = elapsed if best is None else min(best, elapsed)
+                first = first_byte if first is None else min(first, first_byte)
+        results[label] = {"ms": best * 1000, "first_ms": first * 1000, "bytes": size}
+    return results
+
+
+def measure_tree(tree, count):
+    """Run measure() in a copy of another source tree, in a fresh interpreter"""
+    shutil.copy(os.path.abspath(__file__), os.path.join(tree, "bench_render.py"))
+    output = subprocess.run([sys.executable, "bench_render.py", "--json", str(count)], cwd=tree,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def export_revision(revision):
+    tree = tempfile.mkdtemp(prefix="bench_render_")
+    archive = subprocess.run(["git", "archive", revision], capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", tree], input=archive, check=True)
+    return tree
+
+
+def export_worktree():
+    tree = tempfile.mkdtemp(prefix="bench_render_")
+    here = os.path.dirname(os.path.abspath(__file__))
+    shutil.copytree(here, tree, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns(".git", "*.db", "*.db-*", "__pycache__", "*.whl"))
+    return tree
+
+
+def run(count, baseline):
+    print(f"\n📊 {count:,} patients in clinic 1")
+    after = measure_tree(export_worktree(), count)
+    before = measure_tree(export_revision(baseline), count) if baseline else None
+    # "first" is time to the first body chunk: what the browser waits for before it can start drawing
+    if before:
+        print(f"   {'page':<24} {'before ms':>10} {'now ms':>9} {'before first':>13} {'now first':>10} {'KB':>8}")
+    else:
+        print(f"   {'page':<24} {'ms':>9} {'first ms':>9} {'KB':>8}")
+    for label, _, _ in ROUTES:
+        now = after[label]
+        if before:
+            then = before[label]
+            print(f"   {label:<24} {then['ms']:>10.2f} {now['ms']:>9.2f} {then['first_ms']:>13.2f} {now['first_ms']:>10.2f} "
+                  f"{now['bytes'] / 1024:>8.1f}")
+        else:
+            print(f"   {label:<24} {now['ms']:>9.2f} {now['first_ms']:>9.2f} {now['bytes'] / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    # Usage: python bench_render.py [--baseline REV] [patients ...]   (default: 1000 10000)
+    args = sys.argv[1:]
+    if args[:1] == ["--json"]:
+        print(json.dumps(measure(int(args[1]))))
+        sys.exit(0)
+    baseline = None
+    if args[:1] == ["--baseline"]:
+        baseline, args = args[1], args[2:]
+    for size in [int(arg) for arg in args] or [1_000, 10_000]:
+        run(size, baseline)
@@ -0,0 +1,429 @@
+# bench_routes.py - Route latency percentiles, queries per request and peak RSS, checked against a stored baseline
+import argparse
+import http.client
+import json
+import math
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.parse
+from datetime import date
+
+import synthetic_data
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("BENCH_DATA_DIR", os.path.join(HERE, ".bench_data"))
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+SIZES = [1_000, 100_000, 1_000_000]
+SEED = 1
+# Fixed, so every machine on every day benchmarks the same rows
+END = date(2026, 1, 31)
+PATIENTS_PER_CLINIC = 1000
+REQUESTS = 20
+# A result regresses when it is this much worse than the baseline...
+THRESHOLD = 0.2
+# ...and, for latency, also worse by more than timer noise
+SLACK_MS = 5.0
+MODES = ("client", "gunicorn")
+
+# app: (module, init function)
+APPS = {
+    "ultra": ("ultra_simple_app", "init_db"),
+    "enhanced": ("enhanced_app", "init_database"),
+    "api": ("run", None),
+}
+# (label, app, method, path); {clinic} is the dataset's largest clinic, the slowest page in production
+ROUTES = [
+    ("view_patients", "ultra", "GET", "/view_patients?clinic_id={clinic}"),
+    ("analytics", "ultra", "GET", "/analytics?clinic_id={clinic}"),
+    ("advanced_analytics", "ultra", "GET", "/advanced_analytics?clinic_id={clinic}"),
+    ("search_patients", "enhanced", "POST", "/search_patients?clinic_id={clinic}"),
+    ("generate_report", "ultra", "GET", "/generate_report?clinic_id={clinic}"),
+    ("api_patients", "api", "POST", "/api/patients"),
+]
+# Routes that write: they run against a scratch copy, so the cached dataset stays the same from run to run
+WRITES = {"api_patients"}
+SEARCHES = ["Pri", "Rahul Sharma", "Kumar", "987", "root"]
+
+# The synthetic simple_clinic.db rows, copied into enhanced_app's dental_clinic.db schema
+ENHANCED_MIRROR = [
+    '''INSERT INTO clinics (id, name, email, password, phone, address, created_at)
+        SELECT id, name, email, password, phone, location, created_at FROM source.clinics''',
+    '''INSERT INTO patients (id, clinic_id, patient_code, name, age, sex, phone, treatment, created_at, dob, email,
+            address, emergency_contact_phone, medical_history, allergies, insurance_provider, insurance_number)
+        SELECT id, clinic_id, patient_code, name, age, sex, mobile, treatment, created_at, dob, email,
+            address, emergency_contact, medical_history, allergies, insurance_provider, insurance_number
+        FROM source.patients''',
+    '''INSERT INTO patient_analytics (clinic_id, patient_id, visit_date, diagnosis, treatment_cost,
+            satisfaction_rating, doctor_assigned, treatment_duration)
+        SELECT clinic_id, patient_id, visit_date, diagnosis, treatment_cost, satisfaction_rating,
+            doctor_assigned, consultation_time
+        FROM source.patient_analytics''',
+    '''INSERT INTO revenue_analytics (clinic_id, transaction_date, service_type, base_amount, tax_amount,
+            discount_amount, final_amount, payment_method, payment_status)
+        SELECT clinic_id, transaction_date, service_type, base_amount, tax_amount, discount_amount, final_amount,
+            payment_method, payment_status
+        FROM source.revenue_analytics''',
+    '''INSERT INTO patient_feedback (clinic_id, patient_id, feedback_text, rating, sentiment_score, feedback_date)
+        SELECT clinic_id, patient_id, review_text, rating, sentiment_score, feedback_date
+        FROM source.patient_feedback''',
+]
+# ...and into the SQLAlchemy app's dental.db
+API_MIRROR = [
+    '''INSERT INTO clinics (id, clinic_code, name, location, incharge, login_id, password_hash, created_at)
+        SELECT id, clinic_code, name, location, incharge, login_id, :password_hash, created_at
+        FROM source.clinics''',
+    '''INSERT INTO patients (id, patient_code, clinic_id, name, sex, dob, age, treatment_type, mobile_number,
+            created_at)
+        SELECT id, patient_code, clinic_id, name, sex, dob, age, treatment, mobile, created_at FROM source.patients''',
+    "INSERT INTO sequences (name, scope, value) SELECT name, scope, value FROM source.sequences",
+]
+
+
+def _api_url(directory, database="dental.db"):
+    return f"sqlite:///{os.path.join(directory, database)}"
+
+
+def _mirror(directory, database, statements, params=None):
+    conn = sqlite3.connect(os.path.join(directory, database))
+    conn.execute("ATTACH DATABASE ? AS source", (os.path.join(directory, "simple_clinic.db"),))
+    for statement in statements:
+        conn.execute(statement, params or {})
+    conn.commit()
+    return conn
+
+
+def build_dataset(size, directory):
+    """simple_clinic.db from synthetic_data, mirrored into dental_clinic.db and dental.db"""
+    os.makedirs(directory)
+    synthetic_data.generate(os.path.join(directory, "simple_clinic.db"), max(1, size // PATIENTS_PER_CLINIC), size,
+                            seed=SEED, end=END)
+    # Both apps open their database relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        import addresses
+        import enhanced_app
+        enhanced_app.init_database()
+        conn = _mirror(directory, "dental_clinic.db", ENHANCED_MIRROR)
+        addresses.backfill(conn)
+        conn.close()
+
+        os.environ["DATABASE_URL"] = _api_url(directory)
+        from werkzeug.security import generate_password_hash
+        from app import create_app, db
+        api = create_app()
+        with api.app_context():
+            db.create_all()
+            db.engine.dispose()
+        _mirror(directory, "dental.db", API_MIRROR,
+                {"password_hash": generate_password_hash(synthetic_data.PASSWORD)}).close()
+    finally:
+        os.environ.pop("DATABASE_URL", None)
+        os.chdir(cwd)
+
+    conn = sqlite3.connect(os.path.join(directory, "simple_clinic.db"))
+    clinic_id, login_id, patients = conn.execute('''SELECT c.id, c.login_id, COUNT(*) FROM patients p
+        JOIN clinics c ON c.id = p.clinic_id GROUP BY c.id ORDER BY 3 DESC, 1 LIMIT 1''').fetchone()
+    conn.close()
+    return {"patients": size, "clinic_id": clinic_id, "login_id": login_id, "clinic_patients": patients}
+
+
+def dataset(size):
+    """The dataset directory for size, built once and reused by every later run"""
+    directory = os.path.join(DATA_DIR, f"{size}-seed{SEED}-{END}")
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        shutil.rmtree(directory, ignore_errors=True)
+        print(f"🏗️ Building the {size:,}-patient dataset in {directory}")
+        meta = build_dataset(size, directory)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+    with open(meta_path) as f:
+        return directory, json.load(f)
+
+
+def _route(label):
+    return next(route for route in ROUTES if route[0] == label)
+
+
+def requests_for(label, meta, count):
+    """count + 1 (method, path, body, headers); the first is a warm-up"""
+    _, _, method, path = _route(label)
+    path = path.format(clinic=meta["clinic_id"])
+    for number in range(count + 1):
+        if label == "search_patients":
+            body = urllib.parse.urlencode({"search_query": SEARCHES[number % len(SEARCHES)], "search_type": "all"})
+            yield method, path, body.encode(), {"Content-Type": "application/x-www-form-urlencoded"}
+        elif label == "api_patients":
+            body = json.dumps({"name": f"Bench Patient {number}", "sex": "Female", "dob": "1990-05-17",
+                               "treatment_type": "Dental Filling", "mobile_number": "9876543210"})
+            yield method, path, body.encode(), {"Content-Type": "application/json"}
+        else:
+            # A new query string every time, so the page cache never answers
+            yield method, f"{path}&_={number}", None, {}
+
+
+def _token_request(meta):
+    return json.dumps({"login_id": meta["login_id"], "password": synthetic_data.PASSWORD}).encode()
+
+
+def _failed(status, body):
+    # The Flask apps report most errors as a 200 page with a ❌ heading
+    return status >= 400 or "❌".encode() in body
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+def summarize(timings, failures, peak_rss_kb, queries=None):
+    return {
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(timings, 0.99) * 1000, 2),
+        "queries": None if queries is None else round(queries / len(timings), 1),
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1) if peak_rss_kb else None,
+        "failures": failures,
+    }
+
+
+class QueryCounter:
+    """Counts SQL statements on every sqlite3 connection opened after install(), SQLAlchemy's included"""
+
+    IGNORED = ("PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+    def __init__(self):
+        self.count = 0
+        self._connect = sqlite3.connect
+
+    def _trace(self, statement):
+        # Trigger bodies are reported as "-- TRIGGER name"; they are part of the statement that fired them
+        if not statement.startswith("--") and not statement.lstrip().upper().startswith(self.IGNORED):
+            self.count += 1
+
+    def connect(self, *args, **kwargs):
+        conn = self._connect(*args, **kwargs)
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def install(self):
+        sqlite3.connect = sqlite3.dbapi2.connect = self.connect
+
+
+def client_worker(label, directory, meta, count):
+    """One route through the Flask test client, in this fresh interpreter so peak RSS is the route's own"""
+    counter = QueryCounter()
+    counter.install()
+    app_name = _route(label)[1]
+    module_name, init = APPS[app_name]
+    os.chdir(directory)
+    sys.path.insert(0, HERE)
+    module = __import__(module_name)
+    if init:
+        getattr(module, init)()
+    client = module.app.test_client()
+    headers = {}
+    if app_name == "api":
+        token = client.post("/api/token", data=_token_request(meta), content_type="application/json").json
+        headers["Authorization"] = f"Bearer {token['access_token']}"
+
+    timings, failures, queries = [], 0, 0
+    for number, (method, path, body, extra) in enumerate(requests_for(label, meta, count)):
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=body, headers={**headers, **extra})
+        payload = response.get_data()
+        elapsed = time.perf_counter() - started
+        # The first request pays for imports, template compilation and cold caches
+        if number:
+            timings.append(elapsed)
+            failures += _failed(response.status_code, payload)
+            queries += counter.count
+    return summarize(timings, failures, peak_rss_kb(), queries)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _send(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def peak_rss_kb(pid="self"):
+    """VmHWM from Linux /proc; None elsewhere
+
+    Not ru_maxrss: exec carries the parent's high-water mark over, so every worker would report the harness's
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        return None
+
+
+def _gunicorn_worker(master_pid):
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def gunicorn_run(label, directory, meta, count, env):
+    """One route through a real gunicorn process with a single sync worker"""
+    app_name = _route(label)[1]
+    port = _free_port()
+    env = dict(env, PYTHONPATH=HERE, PYTHONWARNINGS="ignore")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "--workers", "1", "--bind", f"127.0.0.1:{port}",
+                               "--timeout", "600", "--log-level", "warning", f"{APPS[app_name][0]}:app"],
+                              cwd=directory, env=env)
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"gunicorn did not start for {label}")
+                time.sleep(0.1)
+        headers = {}
+        if app_name == "api":
+            _, body = _send(port, "POST", "/api/token", _token_request(meta), {"Content-Type": "application/json"})
+            headers["Authorization"] = f"Bearer {json.loads(body)['access_token']}"
+        timings, failures = [], 0
+        for number, (method, path, body, extra) in enumerate(requests_for(label, meta, count)):
+            started = time.perf_counter()
+            status, payload = _send(port, method, path, body, {**headers, **extra})
+            elapsed = time.perf_counter() - started
+            if number:
+                timings.append(elapsed)
+                failures += _failed(status, payload)
+        worker = _gunicorn_worker(server.pid)
+        return summarize(timings, failures, worker and peak_rss_kb(worker))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def measure(mode, label, size, count):
+    directory, meta = dataset(size)
+    # sql_metrics' N+1 and slow-query warnings would drown the table
+    env = dict(os.environ, DATABASE_URL=_api_url(directory), SQL_METRICS_LOG_LEVEL="ERROR")
+    scratch = os.path.join(directory, "dental-scratch.db")
+    if label in WRITES:
+        shutil.copyfile(os.path.join(directory, "dental.db"), scratch)
+        env["DATABASE_URL"] = _api_url(directory, os.path.basename(scratch))
+    try:
+        if mode == "gunicorn":
+            return gunicorn_run(label, directory, meta, count, env)
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", label, directory, str(count)],
+                                capture_output=True, text=True, env=env)
+        if output.returncode:
+            raise RuntimeError(f"{label} worker failed:\n{output.stderr}")
+        return json.loads(output.stdout.strip().splitlines()[-1])
+    finally:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+
+
+def regressions(result, baseline, threshold=THRESHOLD):
+    """Human-readable reasons result is worse than baseline; empty when it is not"""
+    reasons = []
+    for metric in ("p50_ms", "p95_ms"):
+        if result[metric] > baseline[metric] * (1 + threshold) and result[metric] - baseline[metric] > SLACK_MS:
+            reasons.append(f"{metric} {baseline[metric]:.1f} → {result[metric]:.1f}")
+    # Query counts are deterministic: any increase is a change in behaviour, not noise
+    if result["queries"] is not None and baseline.get("queries") is not None and result["queries"] > baseline["queries"]:
+        reasons.append(f"queries {baseline['queries']:g} → {result['queries']:g}")
+    if result["peak_rss_mb"] and baseline.get("peak_rss_mb") and result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + threshold):
+        reasons.append(f"peak RSS {baseline['peak_rss_mb']:.0f} → {result['peak_rss_mb']:.0f} MB")
+    if result["failures"] > baseline.get("failures", 0):
+        reasons.append(f"{result['failures']} failed requests")
+    return reasons
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def run(sizes, modes, labels, count, baseline_path, threshold, update):
+    baseline = load_baseline(baseline_path)
+    results, failed = {}, []
+    for size in sizes:
+        _, meta = dataset(size)
+        print(f"\n📊 {size:,} patients; clinic {meta['clinic_id']} has {meta['clinic_patients']:,}")
+        print(f"   {'mode':<9} {'route':<19} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'RSS MB':>7}  vs baseline")
+        for mode in modes:
+            for label in labels:
+                key = f"{mode} {label} {size}"
+                result = measure(mode, label, size, count)
+                if key not in baseline:
+                    verdict = "new"
+                else:
+                    reasons = regressions(result, baseline[key], threshold)
+                    if reasons:
+                        # A busy machine slows one run; only a regression that repeats fails the check
+                        result = measure(mode, label, size, count)
+                        reasons = regressions(result, baseline[key], threshold)
+                    verdict = "❌ " + "; ".join(reasons) if reasons else "✅"
+                    if reasons:
+                        failed.append(key)
+                results[key] = result
+                queries = "-" if result["queries"] is None else f"{result['queries']:g}"
+                rss = "-" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f}"
+                print(f"   {mode:<9} {label:<19} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+                      f"{result['p99_ms']:>9.2f} {queries:>8} {rss:>7}  {verdict}")
+    if update:
+        baseline.update(results)
+        with open(baseline_path, "w") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+        print(f"\n✅ Recorded {len(results)} results in {baseline_path}")
+        return 0
+    if failed:
+        print(f"\n❌ {len(failed)} regression(s) beyond {threshold:.0%}: {', '.join(failed)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        label, directory, count = sys.argv[2], sys.argv[3], int(sys.argv[4])
+        with open(os.path.join(directory, "meta.json")) as f:
+            print(json.dumps(client_worker(label, directory, json.load(f), count)))
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description="Benchmark routes on fixed datasets and compare with a baseline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="patients per dataset")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--routes", nargs="+", choices=[route[0] for route in ROUTES],
+                        default=[route[0] for route in ROUTES])
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="timed requests per route")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown, e.g. 0.2 for 20%%")
+    parser.add_argument("--update-baseline", action="store_true", help="record these results instead of comparing")
+    options = parser.parse_args()
+    if options.requests < 1:
+        parser.error("--requests must be at least 1")
+    sys.exit(run(options.sizes, options.modes, options.routes, options.requests, options.baseline,
+                 options.threshold, options.update_baseline))
@@ -0,0 +1,93 @@
+# bench_search.py - Compare LIKE scans with FTS5 patient search at realistic clinic sizes
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import patient_search
+import schema_indexes
+
+FIRST = ["Aarav", "Priya", "Rahul", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rohan", "Meera",
+         "John", "Maria", "David", "Sarah", "Ahmed", "Fatima", "Chen", "Yuki", "Lucas", "Emma"]
+LAST = ["Sharma", "Patel", "Singh", "Kumar", "Gupta", "Reddy", "Iyer", "Nair", "Das", "Mehta",
+        "Smith", "Garcia", "Khan", "Wang", "Tanaka", "Silva", "Brown", "Rossi", "Müller", "Cohen"]
+TREATMENTS = ["Cleaning", "Filling", "Root Canal", "Extraction", "Crown", "Braces", "Whitening", "Implant", "Checkup"]
+CITIES = ["Mumbai", "Delhi", "Pune", "Chennai", "Kolkata", "Jaipur", "Lucknow", "Indore"]
+HISTORY = ["Diabetes", "Hypertension", "Asthma", "None", "Penicillin allergy", "Heart condition"]
+
+# (label, search field, query) - the searches receptionists actually type
+QUERIES = [
+    ("name prefix", "name", "Pri"),
+    ("full name", "all", "Rahul Sharma"),
+    ("phone prefix", "phone", "987"),
+    ("patient code", "patient_code", "P0424"),
+    ("treatment", "treatment", "root"),
+    ("history", "medical_history", "diabetes"),
+]
+
+CLINICS = 20
+REPEAT = 5
+
+
+def build(path, patients, seed=42):
+    """Create a dental_clinic.db-shaped database with the given number of patients"""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute('''CREATE TABLE patients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, clinic_id INTEGER NOT NULL, patient_code TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL, age INTEGER, sex TEXT, phone TEXT, treatment TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, address TEXT, medical_history TEXT)''')
+    schema_indexes.ensure_indexes(conn.cursor())
+
+    def rows():
+        for i in range(patients):
+            clinic_id = i % CLINICS + 1
+            yield (clinic_id, f"CLINIC{clinic_id:04d}-P{i // CLINICS + 1:04d}",
+                   f"{rnd.choice(FIRST)} {rnd.choice(LAST)}", rnd.randint(5, 85), rnd.choice(["Male", "Female"]),
+                   f"+91 {rnd.randint(70000, 99999)} {rnd.randint(10000, 99999)}", rnd.choice(TREATMENTS),
+                   f"{rnd.randint(1, 400)} MG Road, {rnd.choice(CITIES)}", rnd.choice(HISTORY),
+                   f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 10:00:00")
+
+    conn.executemany('''INSERT INTO patients (clinic_id, patient_code, name, age, sex, phone, treatment,
+        address, medical_history, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows())
+    conn.commit()
+    started = time.perf_counter()
+    patient_search.ensure_schema(conn.cursor())
+    conn.commit()
+    index_seconds = time.perf_counter() - started
+    return conn, index_seconds
+
+
+def timed(fn, *args):
+    best = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, len(result)
+
+
+def run(patients):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"\n📊 {patients:,} patients across {CLINICS} clinics")
+    conn, index_seconds = build(path, patients)
+    print(f"   FTS index built in {index_seconds:.1f}s")
+    cursor = conn.cursor()
+    print(f"   {'query':<14} {'LIKE ms':>9} {'FTS ms':>9} {'speedup':>8}  rows(LIKE/FTS)")
+    for label, field, query in QUERIES:
+        like_ms, like_rows = timed(patient_search.search_like, cursor, 1, query, field, patient_search.MAX_LIMIT)
+        fts_ms, fts_rows = timed(patient_search.search, cursor, 1, query, field, patient_search.MAX_LIMIT)
+        print(f"   {label:<14} {like_ms:>9.2f} {fts_ms:>9.2f} {like_ms / max(fts_ms, 1e-6):>7.1f}x  {like_rows}/{fts_rows}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    # Usage: python bench_search.py [patients ...]   (default: 100000 1000000)
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,107 @@
+# bench_snapshot.py - Time analyze.py's SQL load against the incremental Parquet snapshot
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import snapshot_export
+from analyze import PATIENT_COLUMNS
+
+CLINICS = 200
+MONTHS = 24
+TREATMENTS = ["Cleaning", "Filling", "Root Canal", "Extraction", "Orthodontics", "Checkup"]
+# Share of rows added and edited between two analysis runs
+NEW_SHARE = 0.01
+EDIT_SHARE = 0.001
+
+
+def build(path, patients, seed=7):
+    """A dental.db (app/models.py schema) with patients spread over CLINICS clinics and MONTHS months"""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute('''CREATE TABLE clinics (id INTEGER PRIMARY KEY, clinic_code VARCHAR(32), name VARCHAR(200),
+        location VARCHAR(200), incharge VARCHAR(200), login_id VARCHAR(100), password_hash VARCHAR(200), created_at DATETIME)''')
+    conn.execute('''CREATE TABLE patients (id INTEGER PRIMARY KEY, patient_code VARCHAR(64), clinic_id INTEGER NOT NULL,
+        name VARCHAR(200) NOT NULL, sex VARCHAR(20), dob DATE, age INTEGER, treatment_type VARCHAR(100),
+        mobile_number VARCHAR(20), created_at DATETIME)''')
+    conn.execute("CREATE INDEX ix_patients_clinic_id ON patients (clinic_id)")
+    conn.executemany("INSERT INTO clinics (id, clinic_code, name, location, login_id, password_hash) VALUES (?, ?, ?, ?, ?, '')",
+                     [(i, f"CLINIC{i:04d}", f"Clinic {i}", "Pune, India", f"CL{i:03d}") for i in range(1, CLINICS + 1)])
+    insert(conn, rnd, 1, patients)
+    return conn
+
+
+def insert(conn, rnd, first_id, count):
+    start = datetime(2023, 1, 1)
+    rows = []
+    for patient_id in range(first_id, first_id + count):
+        dob = start - timedelta(days=rnd.randint(5 * 365, 80 * 365))
+        created = start + timedelta(minutes=rnd.randint(0, MONTHS * 30 * 24 * 60))
+        rows.append((patient_id, f"P{patient_id:08d}", rnd.randint(1, CLINICS), f"Patient {patient_id}",
+                     rnd.choice(["Male", "Female"]), dob.strftime("%Y-%m-%d"), (start - dob).days // 365,
+                     rnd.choice(TREATMENTS), f"+91{rnd.randint(7000000000, 9999999999)}",
+                     created.strftime("%Y-%m-%d %H:%M:%S.%f")))
+    conn.executemany("""INSERT INTO patients (id, patient_code, clinic_id, name, sex, dob, age, treatment_type,
+        mobile_number, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+    conn.commit()
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def sql_load(conn):
+    # analyze.load_tables before the snapshot: every column, dates parsed on every run
+    return pd.read_sql("SELECT * FROM patients", conn, parse_dates=["created_at", "dob"])
+
+
+def run(patients, seed=7):
+    workdir = tempfile.mkdtemp()
+    snapshot_dir = os.path.join(workdir, "snapshots")
+    rnd = random.Random(seed)
+    conn = build(os.path.join(workdir, "dental.db"), patients, seed)
+    print(f"\n📊 {patients:,} patients in {CLINICS} clinics over {MONTHS} months")
+
+    _, full_sql = timed(sql_load, conn)
+    _, first = timed(snapshot_export.refresh, conn, snapshot_dir)
+    print(f"   {'SELECT * with parse_dates':<40} {full_sql:7.2f}s")
+    print(f"   {'first snapshot export':<40} {first:7.2f}s")
+
+    added, edited = int(patients * NEW_SHARE), int(patients * EDIT_SHARE)
+    insert(conn, rnd, patients + 1, added)
+    conn.executemany("UPDATE patients SET treatment_type = ?, age = age + 1 WHERE id = ?",
+                     [(rnd.choice(TREATMENTS), rnd.randint(1, patients)) for _ in range(edited)])
+    conn.commit()
+    # Runs are minutes apart in practice; edits from the current second are re-read once by design
+    time.sleep(1.1)
+    _, incremental = timed(snapshot_export.refresh, conn, snapshot_dir)
+    _, idle = timed(snapshot_export.refresh, conn, snapshot_dir)
+    frame, read = timed(snapshot_export.read, "patients", PATIENT_COLUMNS + ["id"], snapshot_dir)
+    print(f"   {f'refresh after +{added:,} new, {edited:,} edited':<40} {incremental:7.2f}s")
+    print(f"   {'refresh with nothing new':<40} {idle:7.2f}s")
+    print(f"   {f'read {len(PATIENT_COLUMNS)} columns from Parquet':<40} {read:7.2f}s")
+
+    expected = pd.read_sql(f"SELECT id, {', '.join(PATIENT_COLUMNS)} FROM patients ORDER BY id", conn)
+    frame = frame.sort_values("id").reset_index(drop=True)[["id"] + PATIENT_COLUMNS]
+    same = (len(frame) == len(expected)
+            and (frame["treatment_type"].astype(object) == expected["treatment_type"]).all()
+            and (frame["age"].astype("int64") == expected["age"]).all())
+    print(f"   {'✅' if same else '❌'} snapshot matches the database ({len(frame):,} rows)")
+    conn.close()
+    shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    # Usage: python bench_snapshot.py [patients ...]   (default: 100000 1000000)
+    for size in [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]:
+        run(size)
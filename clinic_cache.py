@@ -0,0 +1,108 @@
+# clinic_cache.py - Bounded LRU of clinic names and codes for the per-request clinic_id check
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, jsonify
+
+MAX_ENTRIES = int(os.environ.get("CLINIC_CACHE_MAX_ENTRIES", "1024"))
+# Writes in this worker invalidate at once; the TTL bounds how stale other workers can be
+TTL_SECONDS = float(os.environ.get("CLINIC_CACHE_TTL", "300"))
+
+ClinicInfo = namedtuple("ClinicInfo", ["name", "clinic_code"])
+
+
+class ClinicCache:
+    """(database, clinic_id) -> ClinicInfo; unknown ids are not cached so a new clinic is seen at once"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._has_code = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def _store(self, key, info):
+        with self._lock:
+            self._entries[key] = (info, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _query(self, cursor, database, clinic_id):
+        # dental_clinic.db has no clinic_code column; simple_clinic.db does
+        has_code = self._has_code.get(database)
+        if has_code is None:
+            cursor.execute("PRAGMA table_info(clinics)")
+            has_code = self._has_code[database] = "clinic_code" in {row[1] for row in cursor.fetchall()}
+        code = "clinic_code" if has_code else "NULL"
+        cursor.execute(f"SELECT name, {code} FROM clinics WHERE id = ?", (clinic_id,))
+        row = cursor.fetchone()
+        return ClinicInfo(*row) if row else None
+
+    def get(self, cursor, database, clinic_id):
+        key = (database, str(clinic_id))
+        info = self._lookup(key)
+        if info is None:
+            info = self._query(cursor, database, clinic_id)
+            if info is not None:
+                self._store(key, info)
+        return info
+
+    def invalidate(self, database, clinic_id=None):
+        with self._lock:
+            if clinic_id is None:
+                for key in [key for key in self._entries if key[0] == database]:
+                    del self._entries[key]
+            else:
+                self._entries.pop((database, str(clinic_id)), None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+cache = ClinicCache()
+
+
+def get_clinic(cursor, clinic_id):
+    """The request's clinic as ClinicInfo(name, clinic_code), or None when the id does not exist"""
+    return cache.get(cursor, current_app.config["DATABASE"], clinic_id)
+
+
+def invalidate(clinic_id=None):
+    """Forget one clinic (or every clinic of this app's database) after a write to clinics"""
+    cache.invalidate(current_app.config["DATABASE"], clinic_id)
+
+
+def init_app(app):
+    """Expose the cache counters at /clinic_cache_stats on a raw-sqlite app"""
+    app.add_url_rule("/clinic_cache_stats", "clinic_cache_stats", lambda: jsonify(cache.stats()))
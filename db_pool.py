@@ -0,0 +1,170 @@
+# db_pool.py - Shared SQLite connection pool for the raw-sqlite apps
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, g, jsonify
+
+# Pool configuration (override through the environment for gunicorn workers)
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "20000"))
+MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Applied once per physical connection, never per request
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA cache_size = -{CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# sqlite3.Connection subclass for new pooled connections; sql_metrics swaps in its timing one
+connection_factory = sqlite3.Connection
+
+
+class ConnectionPool:
+    """Bounded pool of configured SQLite connections for one database file"""
+
+    def __init__(self, database, size=POOL_SIZE):
+        self.database = database
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+        self.opened = 0
+        self.closed = 0
+        self.in_use = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               factory=connection_factory)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self.closed += 1
+
+    def _check_fork(self):
+        # SQLite handles must never cross a fork (gunicorn preload); start fresh in the child
+        if self._pid != os.getpid():
+            with self._lock:
+                self._idle = queue.LifoQueue(maxsize=self.size)
+                self._pid = os.getpid()
+                self.in_use = 0
+
+    def acquire(self):
+        """Hand out an idle connection, opening a new one on a pool miss"""
+        self._check_fork()
+        try:
+            conn = self._idle.get_nowait()
+            hit = True
+        except queue.Empty:
+            conn = None
+            hit = False
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.in_use += 1
+        return conn if conn is not None else self._connect()
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left open"""
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._discard(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection outside of a request (init scripts, CLI tools)"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "database": self.database,
+                "size": self.size,
+                "idle": self._idle.qsize(),
+                "in_use": self.in_use,
+                "hits": self.hits,
+                "misses": self.misses,
+                "opened": self.opened,
+                "closed": self.closed,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database):
+    """Return the process-wide pool for a database file"""
+    pool = _pools.get(database)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(database)
+            if pool is None:
+                pool = _pools[database] = ConnectionPool(database)
+    return pool
+
+
+def get_db():
+    """Request-scoped connection; released back to the pool on teardown"""
+    if "db_conn" not in g:
+        g.db_conn = get_pool(current_app.config["DATABASE"]).acquire()
+    return g.db_conn
+
+
+def close_db(exc=None):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        get_pool(current_app.config["DATABASE"]).release(conn)
+
+
+def pool_stats():
+    """Hit/miss counters for every pool opened in this process"""
+    return [pool.stats() for pool in list(_pools.values())]
+
+
+def init_app(app, database):
+    """Bind an app to a database file and release pooled connections after each request"""
+    app.config["DATABASE"] = database
+    app.teardown_appcontext(close_db)
+    app.add_url_rule("/db_pool_stats", "db_pool_stats", lambda: jsonify(pool_stats()))
@@ -1,15 +1,52 @@
-from flask import Flask, request, redirect, url_for, session, render_template_string
+from flask import Blueprint, Flask, request, redirect, url_for, session, render_template_string
 import sqlite3
 import os
 from datetime import datetime, timedelta
 import secrets
-
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
+import db_pool
+import addresses
+import schema_indexes
+import patient_search
+import patient_suggest
+import page_cache
+import clinic_cache
+import job_queue
+import templating
+import sql_metrics
+import metrics
+import patient_routes
+from db_pool import get_db
+from factory import register_features
 
 # Database configuration
 DATABASE = "dental_clinic.db"
 
+# Feature blueprints; the patient, analytics and report pages live in patient_routes
+auth_bp = Blueprint("auth", __name__)
+FEATURES = {"auth": auth_bp, "patients": patient_routes.patients_bp,
+            "analytics": patient_routes.analytics_bp, "reports": patient_routes.reports_bp}
+
+def create_app(features=None):
+    """The clinic app over dental_clinic.db with the named FEATURES, all of them by default"""
+    app = Flask(__name__)
+    app.secret_key = secrets.token_hex(16)
+    db_pool.init_app(app, DATABASE)
+    sql_metrics.init_app(app)
+    patient_suggest.init_app(app)
+    page_cache.init_app(app)
+    clinic_cache.init_app(app)
+    templating.init_app(app)
+    job_queue.init_app(app)
+    metrics.init_app(app, queue_stats=job_queue.stats)
+    return register_features(app, FEATURES, features)
+
+def __getattr__(name):
+    # `gunicorn enhanced_app:app` and other module.app users get every feature, built on first access
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def init_database():
     """Initialize the database with all necessary tables"""
     conn = sqlite3.connect(DATABASE)
@@ -134,10 +171,22 @@ def init_database():
         FOREIGN KEY (clinic_id) REFERENCES clinics (id)
     )''')
     
+    # Parsed village/city/state columns and their location rollup, backfilled once on older databases
+    addresses.migrate(conn)
+    
+    # Composite indexes for the clinic_id-filtered query shapes
+    schema_indexes.ensure_indexes(cursor)
+    
+    # Full-text patient search index, maintained by triggers on patients
+    patient_search.ensure_schema(cursor)
+    
+    # Page cache generations, shared by every worker through this database
+    page_cache.ensure_schema(cursor)
+    
     conn.commit()
     conn.close()
 
-@app.route("/")
+@auth_bp.route("/")
 def home():
     return '''
     <html>
@@ -186,7 +235,7 @@ def home():
     </html>
     '''
 
-@app.route("/register", methods=["GET", "POST"])
+@auth_bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
         name = request.form["name"]
@@ -196,12 +245,12 @@ def register():
         address = request.form.get("address", "")
         
         try:
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute("INSERT INTO clinics (name, email, password, phone, address) VALUES (?, ?, ?, ?, ?)",
                          (name, email, password, phone, address))
             conn.commit()
-            conn.close()
+            clinic_cache.invalidate(cursor.lastrowid)
             return redirect("/")
         except sqlite3.IntegrityError:
             return "<h3>❌ Error: Email already exists!</h3><a href='/register'>← Try Again</a>"
@@ -256,17 +305,16 @@ def register():
     </html>
     '''
 
-@app.route("/login", methods=["POST"])
+@auth_bp.route("/login", methods=["POST"])
 def login():
     email = request.form["email"]
     password = request.form["password"]
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute("SELECT id, name FROM clinics WHERE email = ? AND password = ?", (email, password))
         clinic = cursor.fetchone()
-        conn.close()
         
         if clinic:
             session["clinic_id"] = clinic[0]
@@ -277,19 +325,19 @@ def login():
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/'>← Try Again</a>"
 
-@app.route("/dashboard")
+@auth_bp.route("/dashboard")
+@page_cache.cached("dashboard")
 def dashboard():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return redirect("/")
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
         
@@ -303,7 +351,6 @@ def dashboard():
         cursor.execute("SELECT name, treatment, created_at FROM patients WHERE clinic_id = ? ORDER BY created_at DESC LIMIT 5", (clinic_id,))
         recent_patients = cursor.fetchall()
         
-        conn.close()
         
         recent_patients_html = ""
         for patient in recent_patients:
@@ -374,16 +421,11 @@ def dashboard():
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/'>← Back to Home</a>"
 
-# Patient routes will be imported from a separate module
-from patient_routes import *
-
 if __name__ == "__main__":
     init_database()
     
-    # Import patient routes after app initialization
-    import patient_routes
-    
     print("🦷 Enhanced Dental Clinic Management System Starting...")
     print("🌐 Database initialized successfully!")
     print("🔍 Search & Edit Features Enabled!")
+    app = create_app()
     app.run(debug=True, host="0.0.0.0", port=5000)
@@ -0,0 +1,77 @@
+# factory.py - One entry point for the app variants: CLINIC_APP picks the variant, CLINIC_FEATURES its blueprints
+import argparse
+import importlib
+import os
+
+from flask import Blueprint
+
+# Variant -> (module with create_app(features), its schema setup function); only the chosen module is imported
+VARIANTS = {
+    "ultra": ("ultra_simple_app", "init_db"),         # simple_clinic.db
+    "enhanced": ("enhanced_app", "init_database"),    # dental_clinic.db, patient pages from patient_routes
+    "working": ("working_app", "init_database"),      # dental_clinic.db
+    "api": ("app", "init_database"),                  # SQLAlchemy models and the JWT API on DATABASE_URL
+}
+DEFAULT_VARIANT = "ultra"
+
+
+def register_features(app, blueprints, features=None):
+    """Register the named feature blueprints on app, every one of them when features is None
+
+    A value may also be a function returning the blueprint, so features left out are never imported
+    """
+    names = list(blueprints) if features is None else list(features)
+    unknown = [name for name in names if name not in blueprints]
+    if unknown:
+        raise ValueError(f"Unknown feature(s) {', '.join(unknown)}; this app has {', '.join(blueprints)}")
+    for name in names:
+        blueprint = blueprints[name]
+        app.register_blueprint(blueprint if isinstance(blueprint, Blueprint) else blueprint())
+    app.config["FEATURES"] = names
+    return app
+
+
+def _features(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    names = [name.strip() for name in value if name.strip()]
+    return names or None
+
+
+def _module(variant):
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown app variant {variant!r}; choose one of {', '.join(VARIANTS)}")
+    return importlib.import_module(VARIANTS[variant][0])
+
+
+def create_app(variant=None, features=None):
+    """Build one variant with some or all of its features; unset arguments come from CLINIC_APP / CLINIC_FEATURES
+
+    gunicorn: CLINIC_APP=ultra CLINIC_FEATURES=patients,analytics gunicorn "factory:create_app()"
+    """
+    variant = variant or os.environ.get("CLINIC_APP", DEFAULT_VARIANT)
+    if features is None:
+        features = os.environ.get("CLINIC_FEATURES")
+    return _module(variant).create_app(_features(features))
+
+
+def init_database(variant=None):
+    """Bring a variant's database schema up to date; gunicorn workers never do this themselves"""
+    variant = variant or os.environ.get("CLINIC_APP", DEFAULT_VARIANT)
+    getattr(_module(variant), VARIANTS[variant][1])()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set up a variant's database and run it on the development server")
+    parser.add_argument("variant", nargs="?", default=os.environ.get("CLINIC_APP", DEFAULT_VARIANT), choices=VARIANTS)
+    parser.add_argument("--features", help="comma-separated feature blueprints to serve (default: all)")
+    parser.add_argument("--init-only", action="store_true", help="only bring the database schema up to date")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5000")))
+    options = parser.parse_args()
+    init_database(options.variant)
+    if not options.init_only:
+        app = create_app(options.variant, options.features)
+        print(f"🦷 Starting {options.variant} with {', '.join(app.config['FEATURES'])} on http://127.0.0.1:{options.port}")
+        app.run(host="127.0.0.1", port=options.port, debug=True)
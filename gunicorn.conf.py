@@ -0,0 +1,21 @@
+# gunicorn.conf.py - Server hooks, loaded automatically by gunicorn started from this directory
+import glob
+import os
+
+# Same variable metrics.py reads; unset leaves every hook a no-op
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+
+
+def on_starting(server):
+    """Start with an empty metrics directory: files left by a previous run would be added to this one's totals"""
+    if MULTIPROC_DIR:
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+        for path in glob.glob(os.path.join(MULTIPROC_DIR, "*.db")):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges so in-flight and pool numbers stop counting it"""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid, MULTIPROC_DIR)
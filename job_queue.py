@@ -0,0 +1,453 @@
+# job_queue.py - SQLite-backed background jobs for heavy reports, run by a separate worker process
+import argparse
+import json
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+import tempfile
+import threading
+import time
+
+from flask import jsonify, send_file
+
+import db_pool
+import report_export
+import report_queries
+
+# Queue configuration (override through the environment; web and worker processes must agree)
+JOB_DATABASE = os.environ.get("JOB_QUEUE_DB", "jobs.db")
+RESULTS_DIR = os.environ.get("JOB_RESULTS_DIR", os.path.join(tempfile.gettempdir(), "dental_job_results"))
+RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", str(24 * 3600)))
+POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1.0"))
+HEARTBEAT_SECONDS = 5
+# A running job whose worker stopped heartbeating this long ago is handed to another worker
+STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "60"))
+MAX_ATTEMPTS = 3
+# With no live worker, submit() runs the job in the request instead of leaving it queued (development only)
+INLINE_FALLBACK = os.environ.get("JOB_INLINE_FALLBACK", "0") == "1"
+SWEEP_SECONDS = 60
+PROGRESS_SECONDS = 0.5
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        clinic_id TEXT,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        progress INTEGER NOT NULL DEFAULT 0,
+        total INTEGER,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        content_type TEXT,
+        download_name TEXT,
+        result_path TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        heartbeat_at REAL,
+        finished_at REAL,
+        expires_at REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_kind_params ON jobs (kind, params)",
+    """CREATE TABLE IF NOT EXISTS job_workers (
+        name TEXT PRIMARY KEY,
+        pid INTEGER,
+        started_at REAL,
+        heartbeat_at REAL
+    )""",
+)
+STATUSES = ("queued", "running", "done", "failed")
+_COLUMNS = ("id", "kind", "clinic_id", "params", "status", "progress", "total", "attempts", "worker",
+            "content_type", "download_name", "result_path", "error", "created_at", "started_at",
+            "heartbeat_at", "finished_at", "expires_at")
+
+_ready = set()
+_ready_lock = threading.Lock()
+
+
+def connection():
+    """Pooled connection to the queue database, creating the schema once per process"""
+    pool = db_pool.get_pool(JOB_DATABASE)
+    if JOB_DATABASE not in _ready:
+        with _ready_lock, pool.connection() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            _ready.add(JOB_DATABASE)
+    return pool.connection()
+
+
+def _job(row):
+    if row is None:
+        return None
+    job = dict(zip(_COLUMNS, row))
+    job["params"] = json.loads(job["params"])
+    return job
+
+
+def get_job(job_id):
+    with connection() as conn:
+        return _job(conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+# Handlers take (params, out, progress): write the result to the binary file out and
+# report rows done through progress(done, total=None)
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, params, clinic_id=None, content_type="application/octet-stream", download_name=None):
+    """Queue a job, or hand back the identical one that is already queued or running"""
+    encoded = json.dumps(params, sort_keys=True)
+    with connection() as conn:
+        # Reloading a "preparing" page must not queue the same report twice
+        row = conn.execute(f"""
+            SELECT {', '.join(_COLUMNS)} FROM jobs
+            WHERE kind = ? AND params = ? AND status IN ('queued', 'running')
+            ORDER BY created_at DESC LIMIT 1
+        """, (kind, encoded)).fetchone()
+        if row:
+            return _job(row)
+        job_id = secrets.token_urlsafe(16)
+        conn.execute("""
+            INSERT INTO jobs (id, kind, clinic_id, params, content_type, download_name, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (job_id, kind, clinic_id, encoded, content_type, download_name, time.time()))
+        conn.commit()
+    return get_job(job_id)
+
+
+def submit(kind, params, **options):
+    """Enqueue a job; without a live worker, run it right away in this process"""
+    job = enqueue(kind, params, **options)
+    if job["status"] == "queued" and INLINE_FALLBACK and not workers_alive():
+        run_job(job, "inline")
+        job = get_job(job["id"])
+    return job
+
+
+def claim(worker):
+    """Atomically take the oldest queued job for this worker"""
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        now = time.time()
+        conn.execute("""
+            UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1,
+                started_at = ?, heartbeat_at = ?, progress = 0, error = NULL
+            WHERE id = ?
+        """, (worker, now, now, row[0]))
+        conn.commit()
+    return get_job(row[0])
+
+
+def _update(job_id, sql, args):
+    with connection() as conn:
+        conn.execute(f"UPDATE jobs SET {sql} WHERE id = ?", (*args, job_id))
+        conn.commit()
+
+
+class _Progress:
+    """Throttled progress writer; every write also counts as a heartbeat for the job"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.total = None
+        self._written = 0.0
+
+    def __call__(self, done, total=None):
+        if total is not None:
+            self.total = total
+        now = time.time()
+        if total is None and now - self._written < PROGRESS_SECONDS:
+            return
+        self._written = now
+        _update(self.job_id, "progress = ?, total = ?, heartbeat_at = ?", (done, self.total, now))
+
+
+def result_path(job_id):
+    return os.path.join(RESULTS_DIR, job_id)
+
+
+def run_job(job, worker):
+    """Run a claimed (or inline) job to completion and record its result file or error"""
+    if job["status"] == "queued":
+        now = time.time()
+        with connection() as conn:
+            # A worker that started meanwhile may have claimed it; only one of us gets to run it
+            taken = conn.execute("""
+                UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ?
+                WHERE id = ? AND status = 'queued'
+            """, (worker, now, now, job["id"])).rowcount
+            conn.commit()
+        if not taken:
+            return False
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    final_path = result_path(job["id"])
+    partial_path = f"{final_path}.{os.getpid()}.partial"
+    progress = _Progress(job["id"])
+    try:
+        func = HANDLERS.get(job["kind"])
+        if func is None:
+            raise ValueError(f"unknown job kind '{job['kind']}'")
+        with open(partial_path, "wb") as out:
+            func(job["params"], out, progress)
+        os.replace(partial_path, final_path)
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        finished = time.time()
+        _update(job["id"], "status = 'failed', error = ?, finished_at = ?, expires_at = ?",
+                (str(e), finished, finished + RESULT_TTL))
+        print(f"❌ Job {job['id']} ({job['kind']}) failed: {e}")
+        return False
+    finished = time.time()
+    _update(job["id"], """status = 'done', result_path = ?, finished_at = ?, expires_at = ?,
+            progress = COALESCE(total, progress)""", (final_path, finished, finished + RESULT_TTL))
+    return True
+
+
+def sweep(now=None):
+    """Re-queue jobs orphaned by a dead worker and delete results past their expiry"""
+    now = now or time.time()
+    with connection() as conn:
+        stale = now - STALE_SECONDS
+        requeued = conn.execute("""
+            UPDATE jobs SET status = 'queued', worker = NULL
+            WHERE status = 'running' AND heartbeat_at < ? AND attempts < ?
+        """, (stale, MAX_ATTEMPTS)).rowcount
+        conn.execute("""
+            UPDATE jobs SET status = 'failed', error = 'worker stopped responding', finished_at = ?, expires_at = ?
+            WHERE status = 'running' AND heartbeat_at < ?
+        """, (now, now + RESULT_TTL, stale))
+        expired = conn.execute("""
+            SELECT id, result_path FROM jobs WHERE status IN ('done', 'failed') AND expires_at < ?
+        """, (now,)).fetchall()
+        for _, path in expired:
+            if path and os.path.exists(path):
+                os.remove(path)
+        conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id, _ in expired])
+        conn.execute("DELETE FROM job_workers WHERE heartbeat_at < ?", (now - 10 * STALE_SECONDS,))
+        conn.commit()
+    return {"requeued": requeued, "expired": len(expired)}
+
+
+def workers_alive():
+    with connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM job_workers WHERE heartbeat_at >= ?",
+                            (time.time() - 3 * HEARTBEAT_SECONDS,)).fetchone()[0]
+
+
+def stats():
+    with connection() as conn:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+    return {
+        **{status: counts.get(status, 0) for status in STATUSES},
+        "workers": workers_alive(),
+        "oldest_queued_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+    }
+
+
+# Built-in handlers -------------------------------------------------------------------------
+
+@handler("export")
+def export_report(params, out, progress):
+    """One of the report_export formats for a named report, written batch by batch
+
+    The SQL comes from report_queries, never from the job row, so the queue can only ask for known reports
+    """
+    report = report_queries.REPORTS.get(params.get("report"))
+    if report is None:
+        raise ValueError(f"unknown report {params.get('report')!r}")
+    if params.get("format") not in report_export.WRITERS:
+        raise ValueError(f"unknown export format {params.get('format')!r}")
+    clinic_id = int(params["clinic_id"])
+    with db_pool.get_pool(params["database"]).connection() as conn:
+        cursor = conn.cursor()
+        # Rollup totals only; a COUNT(*) over the report query would scan everything twice
+        progress(0, report.total(cursor, clinic_id) if report.total else None)
+        report_queries.execute(cursor, params["report"], clinic_id)
+        done = 0
+
+        def counted():
+            nonlocal done
+            for rows in report_export.iter_batches(cursor):
+                yield rows
+                done += len(rows)
+                progress(done)
+
+        for chunk in report_export.WRITERS[params["format"]](report.columns, counted()):
+            out.write(chunk)
+        # Reports without a rollup total learn it at the end
+        progress(done, done)
+
+
+def submit_export(database, report, clinic_id, fmt, download_name):
+    """Queue a report_queries report for one clinic in one of the report_export formats"""
+    return submit("export", {
+        "database": os.path.abspath(database), "report": report, "clinic_id": int(clinic_id), "format": fmt,
+    }, clinic_id=clinic_id, content_type=report_export.FORMATS[fmt][0], download_name=download_name)
+
+
+# Worker process ----------------------------------------------------------------------------
+
+def _heartbeat(name, stop):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        now = time.time()
+        with connection() as conn:
+            conn.execute("UPDATE job_workers SET heartbeat_at = ? WHERE name = ?", (now, name))
+            # Long single queries never call progress(); this keeps their jobs from looking orphaned
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE worker = ? AND status = 'running'", (now, name))
+            conn.commit()
+
+
+def work(stop, poll=POLL_SECONDS):
+    """Claim and run jobs until stop is set; the current job always finishes first"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    now = time.time()
+    with connection() as conn:
+        conn.execute("INSERT OR REPLACE INTO job_workers (name, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?)",
+                     (name, os.getpid(), now, now))
+        conn.commit()
+    beating = threading.Event()
+    threading.Thread(target=_heartbeat, args=(name, beating), daemon=True).start()
+    swept = 0.0
+    try:
+        while not stop.is_set():
+            if time.time() - swept > SWEEP_SECONDS:
+                sweep()
+                swept = time.time()
+            job = claim(name)
+            if job is None:
+                stop.wait(poll)
+                continue
+            print(f"⚙️ {name} running job {job['id']} ({job['kind']})")
+            run_job(job, name)
+    finally:
+        beating.set()
+        with connection() as conn:
+            conn.execute("DELETE FROM job_workers WHERE name = ?", (name,))
+            conn.commit()
+
+
+def run_workers(processes, poll=POLL_SECONDS):
+    stop = multiprocessing.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    workers = [multiprocessing.Process(target=work, args=(stop, poll), daemon=True) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    print(f"🚀 {processes} job worker(s) polling {JOB_DATABASE}, results in {RESULTS_DIR}")
+    for worker in workers:
+        while worker.is_alive():
+            worker.join(1)
+    print("✅ Job workers stopped")
+
+
+# Web side ----------------------------------------------------------------------------------
+
+def status(job):
+    total = job["total"]
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "total": total,
+        "percent": round(job["progress"] / total * 100, 1) if total else (100.0 if job["status"] == "done" else 0.0),
+        "error": job["error"],
+        "download_url": f"/jobs/{job['id']}/download" if job["status"] == "done" else None,
+        "expires_at": job["expires_at"],
+    }
+
+
+def pending_page(job, title, back_url, ready_url=None):
+    """Progress page that polls /jobs/<id> and moves on to ready_url (the download by default)"""
+    ready_url = ready_url or f"/jobs/{job['id']}/download"
+    return f'''
+    <html>
+    <head><title>{title}</title></head>
+    <body style="font-family: Arial; margin: 40px; background: #f8f9fa;">
+        <div style="background: white; padding: 30px; border-radius: 10px; max-width: 600px; margin: 0 auto; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
+            <h2 style="color: #2c5aa0;">⏳ {title}</h2>
+            <p id="job-status" style="color: #666;">Queued…</p>
+            <div style="background: #e9ecef; border-radius: 10px; height: 20px; overflow: hidden;">
+                <div id="job-bar" style="background: linear-gradient(45deg, #007bff, #0056b3); height: 100%; width: 0%; transition: width 0.3s;"></div>
+            </div>
+            <p id="job-ready" style="display: none; margin-top: 20px;"><a href="{ready_url}" style="background: #28a745; color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px;">⬇️ Open result</a></p>
+            <p style="margin-top: 30px;"><a href="{back_url}">← Back</a></p>
+        </div>
+        <script>
+            function pollJob() {{
+                fetch('/jobs/{job['id']}').then(r => r.json()).then(job => {{
+                    document.getElementById('job-bar').style.width = job.percent + '%';
+                    if (job.status === 'done') {{
+                        document.getElementById('job-status').textContent = '✅ Ready';
+                        document.getElementById('job-ready').style.display = 'block';
+                        window.location.href = '{ready_url}';
+                    }} else if (job.status === 'failed' || job.error) {{
+                        document.getElementById('job-status').textContent = '❌ ' + (job.error || 'Job failed');
+                    }} else {{
+                        document.getElementById('job-status').textContent = job.status === 'running'
+                            ? 'Working… ' + job.progress + (job.total ? ' of ' + job.total + ' rows' : '')
+                            : 'Queued…';
+                        setTimeout(pollJob, 1000);
+                    }}
+                }});
+            }}
+            pollJob();
+        </script>
+    </body>
+    </html>
+    '''
+
+
+def _status_view(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"id": job_id, "status": "expired", "error": "Job not found or expired"}), 404
+    return jsonify(status(job))
+
+
+def _download_view(job_id):
+    job = get_job(job_id)
+    if job is None or job["status"] != "done" or not os.path.exists(job["result_path"] or ""):
+        return "<h3>❌ Error: This result is not ready or has expired.</h3><a href='/'>← Back to Home</a>", 404
+    return send_file(job["result_path"], mimetype=job["content_type"], as_attachment=bool(job["download_name"]),
+                     download_name=job["download_name"], max_age=0)
+
+
+def init_app(app):
+    """Register the job status, download and stats endpoints"""
+    app.add_url_rule("/jobs/<job_id>", "job_status", _status_view)
+    app.add_url_rule("/jobs/<job_id>/download", "job_download", _download_view)
+    app.add_url_rule("/job_queue_stats", "job_queue_stats", lambda: jsonify(stats()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background job worker for heavy reports")
+    parser.add_argument("command", choices=["worker", "sweep", "stats"])
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS)
+    options = parser.parse_args()
+    if options.command == "worker":
+        run_workers(options.processes, options.poll)
+    elif options.command == "sweep":
+        print(f"🧹 {sweep()}")
+    else:
+        print(json.dumps(stats(), indent=2))
@@ -0,0 +1,172 @@
+# metrics.py - Prometheus /metrics: per-route counts and latency histograms, in-flight requests, pool, cache and job queue
+import os
+import sqlite3
+import threading
+import time
+
+from flask import Response, g, request
+
+import clinic_cache
+import db_pool
+import page_cache
+
+try:
+    import prometheus_client as prom
+    from prometheus_client import multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    prom = multiprocess = GaugeMetricFamily = None
+
+# gunicorn: point this at an empty directory shared by the workers before they start, and keep
+# gunicorn.conf.py next to the app so dead workers are retired; each worker writes its own mmap files
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+# Request latency buckets in seconds, from cached pages (~2 ms) to large reports
+BUCKETS = (0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Each worker copies its pool and cache counters into the metrics this often, from a background thread
+SYNC_SECONDS = 1.0
+
+if prom is not None:
+    REQUESTS = prom.Counter("http_requests_total", "HTTP requests served", ["method", "endpoint", "status"])
+    LATENCY = prom.Histogram("http_request_duration_seconds", "Time to produce the response",
+                             ["method", "endpoint"], buckets=BUCKETS)
+    IN_PROGRESS = prom.Gauge("http_requests_in_progress", "Requests being handled right now",
+                             ["method", "endpoint"], multiprocess_mode="livesum")
+    POOL_CONNECTIONS = prom.Gauge("db_pool_connections", "Pooled database connections by state",
+                                  ["database", "state"], multiprocess_mode="livesum")
+    POOL_CHECKOUTS = prom.Counter("db_pool_checkouts_total", "Connections handed out, reused (hit) or newly opened (miss)",
+                                  ["database", "result"])
+    CACHE_LOOKUPS = prom.Counter("cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+    CACHE_INVALIDATIONS = prom.Counter("cache_invalidations_total", "Clinic invalidations by cache", ["cache"])
+
+
+def multiprocess_mode():
+    return prom is not None and bool(MULTIPROC_DIR)
+
+
+class QueueCollector:
+    """Job queue depth, read from the shared jobs database at scrape time, so any worker reports the same numbers"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def collect(self):
+        try:
+            stats = self.stats()
+        except sqlite3.Error:
+            return
+        workers = stats.pop("workers")
+        oldest = stats.pop("oldest_queued_seconds")
+        jobs = GaugeMetricFamily("job_queue_jobs", "Jobs in the queue by status", labels=["status"])
+        for status, count in stats.items():
+            jobs.add_metric([status], count)
+        yield jobs
+        yield GaugeMetricFamily("job_queue_workers", "Job workers with a recent heartbeat", value=workers)
+        yield GaugeMetricFamily("job_queue_oldest_queued_seconds", "Age of the oldest queued job", value=oldest)
+
+
+class _Sync:
+    """Turns the cumulative counters kept by db_pool and the caches into Prometheus counter increments"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._pid = None
+        self.engines = []
+
+    def start(self):
+        """One syncing thread per worker process, started on its first request (after gunicorn forked it)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="metrics-sync", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(SYNC_SECONDS)
+            self()
+
+    def _advance(self, counter, key, value):
+        delta = value - self._seen.get(key, 0)
+        if delta > 0:
+            counter.inc(delta)
+        self._seen[key] = value
+
+    def __call__(self):
+        with self._lock:
+            for stats in db_pool.pool_stats():
+                name = os.path.basename(stats["database"])
+                POOL_CONNECTIONS.labels(name, "idle").set(stats["idle"])
+                POOL_CONNECTIONS.labels(name, "in_use").set(stats["in_use"])
+                self._advance(POOL_CHECKOUTS.labels(name, "hit"), ("pool", name, "hit"), stats["hits"])
+                self._advance(POOL_CHECKOUTS.labels(name, "miss"), ("pool", name, "miss"), stats["misses"])
+            for engine in self.engines:
+                # SQLAlchemy's own pool: connection states only, it keeps no hit/miss counters
+                pool = engine.pool
+                if hasattr(pool, "checkedin"):
+                    name = os.path.basename(engine.url.database or "memory")
+                    POOL_CONNECTIONS.labels(name, "idle").set(pool.checkedin())
+                    POOL_CONNECTIONS.labels(name, "in_use").set(pool.checkedout())
+            # Attributes, not stats(): the shared page cache backend answers stats() with a Redis round trip
+            for name, cache in (("page", page_cache.cache), ("clinic", clinic_cache.cache)):
+                self._advance(CACHE_LOOKUPS.labels(name, "hit"), (name, "hit"), cache.hits)
+                self._advance(CACHE_LOOKUPS.labels(name, "miss"), (name, "miss"), cache.misses)
+                self._advance(CACHE_INVALIDATIONS.labels(name), (name, "invalidations"), cache.invalidations)
+
+
+sync = _Sync()
+_extra = None
+
+
+def _start_request():
+    sync.start()
+    g.metrics_started = time.perf_counter()
+    g.metrics_labels = (request.method, request.endpoint or "unmatched")
+    IN_PROGRESS.labels(*g.metrics_labels).inc()
+
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc=None):
+    labels = g.pop("metrics_labels", None)
+    if labels is None:
+        return
+    LATENCY.labels(*labels).observe(time.perf_counter() - g.pop("metrics_started"))
+    # No status recorded means the view raised past Flask's error handling
+    REQUESTS.labels(*labels, str(g.pop("metrics_status", 500))).inc()
+    IN_PROGRESS.labels(*labels).dec()
+
+
+def render():
+    """Prometheus text exposition of every metric, summed over all gunicorn workers in multiprocess mode"""
+    sync()
+    if multiprocess_mode():
+        registry = prom.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, MULTIPROC_DIR)
+    else:
+        registry = prom.REGISTRY
+    output = prom.generate_latest(registry)
+    if _extra is not None:
+        output += prom.generate_latest(_extra)
+    return output
+
+
+def init_app(app, queue_stats=None, engine=None):
+    """Serve /metrics and time every request; queue_stats is job_queue.stats on apps that run background jobs"""
+    global _extra
+    if prom is None:
+        print("⚠️ prometheus_client is not installed; /metrics is disabled")
+        return
+    if queue_stats is not None and _extra is None:
+        _extra = prom.CollectorRegistry(auto_describe=False)
+        _extra.register(QueueCollector(queue_stats))
+    if engine is not None:
+        sync.engines.append(engine)
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", lambda: Response(render(), content_type=prom.CONTENT_TYPE_LATEST))
@@ -0,0 +1,227 @@
+# page_cache.py - TTL + write-invalidated cache for the dashboard and analytics pages
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request
+
+import db_pool
+
+# Cache configuration (override through the environment for gunicorn workers)
+TTL_SECONDS = float(os.environ.get("PAGE_CACHE_TTL", "60"))
+MAX_ENTRIES = int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", "512"))
+# redis://host:6379/0 shares entries and invalidations across workers; unset keeps the in-process LRU
+SHARED_URL = os.environ.get("PAGE_CACHE_URL", "")
+KEY_PREFIX = "page_cache"
+
+# Every error page in the raw-sqlite apps carries this marker; those are never cached
+ERROR_MARKER = "❌"
+
+# Per-clinic generations live in the clinic database, so a write seen by one worker retires every worker's pages
+GENERATIONS_TABLE = '''CREATE TABLE IF NOT EXISTS page_cache_generations (
+    clinic_id INTEGER PRIMARY KEY,
+    generation INTEGER NOT NULL DEFAULT 0
+)'''
+_BUMP = '''INSERT INTO page_cache_generations (clinic_id, generation) VALUES (?, 1)
+    ON CONFLICT (clinic_id) DO UPDATE SET generation = generation + 1'''
+
+
+def ensure_schema(cursor):
+    cursor.execute(GENERATIONS_TABLE)
+
+
+def generation(cursor, clinic_id):
+    cursor.execute("SELECT generation FROM page_cache_generations WHERE clinic_id = ?", (clinic_id,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+class LocalBackend:
+    """Size-bounded in-process LRU; also the stand-in for the shared backend in development"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, clinic_id):
+        """Free one clinic's slots now rather than waiting for them to age out of the LRU"""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == clinic_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "local",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class RedisBackend:
+    """Shared across workers; Redis applies the TTL and its own maxmemory eviction"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, key):
+        return f"{KEY_PREFIX}:{':'.join(str(part) for part in key)}"
+
+    def get(self, key):
+        value = self._client.get(self._key(key))
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self._key(key), value.encode("utf-8"), ex=max(1, int(ttl)))
+
+    def discard(self, clinic_id):
+        # Entries of older generations are unreachable and expire with their TTL
+        pass
+
+    def clear(self):
+        for key in self._client.scan_iter(f"{KEY_PREFIX}:*"):
+            self._client.delete(key)
+
+    def stats(self):
+        info = self._client.info("stats")
+        return {"backend": "redis", "evictions": info.get("evicted_keys", 0), "expirations": info.get("expired_keys", 0)}
+
+
+def _make_backend():
+    if SHARED_URL:
+        try:
+            return RedisBackend(SHARED_URL)
+        except ImportError:
+            print("⚠️ PAGE_CACHE_URL is set but the redis package is missing; using the in-process cache")
+    return LocalBackend()
+
+
+class PageCache:
+    """Rendered pages keyed by (clinic_id, view, params) with hit/miss/invalidation counters"""
+
+    def __init__(self, backend=None, ttl=TTL_SECONDS):
+        self.backend = backend or LocalBackend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def key(self, cursor, clinic_id, view, params):
+        # The generation is part of the key, so invalidate() never has to find old entries
+        return (clinic_id, generation(cursor, clinic_id), view, params)
+
+    def get(self, key):
+        value = self.backend.get(key)
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, cursor, clinic_id):
+        """Bump the clinic's generation inside the caller's write transaction"""
+        cursor.execute(_BUMP, (clinic_id,))
+        self.backend.discard(clinic_id)
+        self._count("invalidations")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+        counters.update(self.backend.stats())
+        return counters
+
+
+cache = PageCache(_make_backend())
+
+
+def _clinic_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def cached(view_name):
+    """Serve a GET view from the cache; the clinic comes from ?clinic_id= and the other args form the params"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            clinic_id = _clinic_id(request.args.get("clinic_id"))
+            if request.method != "GET" or clinic_id is None:
+                return view(*args, **kwargs)
+            params = tuple(sorted((k, v) for k, v in request.args.items(multi=True) if k != "clinic_id"))
+            key = cache.key(db_pool.get_db().cursor(), clinic_id, view_name, params)
+            page = cache.get(key)
+            if page is not None:
+                return page
+            page = view(*args, **kwargs)
+            if isinstance(page, str) and ERROR_MARKER not in page:
+                cache.set(key, page)
+            return page
+        return wrapper
+    return decorator
+
+
+def invalidate(cursor, clinic_id):
+    """Drop every cached page of a clinic; call in the transaction that writes its patients or analytics, before the commit"""
+    clinic_id = _clinic_id(clinic_id)
+    if clinic_id is not None:
+        cache.invalidate(cursor, clinic_id)
+
+
+def stats():
+    return cache.stats()
+
+
+def init_app(app):
+    """Expose the cache counters at /page_cache_stats on a raw-sqlite app"""
+    app.add_url_rule("/page_cache_stats", "page_cache_stats", lambda: jsonify(stats()))
@@ -0,0 +1,68 @@
+# pagination.py - Keyset (cursor) pagination over a clinic's patients, newest first
+import base64
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+PAGE_SIZES = (25, 50, 100, 250, 500)
+STREAM_CHUNK_SIZE = 500
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a ?per_page= value, clamped to 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(key):
+    """Opaque URL-safe token for a (created_at, id) key"""
+    created_at, row_id = key
+    raw = f"{created_at or ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """(created_at, id) from a token, or None when missing or malformed"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return created_at, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def fetch_page(cursor, columns, clinic_id, after=None, size=DEFAULT_PAGE_SIZE):
+    """One page of patients after a (created_at, id) key; returns (rows, next key or None)
+
+    Seeks on idx_patients_clinic_created, so page 1000 costs the same as page 1
+    """
+    sql = f"SELECT id, created_at, {columns} FROM patients WHERE clinic_id = ?"
+    params = [clinic_id]
+    if after:
+        sql += " AND (created_at, id) < (?, ?)"
+        params.extend(after)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    # One extra row tells us whether another page exists without a COUNT(*)
+    params.append(size + 1)
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    next_key = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_key = (rows[-1][1], rows[-1][0])
+    return [row[2:] for row in rows], next_key
+
+
+def iter_chunks(cursor, columns, clinic_id, chunk_size=STREAM_CHUNK_SIZE):
+    """Every patient of a clinic as successive keyset pages; only one chunk is held at a time"""
+    after = None
+    while True:
+        rows, after = fetch_page(cursor, columns, clinic_id, after, chunk_size)
+        if rows:
+            yield rows
+        if after is None:
+            return
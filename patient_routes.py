@@ -1,9 +1,24 @@
-from flask import request, redirect
-from enhanced_app import app, DATABASE
-import sqlite3
+# patient_routes.py - Patient, analytics and report pages of enhanced_app, as feature blueprints
+from flask import Blueprint, current_app, request, redirect, Response, stream_with_context
+from db_pool import get_db
+import pagination
+import patient_search
+import patient_suggest
+import page_cache
+import clinic_cache
+import report_export
+import report_queries
+import templating
+import addresses
+import analytics_summary
+import job_queue
 from datetime import datetime
 
-@app.route("/add_patient", methods=["GET", "POST"])
+patients_bp = Blueprint("patients", __name__)
+analytics_bp = Blueprint("analytics", __name__)
+reports_bp = Blueprint("reports", __name__)
+
+@patients_bp.route("/add_patient", methods=["GET", "POST"])
 def add_patient():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
@@ -43,17 +58,19 @@ def add_patient():
             last_cleaning_date = request.form.get("last_cleaning_date", "")
             preferred_appointment_time = request.form.get("preferred_appointment_time", "")
             
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute("""INSERT INTO patients (
                 clinic_id, patient_code, name, age, sex, phone, treatment,
-                dob, email, address, emergency_contact_name, emergency_contact_phone,
+                dob, email, address, address_village, address_city, address_state,
+                emergency_contact_name, emergency_contact_phone,
                 medical_history, current_medications, allergies, insurance_provider,
                 insurance_number, previous_dental_work, chief_complaint, pain_level,
                 last_cleaning_date, preferred_appointment_time
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                          (clinic_id, patient_code, name, age, sex, phone, treatment,
-                          dob, email, address, emergency_contact_name, emergency_contact_phone,
+                          dob, email, address, *addresses.parse(address),
+                          emergency_contact_name, emergency_contact_phone,
                           medical_history, current_medications, allergies, insurance_provider,
                           insurance_number, previous_dental_work, chief_complaint, pain_level,
                           last_cleaning_date, preferred_appointment_time))
@@ -89,8 +106,9 @@ def add_patient():
                              (clinic_id, doctor_assigned, datetime.now().strftime('%Y-%m-%d'),
                               1, float(treatment_cost), 5.0, 1))
             
+            page_cache.invalidate(cursor, clinic_id)
             conn.commit()
-            conn.close()
+            patient_suggest.refresh_patient(cursor, clinic_id, patient_code)
             
             return redirect(f"/view_patients?clinic_id={clinic_id}")
         except Exception as e:
@@ -320,22 +338,8 @@ def add_patient():
     </html>
     '''
 
-@app.route("/view_patients")
-def view_patients():
-    clinic_id = request.args.get("clinic_id")
-    if not clinic_id:
-        return redirect("/")
-    
-    try:
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? ORDER BY created_at DESC", (clinic_id,))
-        patients = cursor.fetchall()
-        conn.close()
-        
-        patients_html = ""
-        for patient in patients:
-            patients_html += f'''
+def _patient_row_html(clinic_id, patient):
+    return f'''
             <tr>
                 <td>{patient[0]}</td>
                 <td>{patient[1]}</td>
@@ -343,15 +347,31 @@ def view_patients():
                 <td>{patient[3] or 'N/A'}</td>
                 <td>{patient[4] or 'N/A'}</td>
                 <td>{patient[5] or 'N/A'}</td>
-                <td>{patient[6][:10]}</td>
+                <td>{(patient[6] or '')[:10]}</td>
                 <td>
                     <a href="/edit_patient?clinic_id={clinic_id}&patient_code={patient[0]}" class="btn-edit">✏️ Edit</a>
                     <a href="/view_patient_detail?clinic_id={clinic_id}&patient_code={patient[0]}" class="btn-view">👁️ View</a>
                 </td>
             </tr>
             '''
+
+@patients_bp.route("/view_patients")
+def view_patients():
+    clinic_id = request.args.get("clinic_id")
+    if not clinic_id:
+        return redirect("/")
+    
+    show_all = request.args.get("all") == "1"
+    per_page = pagination.page_size(request.args.get("per_page"))
+    after = pagination.decode_cursor(request.args.get("after"))
+    columns = "patient_code, name, age, sex, phone, treatment, created_at"
+    empty_row = "<tr><td colspan='8' style='text-align: center; color: #666;'>No patients found.</td></tr>"
+    
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
         
-        return f'''
+        header = f'''
         <html>
         <head>
             <title>All Patients</title>
@@ -370,6 +390,7 @@ def view_patients():
         <body>
             <div class="container">
                 <h2>👥 All Patients</h2>
+                <p>Per page: {" ".join(f'<a href="/view_patients?clinic_id={clinic_id}&per_page={size}">{size}</a>' for size in pagination.PAGE_SIZES)} | <a href="/view_patients?clinic_id={clinic_id}&all=1">Show all</a></p>
                 <table class="table">
                     <thead>
                         <tr>
@@ -384,9 +405,13 @@ def view_patients():
                         </tr>
                     </thead>
                     <tbody>
-                        {patients_html if patients_html else "<tr><td colspan='8' style='text-align: center; color: #666;'>No patients found.</td></tr>"}
+        '''
+        
+        def footer(pager_html):
+            return f'''
                     </tbody>
                 </table>
+                <div style="text-align: center;">{pager_html}</div>
                 <div style="text-align: center; margin-top: 20px;">
                     <a href="/search_patients?clinic_id={clinic_id}" class="btn">🔍 Search Patients</a>
                     <a href="/add_patient?clinic_id={clinic_id}" class="btn">➕ Add New Patient</a>
@@ -396,10 +421,34 @@ def view_patients():
         </body>
         </html>
         '''
+        
+        if show_all:
+            # Stream keyset chunks so memory stays flat however large the clinic is
+            def generate():
+                yield header
+                empty = True
+                for chunk in pagination.iter_chunks(conn.cursor(), columns, clinic_id):
+                    empty = False
+                    yield "".join(_patient_row_html(clinic_id, patient) for patient in chunk)
+                if empty:
+                    yield empty_row
+                yield footer(f'<a href="/view_patients?clinic_id={clinic_id}" class="btn">📄 Paginated view</a>')
+            return Response(stream_with_context(generate()), mimetype="text/html")
+        
+        patients, next_key = pagination.fetch_page(cursor, columns, clinic_id, after, per_page)
+        patients_html = "".join(_patient_row_html(clinic_id, patient) for patient in patients) or empty_row
+        
+        pager_html = ""
+        if after:
+            pager_html += f'<a href="/view_patients?clinic_id={clinic_id}&per_page={per_page}" class="btn">⏮ First page</a>'
+        if next_key:
+            pager_html += f'<a href="/view_patients?clinic_id={clinic_id}&per_page={per_page}&after={pagination.encode_cursor(next_key)}" class="btn">Next page →</a>'
+        
+        return header + patients_html + footer(pager_html)
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/dashboard?clinic_id={clinic_id}'>← Back to Dashboard</a>"
 
-@app.route("/search_patients", methods=["GET", "POST"])
+@patients_bp.route("/search_patients", methods=["GET", "POST"])
 def search_patients():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
@@ -411,27 +460,15 @@ def search_patients():
     
     if request.method == "POST":
         search_query = request.form.get("search_query", "")
-        search_type = request.form.get("search_type", "name")
+        search_type = request.form.get("search_type", "all")
+        search_limit = patient_search.clamp_limit(request.form.get("limit", patient_search.DEFAULT_LIMIT))
         
         try:
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             
-            if search_type == "name":
-                cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? AND name LIKE ? ORDER BY created_at DESC", 
-                             (clinic_id, f"%{search_query}%"))
-            elif search_type == "phone":
-                cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? AND phone LIKE ? ORDER BY created_at DESC", 
-                             (clinic_id, f"%{search_query}%"))
-            elif search_type == "patient_code":
-                cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? AND patient_code LIKE ? ORDER BY created_at DESC", 
-                             (clinic_id, f"%{search_query}%"))
-            elif search_type == "treatment":
-                cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? AND treatment LIKE ? ORDER BY created_at DESC", 
-                             (clinic_id, f"%{search_query}%"))
-            
-            patients = cursor.fetchall()
-            conn.close()
+            # Ranked FTS5 prefix search instead of leading-wildcard LIKE scans
+            patients = patient_search.search(cursor, clinic_id, search_query, search_type, search_limit)
             
             if patients:
                 for patient in patients:
@@ -512,10 +549,13 @@ def search_patients():
                     <div class="form-group">
                         <label for="search_type">Search By:</label>
                         <select id="search_type" name="search_type">
+                            <option value="all">All Fields</option>
                             <option value="name">Patient Name</option>
                             <option value="phone">Phone Number</option>
                             <option value="patient_code">Patient Code</option>
                             <option value="treatment">Treatment</option>
+                            <option value="address">Address</option>
+                            <option value="medical_history">Medical History</option>
                         </select>
                     </div>
                     <div class="form-group">
@@ -535,7 +575,7 @@ def search_patients():
     </html>
     '''
 
-@app.route("/edit_patient", methods=["GET", "POST"])
+@patients_bp.route("/edit_patient", methods=["GET", "POST"])
 def edit_patient():
     clinic_id = request.args.get("clinic_id")
     patient_code = request.args.get("patient_code")
@@ -567,22 +607,24 @@ def edit_patient():
             last_cleaning_date = request.form.get("last_cleaning_date", "")
             preferred_appointment_time = request.form.get("preferred_appointment_time", "")
 
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute("""UPDATE patients SET 
                 name=?, age=?, sex=?, phone=?, treatment=?, dob=?, email=?, address=?,
+                address_village=?, address_city=?, address_state=?,
                 emergency_contact_name=?, emergency_contact_phone=?, medical_history=?,
                 current_medications=?, allergies=?, insurance_provider=?, insurance_number=?,
                 previous_dental_work=?, chief_complaint=?, pain_level=?, last_cleaning_date=?,
                 preferred_appointment_time=?
                 WHERE clinic_id=? AND patient_code=?""",
-                         (name, age, sex, phone, treatment, dob, email, address,
+                         (name, age, sex, phone, treatment, dob, email, address, *addresses.parse(address),
                           emergency_contact_name, emergency_contact_phone, medical_history,
                           current_medications, allergies, insurance_provider, insurance_number,
                           previous_dental_work, chief_complaint, pain_level, last_cleaning_date,
                           preferred_appointment_time, clinic_id, patient_code))
+            page_cache.invalidate(cursor, clinic_id)
             conn.commit()
-            conn.close()
+            patient_suggest.refresh_patient(cursor, clinic_id, patient_code)
             
             return f'''
             <html>
@@ -602,11 +644,10 @@ def edit_patient():
     
     # GET request - show edit form
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM patients WHERE clinic_id = ? AND patient_code = ?", (clinic_id, patient_code))
         patient = cursor.fetchone()
-        conn.close()
         
         if not patient:
             return f"<h3>❌ Patient not found!</h3><a href='/view_patients?clinic_id={clinic_id}'>← Back to Patients</a>"
@@ -785,7 +826,7 @@ def edit_patient():
     except Exception as e:
         return f"<h3>❌ Error loading patient: {str(e)}</h3><a href='/view_patients?clinic_id={clinic_id}'>← Back to Patients</a>"
 
-@app.route("/view_patient_detail")
+@patients_bp.route("/view_patient_detail")
 def view_patient_detail():
     clinic_id = request.args.get("clinic_id")
     patient_code = request.args.get("patient_code")
@@ -794,7 +835,7 @@ def view_patient_detail():
         return redirect("/")
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get patient details
@@ -808,7 +849,6 @@ def view_patient_detail():
         cursor.execute("SELECT * FROM patient_analytics WHERE clinic_id = ? AND patient_id = ?", (clinic_id, patient[0]))
         analytics = cursor.fetchall()
         
-        conn.close()
         
         analytics_html = ""
         if analytics:
@@ -926,80 +966,52 @@ def view_patient_detail():
     except Exception as e:
         return f"<h3>❌ Error loading patient details: {str(e)}</h3><a href='/view_patients?clinic_id={clinic_id}'>← Back to Patients</a>"
 
-@app.route("/advanced_analytics")
+@analytics_bp.route("/advanced_analytics")
+@page_cache.cached("advanced_analytics")
 def advanced_analytics():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
-        # Get comprehensive stats
-        cursor.execute("SELECT COUNT(*) FROM patients WHERE clinic_id = ?", (clinic_id,))
-        total_patients = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM patient_analytics WHERE clinic_id = ?", (clinic_id,))
-        total_visits = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT SUM(treatment_cost) FROM patient_analytics WHERE clinic_id = ?", (clinic_id,))
-        total_revenue = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT AVG(treatment_cost) FROM patient_analytics WHERE clinic_id = ? AND treatment_cost > 0", (clinic_id,))
-        avg_cost = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT AVG(satisfaction_rating) FROM patient_analytics WHERE clinic_id = ? AND satisfaction_rating > 0", (clinic_id,))
-        avg_rating = cursor.fetchone()[0] or 0
-        
-        # Get gender distribution
-        cursor.execute("SELECT sex, COUNT(*) FROM patients WHERE clinic_id = ? AND sex IS NOT NULL GROUP BY sex", (clinic_id,))
-        gender_stats = cursor.fetchall()
-        
-        # Get age distribution
-        cursor.execute("SELECT AVG(age) FROM patients WHERE clinic_id = ? AND age IS NOT NULL", (clinic_id,))
-        avg_age = cursor.fetchone()[0] or 0
-        
-        # Get treatment distribution
-        cursor.execute("SELECT treatment, COUNT(*) FROM patients WHERE clinic_id = ? AND treatment IS NOT NULL GROUP BY treatment LIMIT 5", (clinic_id,))
-        treatment_stats = cursor.fetchall()
-        
-        # Get doctor performance
-        cursor.execute("SELECT doctor_assigned, COUNT(*), SUM(treatment_cost), AVG(satisfaction_rating) FROM patient_analytics WHERE clinic_id = ? AND doctor_assigned IS NOT NULL GROUP BY doctor_assigned", (clinic_id,))
-        doctor_stats = cursor.fetchall()
-        
-        # Get monthly revenue
-        cursor.execute("SELECT strftime('%Y-%m', visit_date) as month, SUM(treatment_cost) FROM patient_analytics WHERE clinic_id = ? AND treatment_cost > 0 GROUP BY month ORDER BY month DESC LIMIT 6", (clinic_id,))
-        monthly_revenue = cursor.fetchall()
-        
-        conn.close()
+        # Get comprehensive stats (one pass over patients and one over patient_analytics)
+        summary = analytics_summary.clinic_summary(cursor, clinic_id)
+        total_patients = summary.total_patients
+        total_visits = summary.total_visits
+        total_revenue = summary.total_revenue
+        avg_cost = summary.avg_cost
+        avg_rating = summary.avg_rating
+        avg_age = summary.avg_age
         
         # Build gender stats HTML
         gender_html = ""
-        for gender, count in gender_stats:
+        for gender, count in summary.gender.items():
             percentage = (count / total_patients * 100) if total_patients > 0 else 0
             gender_html += f'<div class="stat-item">👫 {gender}: {count} ({percentage:.1f}%)</div>'
         
         # Build treatment stats HTML
         treatment_html = ""
-        for treatment, count in treatment_stats:
+        for treatment, count in summary.treatments:
             treatment_html += f'<div class="stat-item">🦷 {treatment}: {count} patients</div>'
         
         # Build doctor stats HTML
         doctor_html = ""
-        for doctor, visits, revenue, rating in doctor_stats:
+        for doctor in summary.doctors:
             doctor_html += f'''
             <div class="doctor-card">
-                <h4>👨‍⚕️ {doctor}</h4>
-                <div>Patients: {visits}</div>
-                <div>Revenue: ₹{revenue:.2f}</div>
-                <div>Rating: {'⭐' * int(rating or 0)} ({rating:.1f})</div>
+                <h4>👨‍⚕️ {doctor.name}</h4>
+                <div>Patients: {doctor.visits}</div>
+                <div>Revenue: ₹{doctor.revenue:.2f}</div>
+                <div>Rating: {'⭐' * int(doctor.avg_rating)} ({doctor.avg_rating:.1f})</div>
             </div>
             '''
         
         # Build monthly revenue HTML
         revenue_html = ""
-        for month, revenue in monthly_revenue:
+        for month, revenue in summary.monthly_revenue:
             revenue_html += f'<div class="revenue-item">📅 {month}: ₹{revenue:.2f}</div>'
         
         return f'''
@@ -1088,85 +1100,38 @@ def advanced_analytics():
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/dashboard?clinic_id={clinic_id}'>← Back to Dashboard</a>"
 
-@app.route("/address_analytics")
+@analytics_bp.route("/address_analytics")
 def address_analytics():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
     try:
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        
-        # Get all patients with addresses
-        cursor.execute("SELECT address FROM patients WHERE clinic_id = ? AND address IS NOT NULL AND address != ''", (clinic_id,))
-        addresses = cursor.fetchall()
-        
-        # Parse addresses to extract city and state
-        city_stats = {}
-        state_stats = {}
-        village_town_stats = {}
-        
-        for addr_tuple in addresses:
-            address = addr_tuple[0]
-            if address and ',' in address:
-                parts = [part.strip() for part in address.split(',')]
-                if len(parts) >= 3:
-                    village_town = parts[0]
-                    city = parts[1]
-                    state_part = parts[2]
-                    
-                    # Extract state (remove "India" if present)
-                    state = state_part.replace('India', '').strip()
-                    
-                    # Count occurrences
-                    village_town_stats[village_town] = village_town_stats.get(village_town, 0) + 1
-                    city_stats[city] = city_stats.get(city, 0) + 1
-                    state_stats[state] = state_stats.get(state, 0) + 1
-        
-        # Get top locations
-        top_villages = sorted(village_town_stats.items(), key=lambda x: x[1], reverse=True)[:10]
-        top_cities = sorted(city_stats.items(), key=lambda x: x[1], reverse=True)[:10]
-        top_states = sorted(state_stats.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        # Get patient analytics by location
-        cursor.execute("""
-            SELECT p.address, COUNT(*), AVG(pa.treatment_cost), AVG(pa.satisfaction_rating)
-            FROM patients p
-            LEFT JOIN patient_analytics pa ON p.id = pa.patient_id
-            WHERE p.clinic_id = ? AND p.address IS NOT NULL
-            GROUP BY p.address
-            ORDER BY COUNT(*) DESC
-            LIMIT 15
-        """, (clinic_id,))
-        location_analytics = cursor.fetchall()
-        
-        conn.close()
+        # Rollup buckets plus one indexed join for the busiest villages; cheap enough to serve inline
+        summary = analytics_summary.address_summary(get_db().cursor(), clinic_id)
         
         # Build HTML for statistics
         village_html = ""
-        for village, count in top_villages:
+        for village, count in summary.top_villages:
             village_html += f'<div class="location-item">🏘️ {village}: {count} patients</div>'
         
         city_html = ""
-        for city, count in top_cities:
+        for city, count in summary.top_cities:
             city_html += f'<div class="location-item">🏙️ {city}: {count} patients</div>'
         
         state_html = ""
-        for state, count in top_states:
+        for state, count in summary.top_states:
             state_html += f'<div class="location-item">🗺️ {state}: {count} patients</div>'
         
         # Build analytics HTML
         analytics_html = ""
-        for location, patient_count, avg_cost, avg_rating in location_analytics:
-            location_parts = location.split(',') if location else ['Unknown']
-            display_location = location_parts[0] if location_parts else 'Unknown'
+        for location in summary.locations:
             analytics_html += f'''
             <div class="analytics-item">
-                <h4>📍 {display_location}</h4>
-                <div>👥 Patients: {patient_count}</div>
-                <div>💰 Avg Cost: ₹{avg_cost:.2f if avg_cost else 0}</div>
-                <div>⭐ Avg Rating: {avg_rating:.1f if avg_rating else 0}/5</div>
+                <h4>📍 {location.location}</h4>
+                <div>👥 Patients: {location.patients}</div>
+                <div>💰 Avg Cost: ₹{location.avg_cost:.2f}</div>
+                <div>⭐ Avg Rating: {location.avg_rating:.1f}/5</div>
             </div>
             '''
         
@@ -1197,19 +1162,19 @@ def address_analytics():
                 
                 <div class="stats-overview">
                     <div class="stat-card">
-                        <div class="stat-value">{len(village_town_stats)}</div>
+                        <div class="stat-value">{summary.village_count}</div>
                         <div>🏘️ Villages/Towns</div>
                     </div>
                     <div class="stat-card">
-                        <div class="stat-value">{len(city_stats)}</div>
+                        <div class="stat-value">{summary.city_count}</div>
                         <div>🏙️ Cities</div>
                     </div>
                     <div class="stat-card">
-                        <div class="stat-value">{len(state_stats)}</div>
+                        <div class="stat-value">{summary.state_count}</div>
                         <div>🗺️ States</div>
                     </div>
                     <div class="stat-card">
-                        <div class="stat-value">{len(addresses)}</div>
+                        <div class="stat-value">{summary.patients_with_address}</div>
                         <div>👥 Total Patients</div>
                     </div>
                 </div>
@@ -1247,85 +1212,37 @@ def address_analytics():
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/dashboard?clinic_id={clinic_id}'>← Back to Dashboard</a>"
 
-@app.route("/generate_report")
+@reports_bp.route("/generate_report")
 def generate_report():
     clinic_id = request.args.get("clinic_id")
+    # html (default) or a download: csv, xlsx, jsonl
+    export_format = request.args.get("format", "html")
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         clinic_name = clinic_info[0] if clinic_info else "Unknown Clinic"
         
-        # Get patient data
-        cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? ORDER BY created_at DESC", (clinic_id,))
-        patients = cursor.fetchall()
-        
-        conn.close()
-        
-        report_rows = ""
-        for patient in patients:
-            report_rows += f'''
-            <tr>
-                <td>{patient[0]}</td>
-                <td>{patient[1]}</td>
-                <td>{patient[2] or 'N/A'}</td>
-                <td>{patient[3] or 'N/A'}</td>
-                <td>{patient[4] or 'N/A'}</td>
-                <td>{patient[5] or 'N/A'}</td>
-                <td>{patient[6][:10]}</td>
-            </tr>
-            '''
+        if export_format != "html" and export_format not in report_export.FORMATS:
+            return f"<h3>❌ Error: Unknown export format '{export_format}'</h3><a href='/dashboard?clinic_id={clinic_id}'>← Back to Dashboard</a>"
         
-        return f'''
-        <html>
-        <head>
-            <title>Patient Report - {clinic_name}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                .header {{ text-align: center; background: #f8f9fa; padding: 20px; border-radius: 8px; margin-bottom: 20px; }}
-                .table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                .table th, .table td {{ border: 1px solid #ddd; padding: 8px; text-align: left; font-size: 12px; }}
-                .table th {{ background: #007bff; color: white; }}
-                .btn {{ padding: 10px 20px; margin: 10px; background: #28a745; color: white; border: none; border-radius: 5px; cursor: pointer; text-decoration: none; display: inline-block; }}
-                @media print {{ .no-print {{ display: none; }} }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>📄 Patient Report</h1>
-                <h2>{clinic_name}</h2>
-                <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-            </div>
-            
-            <table class="table">
-                <thead>
-                    <tr>
-                        <th>Patient Code</th>
-                        <th>Name</th>
-                        <th>Age</th>
-                        <th>Gender</th>
-                        <th>Phone</th>
-                        <th>Treatment</th>
-                        <th>Added Date</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {report_rows if report_rows else "<tr><td colspan='7' style='text-align: center; color: #666;'>No patients found.</td></tr>"}
-                </tbody>
-            </table>
-            
-            <div class="no-print" style="text-align: center; margin-top: 30px;">
-                <button onclick="window.print()" class="btn">🖨️ Print Report</button>
-                <a href="/dashboard?clinic_id={clinic_id}" class="btn">🏠 Back to Dashboard</a>
-            </div>
-        </body>
-        </html>
-        '''
+        # Get patient data
+        download_name = report_export.filename(clinic_name, "patient", export_format) if export_format != "html" else None
+        if export_format != "html" and request.args.get("background"):
+            job = job_queue.submit_export(current_app.config["DATABASE"], "patients", clinic_id, export_format, download_name)
+            return job_queue.pending_page(job, "Preparing Patient Report", f"/generate_report?clinic_id={clinic_id}")
+        report_queries.execute(cursor, "patients", clinic_id)
+        if export_format != "html":
+            return report_export.export_response(cursor, report_queries.REPORTS["patients"].columns, export_format, download_name)
+        # Rows are rendered and sent a batch at a time as the cursor steps through them
+        row_batches = templating.render_batches("clinic/_patient_report_rows.html", report_export.iter_batches(cursor))
+        return templating.stream("clinic/patient_report.html", clinic_id=clinic_id, clinic_name=clinic_name,
+                                 columns=report_queries.REPORTS["patients"].columns,
+                                 generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), row_batches=row_batches)
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/dashboard?clinic_id={clinic_id}'>← Back to Dashboard</a>"
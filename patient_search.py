@@ -0,0 +1,141 @@
+# patient_search.py - FTS5 full-text patient search kept in sync with the patients table by triggers
+import re
+import sqlite3
+
+# Indexed patient columns, in FTS column order, with their bm25 weights
+FIELDS = [
+    ("name", 10.0),
+    ("patient_code", 8.0),
+    ("phone", 6.0),
+    ("treatment", 4.0),
+    ("address", 1.5),
+    ("medical_history", 1.0),
+]
+COLUMNS = [name for name, _ in FIELDS]
+# clinic_id is indexed too (weight 0) so the clinic filter runs inside the FTS lookup
+INDEXED = COLUMNS + ["clinic_id"]
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+# Only the newest matches are ranked, so a term shared by half the clinic stays cheap
+CANDIDATE_LIMIT = 1000
+
+RESULT_COLUMNS = "p.patient_code, p.name, p.age, p.sex, p.phone, p.treatment, p.created_at"
+
+# External-content table: the text lives only in patients, FTS stores just the inverted index
+FTS_TABLE = f'''CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5(
+    {", ".join(INDEXED)},
+    content='patients', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+)'''
+
+_new = ", ".join(f"new.{c}" for c in INDEXED)
+_old = ", ".join(f"old.{c}" for c in INDEXED)
+TRIGGERS = [
+    f'''CREATE TRIGGER IF NOT EXISTS patients_fts_insert AFTER INSERT ON patients BEGIN
+        INSERT INTO patients_fts (rowid, {", ".join(INDEXED)}) VALUES (new.id, {_new});
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS patients_fts_delete AFTER DELETE ON patients BEGIN
+        INSERT INTO patients_fts (patients_fts, rowid, {", ".join(INDEXED)}) VALUES ('delete', old.id, {_old});
+    END''',
+    # Only re-index when a searchable column actually changed
+    f'''CREATE TRIGGER IF NOT EXISTS patients_fts_update AFTER UPDATE OF {", ".join(INDEXED)} ON patients BEGIN
+        INSERT INTO patients_fts (patients_fts, rowid, {", ".join(INDEXED)}) VALUES ('delete', old.id, {_old});
+        INSERT INTO patients_fts (rowid, {", ".join(INDEXED)}) VALUES (new.id, {_new});
+    END''',
+]
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _table_exists(cursor, name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def ensure_schema(cursor):
+    """Create the FTS index and triggers, indexing existing patients on first run
+
+    Returns False when this SQLite build lacks FTS5 or the patients table lacks a column
+    """
+    cursor.execute("PRAGMA table_info(patients)")
+    if not set(INDEXED) <= {row[1] for row in cursor.fetchall()}:
+        return False
+    created = not _table_exists(cursor, "patients_fts")
+    try:
+        cursor.execute(FTS_TABLE)
+    except sqlite3.OperationalError:
+        return False
+    for trigger in TRIGGERS:
+        cursor.execute(trigger)
+    if created:
+        rebuild(cursor)
+    return True
+
+
+def rebuild(cursor):
+    """Re-index every patient from the content table"""
+    cursor.execute("INSERT INTO patients_fts (patients_fts) VALUES ('rebuild')")
+
+
+def match_expression(query, field=None, clinic_id=None):
+    """Turn free text into an FTS5 prefix query, e.g. 'jo smi' -> '"jo"* "smi"*'
+
+    Every term is quoted, so user input can never inject FTS5 syntax
+    """
+    terms = _TOKEN.findall(query or "")
+    if not terms:
+        return None
+    expression = " ".join(f'"{term}"*' for term in terms)
+    if field in COLUMNS:
+        expression = f"{field} : ({expression})"
+    else:
+        expression = f"{{{' '.join(COLUMNS)}}} : ({expression})"
+    if clinic_id is not None:
+        expression = f'clinic_id : "{int(clinic_id)}" AND {expression}'
+    return expression
+
+
+def clamp_limit(limit):
+    try:
+        return max(1, min(int(limit), MAX_LIMIT))
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+
+
+def search(cursor, clinic_id, query, field=None, limit=DEFAULT_LIMIT):
+    """Best-ranked patients of a clinic matching query; falls back to LIKE without FTS"""
+    limit = clamp_limit(limit)
+    expression = match_expression(query, field, clinic_id)
+    if expression is None:
+        return []
+    if not _table_exists(cursor, "patients_fts"):
+        return search_like(cursor, clinic_id, query, field, limit)
+    weights = ", ".join(str(weight) for _, weight in FIELDS + [("clinic_id", 0.0)])
+    cursor.execute(f"""
+        SELECT {RESULT_COLUMNS}
+        FROM (
+            SELECT rowid, bm25(patients_fts, {weights}) AS score
+            FROM patients_fts
+            WHERE patients_fts MATCH ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) hits
+        JOIN patients p ON p.id = hits.rowid
+        WHERE p.clinic_id = ?
+        ORDER BY hits.score, p.created_at DESC
+        LIMIT ?
+    """, (expression, CANDIDATE_LIMIT, clinic_id, limit))
+    return cursor.fetchall()
+
+
+def search_like(cursor, clinic_id, query, field=None, limit=DEFAULT_LIMIT):
+    """The original substring scan; kept for builds without FTS5 and for benchmarking"""
+    field = field if field in COLUMNS else "name"
+    cursor.execute(f"""
+        SELECT {RESULT_COLUMNS} FROM patients p
+        WHERE p.clinic_id = ? AND p.{field} LIKE ?
+        ORDER BY p.created_at DESC
+        LIMIT ?
+    """, (clinic_id, f"%{query}%", clamp_limit(limit)))
+    return cursor.fetchall()
@@ -0,0 +1,307 @@
+# patient_suggest.py - Type-ahead patient suggestions from a per-clinic in-memory prefix index
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict
+
+from flask import current_app, jsonify, request
+
+import db_pool
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MIN_PREFIX = 1
+# Patients added by other workers are pulled in as a delta this often...
+SYNC_SECONDS = float(os.environ.get("SUGGEST_SYNC_SECONDS", "5"))
+# ...and their edits arrive with the periodic background rebuild
+INDEX_TTL_SECONDS = int(os.environ.get("SUGGEST_INDEX_TTL", "300"))
+# Indexes kept per worker; the least recently searched clinic is dropped and rebuilt on its next lookup
+MAX_INDEXES = int(os.environ.get("SUGGEST_MAX_INDEXES", "256"))
+
+_NON_DIGIT = re.compile(r"\D+")
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace: ' Müller  A' -> 'muller a'"""
+    text = str(text or "")
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+def phone_digits(phone):
+    return _NON_DIGIT.sub("", str(phone or ""))
+
+
+def keys_for(patient_code, name, phone):
+    """Every prefix-searchable key of one patient"""
+    keys = set()
+    full_name = normalize(name)
+    if full_name:
+        keys.add(full_name)
+        # Surnames and middle names: "sharma" finds "Priya Sharma"
+        for position, char in enumerate(full_name):
+            if char == " ":
+                keys.add(full_name[position + 1:])
+    if patient_code:
+        code = normalize(patient_code)
+        keys.add(code)
+        # "p0042" finds "clinic0001-p0042"
+        if "-" in code:
+            keys.add(code.rsplit("-", 1)[1])
+    digits = phone_digits(phone)
+    if digits:
+        keys.add(digits)
+        # Local number without the country code: "98765" finds "+91 98765 43210"
+        if len(digits) > 10:
+            keys.add(digits[-10:])
+    return keys
+
+
+class PrefixIndex:
+    """Sorted parallel key/id arrays for one clinic; lookups are a bisect plus a short scan"""
+
+    def __init__(self):
+        self.keys = []
+        self.ids = []
+        self.patients = {}
+        self.max_id = 0
+        self.loaded_at = self.synced_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _insert(self, key, patient_id):
+        position = bisect_left(self.keys, key)
+        self.keys.insert(position, key)
+        self.ids.insert(position, patient_id)
+
+    def _remove(self, key, patient_id):
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == patient_id:
+                del self.keys[position]
+                del self.ids[position]
+                return
+            position += 1
+
+    def load(self, rows):
+        """Bulk build from (id, patient_code, name, phone) rows"""
+        keys = []
+        ids = []
+        for patient_id, patient_code, name, phone in rows:
+            self.patients[patient_id] = (patient_code, name, phone)
+            self.max_id = max(self.max_id, patient_id)
+            for key in keys_for(patient_code, name, phone):
+                keys.append(key)
+                ids.append(patient_id)
+        # Sorting positions by key avoids building and comparing (key, id) tuples
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.ids = [ids[i] for i in order]
+
+    def upsert(self, patient_id, patient_code, name, phone):
+        with self._lock:
+            self.max_id = max(self.max_id, patient_id)
+            self.discard(patient_id)
+            self.patients[patient_id] = (patient_code, name, phone)
+            for key in keys_for(patient_code, name, phone):
+                self._insert(key, patient_id)
+
+    def discard(self, patient_id):
+        old = self.patients.pop(patient_id, None)
+        if old:
+            for key in keys_for(*old):
+                self._remove(key, patient_id)
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        """Up to limit distinct patients with any key starting with prefix"""
+        text = normalize(prefix)
+        digits = phone_digits(prefix)
+        probes = [text]
+        # "98765-43" typed with separators still matches the stored digits
+        if digits and digits != text:
+            probes.append(digits)
+        found = []
+        seen = set()
+        with self._lock:
+            for probe in probes:
+                position = bisect_left(self.keys, probe)
+                while position < len(self.keys) and len(found) < limit:
+                    if not self.keys[position].startswith(probe):
+                        break
+                    patient_id = self.ids[position]
+                    if patient_id not in seen:
+                        seen.add(patient_id)
+                        found.append(patient_id)
+                    position += 1
+        return [self.patients[patient_id] for patient_id in found]
+
+
+# (database, clinic_id) -> PrefixIndex in LRU order; _indexes_lock guards it and the maps below, never a build
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+# (database, clinic_id) -> lock held while that clinic's first index is built
+_building = {}
+# (database, clinic_id) -> rows written while a background rebuild is reading the table
+_refreshing = {}
+# (database, clinic_id) of the indexes whose new-patient delta is being read
+_syncing = set()
+
+
+def _phone_column(cursor):
+    # dental_clinic.db stores phone, simple_clinic.db stores mobile
+    cursor.execute("PRAGMA table_info(patients)")
+    columns = {row[1] for row in cursor.fetchall()}
+    return "phone" if "phone" in columns else "mobile"
+
+
+def _build(database, clinic_id):
+    index = PrefixIndex()
+    with db_pool.get_pool(database).connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, patient_code, name, {_phone_column(cursor)} FROM patients WHERE clinic_id = ?",
+                       (clinic_id,))
+        index.load(cursor.fetchall())
+    return index
+
+
+def _store(key, index):
+    # Call with _indexes_lock held
+    _indexes[key] = index
+    _indexes.move_to_end(key)
+    while len(_indexes) > MAX_INDEXES:
+        _indexes.popitem(last=False)
+
+
+def _sync_new_patients(database, clinic_id, index):
+    """Add patients created since the index last looked; a seek on idx_patients_clinic_id, not a rebuild"""
+    with db_pool.get_pool(database).connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, patient_code, name, {_phone_column(cursor)} FROM patients WHERE clinic_id = ? AND id > ?",
+                       (clinic_id, index.max_id))
+        for row in cursor.fetchall():
+            index.upsert(*row)
+
+
+def _sync_in_background(database, clinic_id, index):
+    def run():
+        try:
+            _sync_new_patients(database, clinic_id, index)
+        except Exception as e:
+            print(f"⚠️ Suggest index sync failed for clinic {clinic_id}: {e}")
+        finally:
+            with _indexes_lock:
+                _syncing.discard((database, clinic_id))
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _refresh_in_background(database, clinic_id):
+    def run():
+        try:
+            index = _build(database, clinic_id)
+        except Exception as e:
+            print(f"⚠️ Suggest index rebuild failed for clinic {clinic_id}: {e}")
+            index = None
+        with _indexes_lock:
+            pending = _refreshing.pop((database, clinic_id), [])
+            if index is not None:
+                for row in pending:
+                    index.upsert(*row)
+                _store((database, clinic_id), index)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_index(database, clinic_id):
+    """The clinic's index; built on first use, topped up with new patients, rebuilt in the background after the TTL
+
+    Requests keep reading the current index while a sync or rebuild runs, so only the very first lookup reads the table
+    """
+    key = (database, int(clinic_id))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+        else:
+            building = _building.setdefault(key, threading.Lock())
+    if index is None:
+        # Only lookups for this clinic wait on its build; other clinics are served meanwhile
+        with building:
+            with _indexes_lock:
+                index = _indexes.get(key)
+            if index is None:
+                try:
+                    index = _build(*key)
+                    with _indexes_lock:
+                        _store(key, index)
+                finally:
+                    with _indexes_lock:
+                        _building.pop(key, None)
+        return index
+    now = time.monotonic()
+    if now - index.synced_at >= SYNC_SECONDS or now - index.loaded_at >= INDEX_TTL_SECONDS:
+        with _indexes_lock:
+            if now - index.loaded_at >= INDEX_TTL_SECONDS:
+                if key not in _refreshing:
+                    _refreshing[key] = []
+                    _refresh_in_background(*key)
+            elif key not in _syncing:
+                _syncing.add(key)
+                index.synced_at = now
+                _sync_in_background(*key, index)
+    return index
+
+
+def refresh_patient(cursor, clinic_id, patient_code):
+    """Re-index one patient after add/edit; a no-op until the clinic's index is first used"""
+    key = (current_app.config["DATABASE"], int(clinic_id))
+    index = _indexes.get(key)
+    if index is None:
+        return
+    cursor.execute(f"SELECT id, patient_code, name, {_phone_column(cursor)} FROM patients WHERE clinic_id = ? AND patient_code = ?",
+                   (key[1], patient_code))
+    row = cursor.fetchone()
+    if row:
+        index.upsert(*row)
+        with _indexes_lock:
+            if key in _refreshing:
+                _refreshing[key].append(row)
+
+
+def invalidate(clinic_id=None, database=None):
+    """Drop one clinic's index (or all of them); the next lookup rebuilds it"""
+    with _indexes_lock:
+        if clinic_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop((database or current_app.config["DATABASE"], int(clinic_id)), None)
+
+
+def suggest_view():
+    clinic_id = request.args.get("clinic_id", type=int)
+    query = request.args.get("q", "")
+    if not clinic_id:
+        return jsonify({"error": "clinic_id is required"}), 400
+    limit = max(1, min(request.args.get("limit", DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    started = time.perf_counter()
+    suggestions = []
+    if len(query.strip()) >= MIN_PREFIX:
+        index = get_index(current_app.config["DATABASE"], clinic_id)
+        suggestions = [
+            {"patient_code": patient_code, "name": name, "phone": phone}
+            for patient_code, name, phone in index.suggest(query, limit)
+        ]
+    return jsonify({
+        "query": query,
+        "suggestions": suggestions,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+    })
+
+
+def init_app(app):
+    """Register /api/patients/suggest?clinic_id=&q=&limit= on a raw-sqlite app"""
+    app.add_url_rule("/api/patients/suggest", "patient_suggest", suggest_view)
@@ -0,0 +1,167 @@
+# report_export.py - Stream generate_report rows as CSV, XLSX or JSON Lines in fixed-size batches
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+import zlib
+from datetime import date
+from xml.sax.saxutils import escape as xml_escape
+
+from flask import Response, request, stream_with_context
+
+BATCH_SIZE = int(os.environ.get("REPORT_BATCH_SIZE", "1000"))
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+# Already deflated inside the zip container; gzip on top only burns CPU
+PRECOMPRESSED = {"xlsx"}
+
+# Control characters are not allowed in XML 1.0 text
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def iter_batches(cursor, batch_size=BATCH_SIZE):
+    """Step an executed cursor batch_size rows at a time; SQLite produces rows as they are fetched"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The BOM makes Excel read ₹ and non-Latin names as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow([label for _, label in columns])
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def jsonl_chunks(columns, batches):
+    keys = [key for key, _ in columns]
+    for rows in batches:
+        lines = [json.dumps(dict(zip(keys, row)), ensure_ascii=False, default=str) for row in rows]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ZipSink:
+    """Write-only, unseekable file object: zipfile streams into it, the generator drains it per batch"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Report" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = xml_escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return "<row>" + "".join(_xlsx_cell(value) for value in values) + "</row>"
+
+
+def xlsx_chunks(columns, batches):
+    """A one-sheet workbook with inline strings, so no shared-string table has to be held until the end"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, xml in _XLSX_PARTS.items():
+            workbook.writestr(name, xml)
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xlsx_row([label for _, label in columns]).encode("utf-8"))
+            for rows in batches:
+                sheet.write("".join(_xlsx_row(row) for row in rows).encode("utf-8"))
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+WRITERS = {"csv": csv_chunks, "jsonl": jsonl_chunks, "xlsx": xlsx_chunks}
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def filename(clinic_name, report_type, fmt):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", clinic_name or "clinic").strip("_") or "clinic"
+    return f"{slug}_{report_type}_report_{date.today():%Y%m%d}.{FORMATS[fmt][1]}"
+
+
+def export_response(cursor, columns, fmt, download_name, batch_size=BATCH_SIZE):
+    """Stream an executed cursor as a file download; only one batch of rows is in memory at a time
+
+    columns is [(json_key, header_label), ...] in SELECT order. The body is gzip-encoded when the
+    client accepts it, except for xlsx which is already compressed
+    """
+    content_type, _ = FORMATS[fmt]
+    chunks = WRITERS[fmt](columns, iter_batches(cursor, batch_size))
+    headers = {"Content-Disposition": f'attachment; filename="{download_name}"', "Vary": "Accept-Encoding"}
+    if fmt not in PRECOMPRESSED and request.accept_encodings["gzip"]:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(stream_with_context(chunks), content_type=content_type, headers=headers)
@@ -0,0 +1,63 @@
+# report_queries.py - The downloadable reports, by name, for the report pages and the background export jobs
+from collections import namedtuple
+
+import rollups
+
+# sql takes the clinic id as its only parameter; total(cursor, clinic_id) gives the row count without
+# a scan, or is None when no rollup holds it
+Report = namedtuple("Report", ["sql", "columns", "total"])
+
+
+def _revenue_transactions(cursor, clinic_id):
+    return rollups.revenue_summary(cursor, clinic_id)[2]
+
+
+REPORTS = {
+    # simple_clinic.db (ultra_simple_app)
+    "comprehensive": Report(
+        """SELECT p.patient_code, p.name, p.age, p.sex, p.treatment,
+                  pa.visit_date, pa.diagnosis, pa.treatment_cost, pa.satisfaction_rating, pa.doctor_assigned
+           FROM patients p
+           LEFT JOIN patient_analytics pa ON p.id = pa.patient_id
+           WHERE p.clinic_id = ?
+           ORDER BY p.created_at DESC""",
+        [("patient_code", "Patient ID"), ("name", "Name"), ("age", "Age"), ("sex", "Gender"),
+         ("treatment", "Treatment"), ("visit_date", "Visit Date"), ("diagnosis", "Diagnosis"),
+         ("treatment_cost", "Cost (₹)"), ("satisfaction_rating", "Rating"), ("doctor_assigned", "Doctor")],
+        None,
+    ),
+    "financial": Report(
+        """SELECT transaction_date, service_type, final_amount, payment_method, payment_status
+           FROM revenue_analytics
+           WHERE clinic_id = ?
+           ORDER BY transaction_date DESC""",
+        [("transaction_date", "Date"), ("service_type", "Service"), ("final_amount", "Amount (₹)"),
+         ("payment_method", "Payment Method"), ("payment_status", "Status")],
+        _revenue_transactions,
+    ),
+    # dental_clinic.db: working_app's comprehensive report and the enhanced app's patient list
+    "visits": Report(
+        """SELECT p.patient_code, p.name, p.age, p.sex, p.treatment,
+                  pa.visit_date, pa.diagnosis, pa.treatment_cost, pa.satisfaction_rating
+           FROM patients p
+           LEFT JOIN patient_analytics pa ON p.id = pa.patient_id
+           WHERE p.clinic_id = ?
+           ORDER BY p.created_at DESC""",
+        [("patient_code", "Patient Code"), ("name", "Name"), ("age", "Age"), ("sex", "Gender"),
+         ("treatment", "Treatment"), ("visit_date", "Visit Date"), ("diagnosis", "Diagnosis"),
+         ("treatment_cost", "Cost"), ("satisfaction_rating", "Rating")],
+        None,
+    ),
+    "patients": Report(
+        "SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? ORDER BY created_at DESC",
+        [("patient_code", "Patient Code"), ("name", "Name"), ("age", "Age"), ("sex", "Gender"),
+         ("phone", "Phone"), ("treatment", "Treatment"), ("created_at", "Added Date")],
+        None,
+    ),
+}
+
+
+def execute(cursor, name, clinic_id):
+    """Run a named report for one clinic; rows are then stepped from the cursor"""
+    cursor.execute(REPORTS[name].sql, (clinic_id,))
+    return cursor
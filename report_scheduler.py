@@ -0,0 +1,296 @@
+# report_scheduler.py - Materialize due scheduled custom_reports off-peak, one scan per clinic and data window
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import report_export
+
+OUTPUT_DIR = os.environ.get("CUSTOM_REPORTS_DIR", os.path.join(tempfile.gettempdir(), "dental_scheduled_reports"))
+# Local hours [start, end) in which the scheduler process generates reports
+OFF_PEAK_HOURS = os.environ.get("REPORT_SCHEDULER_HOURS", "1-5")
+POLL_SECONDS = int(os.environ.get("REPORT_SCHEDULER_POLL", "300"))
+
+FREQUENCIES = {"daily": timedelta(days=1), "weekly": timedelta(days=7), "monthly": timedelta(days=30)}
+# Default data window per frequency: each run covers the period since the previous one
+DEFAULT_WINDOW_DAYS = {"daily": 1, "weekly": 7, "monthly": 30}
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# A daily report that ran at 01:05 is due again from 00:05, so polling delay never pushes it out of the window
+DUE_SLACK = timedelta(hours=1)
+
+# report_type -> (SELECT ... FROM ... WHERE clinic_id = ?, window column, [(key, header), ...]); the
+# window predicate and ordering are appended, so the clinic+date index serves both
+SOURCES = {
+    "comprehensive": (
+        """SELECT p.patient_code, p.name, p.age, p.sex, p.treatment, p.created_at,
+                  pa.visit_date, pa.diagnosis, pa.treatment_cost, pa.satisfaction_rating, pa.doctor_assigned
+           FROM patients p
+           LEFT JOIN patient_analytics pa ON p.id = pa.patient_id
+           WHERE p.clinic_id = ?""",
+        "p.created_at",
+        [("patient_code", "Patient ID"), ("name", "Name"), ("age", "Age"), ("sex", "Gender"),
+         ("treatment", "Treatment"), ("created_at", "Registered"), ("visit_date", "Visit Date"),
+         ("diagnosis", "Diagnosis"), ("treatment_cost", "Cost (₹)"), ("satisfaction_rating", "Rating"),
+         ("doctor_assigned", "Doctor")],
+    ),
+    "financial": (
+        """SELECT transaction_date, service_type, final_amount, payment_method, payment_status
+           FROM revenue_analytics
+           WHERE clinic_id = ?""",
+        "transaction_date",
+        [("transaction_date", "Date"), ("service_type", "Service"), ("final_amount", "Amount (₹)"),
+         ("payment_method", "Payment Method"), ("payment_status", "Status")],
+    ),
+}
+
+RUNS_TABLE = '''CREATE TABLE IF NOT EXISTS custom_report_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id INTEGER NOT NULL,
+    clinic_id INTEGER,
+    generated_at TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    scan_ms REAL,
+    batch_reports INTEGER NOT NULL DEFAULT 1,
+    output_path TEXT,
+    error TEXT,
+    FOREIGN KEY (report_id) REFERENCES custom_reports (id)
+)'''
+RUNS_INDEX = "CREATE INDEX IF NOT EXISTS idx_custom_report_runs_report ON custom_report_runs (report_id, generated_at)"
+
+
+def ensure_schema(cursor):
+    cursor.execute(RUNS_TABLE)
+    cursor.execute(RUNS_INDEX)
+
+
+def _filter_value(value):
+    """(value, as a number or None, as text): a filter saved from a form as "30" still matches an INTEGER 30"""
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            number = None
+        return value, number, value
+    if isinstance(value, (int, float)):
+        # 30.0 from JSON is the "30" a TEXT column holds
+        text = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+        return value, value, text
+    return value, None, None
+
+
+class ScheduledReport:
+    """One custom_reports row, with its filters and columns resolved against SOURCES"""
+
+    def __init__(self, row):
+        self.id, self.clinic_id, self.name, self.report_type, filters, columns, self.frequency, self.last_generated = row
+        self.filters = json.loads(filters) if filters else {}
+        self.window_days = self.filters.pop("window_days", DEFAULT_WINDOW_DAYS.get(self.frequency, 0))
+        keys = [key for key, _ in SOURCES[self.report_type][2]]
+        wanted = json.loads(columns) if columns else keys
+        unknown = [key for key in list(wanted) + list(self.filters) if key not in keys]
+        if unknown:
+            raise ValueError(f"unknown column(s) for a {self.report_type} report: {', '.join(unknown)}")
+        self.columns = [column for column in SOURCES[self.report_type][2] if column[0] in wanted]
+        self.positions = [keys.index(key) for key, _ in self.columns]
+        self.filter_positions = [(keys.index(key), *_filter_value(value)) for key, value in self.filters.items()]
+
+    def is_due(self, now):
+        if not self.last_generated:
+            return True
+        interval = FREQUENCIES.get(self.frequency)
+        return interval is not None and datetime.strptime(self.last_generated, TIMESTAMP_FORMAT) + interval - DUE_SLACK <= now
+
+    def window_start(self, now):
+        """Start of the data window as a date string; None reads the whole history"""
+        return (now - timedelta(days=self.window_days)).strftime("%Y-%m-%d") if self.window_days else None
+
+    def matches(self, row):
+        """Filters compare by the stored value's type; SQLite columns do not hold the JSON's types"""
+        for position, value, number, text in self.filter_positions:
+            cell = row[position]
+            if cell == value:
+                continue
+            if isinstance(cell, str):
+                if cell != text:
+                    return False
+            elif isinstance(cell, (int, float)):
+                if number is None or cell != number:
+                    return False
+            else:
+                return False
+        return True
+
+
+def output_path(report_id):
+    return os.path.join(OUTPUT_DIR, f"{report_id}.csv")
+
+
+def due_reports(cursor, now, clinic_id=None):
+    """Scheduled reports whose frequency has elapsed since last_generated, and rows that could not be read"""
+    sql = """SELECT id, clinic_id, report_name, report_type, filters, columns, schedule_frequency, last_generated
+             FROM custom_reports WHERE is_scheduled = 1"""
+    args = ()
+    if clinic_id is not None:
+        sql += " AND clinic_id = ?"
+        args = (clinic_id,)
+    due, broken = [], []
+    for row in cursor.execute(sql, args).fetchall():
+        try:
+            if row[3] not in SOURCES:
+                raise ValueError(f"report type '{row[3]}' cannot be scheduled")
+            report = ScheduledReport(row)
+            if report.is_due(now):
+                due.append(report)
+        except (ValueError, TypeError) as e:
+            broken.append((row[0], row[1], str(e)))
+    return due, broken
+
+
+def _batches(reports, now):
+    # One scan serves every report of a clinic that reads the same table over the same window
+    groups = {}
+    for report in reports:
+        groups.setdefault((report.clinic_id, report.report_type, report.window_start(now)), []).append(report)
+    return groups
+
+
+def generate_batch(conn, clinic_id, report_type, since, reports, now):
+    """Scan one clinic's rows for a window once and write every report in the batch from that scan"""
+    base_sql, window_column, _ = SOURCES[report_type]
+    sql, args = base_sql, [clinic_id]
+    if since is not None:
+        sql += f" AND {window_column} >= ?"
+        args.append(since)
+    sql += f" ORDER BY {window_column} DESC"
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    started = time.perf_counter()
+    files, writers, counts = {}, {}, {}
+    try:
+        for report in reports:
+            # utf-8-sig writes the BOM Excel needs for ₹ and non-Latin names, as report_export does
+            files[report.id] = open(f"{output_path(report.id)}.partial", "w", newline="", encoding="utf-8-sig")
+            writers[report.id] = csv.writer(files[report.id])
+            writers[report.id].writerow([label for _, label in report.columns])
+            counts[report.id] = 0
+        cursor = conn.cursor()
+        cursor.execute(sql, args)
+        for rows in report_export.iter_batches(cursor):
+            for report in reports:
+                selected = [[row[i] for i in report.positions] for row in rows if report.matches(row)]
+                writers[report.id].writerows(selected)
+                counts[report.id] += len(selected)
+    except BaseException:
+        # A scan that fails part-way leaves no half-written files behind; the batch is retried next poll
+        for report_id, handle in files.items():
+            handle.close()
+            os.remove(f"{output_path(report_id)}.partial")
+        raise
+    finally:
+        for handle in files.values():
+            handle.close()
+    for report in reports:
+        os.replace(f"{output_path(report.id)}.partial", output_path(report.id))
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    generated_at = now.strftime(TIMESTAMP_FORMAT)
+    conn.executemany("UPDATE custom_reports SET last_generated = ? WHERE id = ?",
+                     [(generated_at, report.id) for report in reports])
+    conn.executemany("""
+        INSERT INTO custom_report_runs (report_id, clinic_id, generated_at, row_count, scan_ms, batch_reports, output_path)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [(report.id, clinic_id, generated_at, counts[report.id], round(scan_ms, 2), len(reports),
+           output_path(report.id)) for report in reports])
+    conn.commit()
+    return scan_ms, counts
+
+
+def record_failure(conn, report_id, clinic_id, now, error):
+    # A broken definition fails on every poll; one history row per distinct error is enough
+    latest = conn.execute("SELECT error FROM custom_report_runs WHERE report_id = ? ORDER BY id DESC LIMIT 1",
+                          (report_id,)).fetchone()
+    if latest and latest[0] == error:
+        return
+    conn.execute("INSERT INTO custom_report_runs (report_id, clinic_id, generated_at, error) VALUES (?, ?, ?, ?)",
+                 (report_id, clinic_id, now.strftime(TIMESTAMP_FORMAT), error))
+    conn.commit()
+
+
+def run_due(conn, now=None, clinic_id=None):
+    """Generate every due scheduled report; returns (reports generated, scans run)"""
+    now = now or datetime.now()
+    ensure_schema(conn.cursor())
+    due, broken = due_reports(conn.cursor(), now, clinic_id)
+    for report_id, report_clinic, error in broken:
+        print(f"⚠️ Skipping scheduled report {report_id}: {error}")
+        record_failure(conn, report_id, report_clinic, now, error)
+    generated = 0
+    groups = _batches(due, now)
+    for (group_clinic, report_type, since), reports in groups.items():
+        try:
+            scan_ms, counts = generate_batch(conn, group_clinic, report_type, since, reports, now)
+        except (sqlite3.Error, OSError) as e:
+            conn.rollback()
+            for report in reports:
+                record_failure(conn, report.id, group_clinic, now, str(e))
+            print(f"❌ Clinic {group_clinic} {report_type} reports failed: {e}")
+            continue
+        generated += len(reports)
+        print(f"✅ Clinic {group_clinic}: {len(reports)} {report_type} report(s) since {since or 'the beginning'} "
+              f"from one scan in {scan_ms:.1f} ms ({sum(counts.values())} rows written)")
+    return generated, len(groups)
+
+
+def latest_runs(cursor, clinic_id):
+    """Each of a clinic's custom reports with its most recent run (None columns when it never ran)"""
+    cursor.execute("""
+        SELECT cr.id, cr.report_name, cr.report_type, cr.is_scheduled, cr.schedule_frequency, cr.last_generated,
+               run.row_count, run.scan_ms, run.batch_reports, run.error
+        FROM custom_reports cr
+        LEFT JOIN custom_report_runs run ON run.id = (
+            SELECT MAX(id) FROM custom_report_runs WHERE report_id = cr.id)
+        WHERE cr.clinic_id = ?
+        ORDER BY cr.report_name
+    """, (clinic_id,))
+    return cursor.fetchall()
+
+
+def in_off_peak(now, hours=OFF_PEAK_HOURS):
+    start, end = (int(hour) for hour in hours.split("-"))
+    if start <= end:
+        return start <= now.hour < end
+    # A window such as 22-4 wraps past midnight
+    return now.hour >= start or now.hour < end
+
+
+def run_forever(database, hours=OFF_PEAK_HOURS, poll=POLL_SECONDS):
+    print(f"🕐 Scheduler watching {database}; generating between {hours}h local time")
+    while True:
+        now = datetime.now()
+        if in_off_peak(now, hours):
+            conn = sqlite3.connect(database, timeout=30)
+            try:
+                run_due(conn, now)
+            finally:
+                conn.close()
+        time.sleep(poll)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate scheduled custom reports")
+    parser.add_argument("database", nargs="?", default="simple_clinic.db")
+    parser.add_argument("--once", action="store_true", help="generate due reports now, ignoring the off-peak window")
+    parser.add_argument("--clinic", type=int, help="only this clinic's reports (with --once)")
+    parser.add_argument("--hours", default=OFF_PEAK_HOURS, help="off-peak local hours, e.g. 1-5 or 22-4")
+    options = parser.parse_args()
+    if options.once:
+        conn = sqlite3.connect(options.database, timeout=30)
+        generated, scans = run_due(conn, clinic_id=options.clinic)
+        conn.close()
+        print(f"📊 {generated} report(s) generated from {scans} scan(s)")
+    else:
+        run_forever(options.database, options.hours)
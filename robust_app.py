@@ -6,6 +6,8 @@ import secrets
 from datetime import datetime, date
 from sqlalchemy import func
 import os
+import sequences
+from sequences import next_clinic_number
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "dev_secret_key_2024"
@@ -96,6 +98,10 @@ def init_database():
                 
                 db.session.commit()
                 print("✅ Demo data added successfully!")
+            
+            # Seed the clinic/patient code counters from the codes issued so far
+            sequences.bootstrap(db.session)
+            db.session.commit()
                 
         return True
     except Exception as e:
@@ -140,8 +146,7 @@ def register_clinic():
             if not name:
                 return '<p style="color: red;">❌ Clinic name is required!</p><p><a href="/register_clinic">← Try Again</a></p>'
             
-            total = Clinic.query.count() or 0
-            next_num = total + 1
+            next_num = next_clinic_number(db.session)
             clinic_code = generate_clinic_code(next_num)
             login_id = generate_login_id(name, next_num)
             password = secrets.token_urlsafe(6)
@@ -0,0 +1,316 @@
+# rollups.py - Per-clinic analytics rollup tables maintained by triggers in the writing transaction
+import sqlite3
+import sys
+
+TABLES = [
+    # Registrations and demographics by created_at day, visits by visit_date day ('' = undated)
+    '''CREATE TABLE IF NOT EXISTS clinic_daily_stats (
+        clinic_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        new_patients INTEGER NOT NULL DEFAULT 0,
+        male_patients INTEGER NOT NULL DEFAULT 0,
+        female_patients INTEGER NOT NULL DEFAULT 0,
+        other_patients INTEGER NOT NULL DEFAULT 0,
+        age_total INTEGER NOT NULL DEFAULT 0,
+        age_count INTEGER NOT NULL DEFAULT 0,
+        visits INTEGER NOT NULL DEFAULT 0,
+        visit_revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (clinic_id, day)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS clinic_treatment_counts (
+        clinic_id INTEGER NOT NULL,
+        treatment TEXT NOT NULL,
+        patients INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (clinic_id, treatment)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS clinic_monthly_revenue (
+        clinic_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        transactions INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        cash_revenue REAL NOT NULL DEFAULT 0,
+        card_revenue REAL NOT NULL DEFAULT 0,
+        upi_revenue REAL NOT NULL DEFAULT 0,
+        insurance_revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (clinic_id, month)
+    ) WITHOUT ROWID''',
+    # Patients per parsed address part; level '' / location '' counts every patient with an address
+    '''CREATE TABLE IF NOT EXISTS clinic_location_counts (
+        clinic_id INTEGER NOT NULL,
+        level TEXT NOT NULL,
+        location TEXT NOT NULL,
+        patients INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (clinic_id, level, location)
+    ) WITHOUT ROWID''',
+]
+
+# Source columns each trigger set reads; rollups are skipped for schemas that lack them
+SOURCES = {
+    "patients": ("clinic_id", "created_at", "sex", "age", "treatment"),
+    "patient_analytics": ("clinic_id", "visit_date", "treatment_cost"),
+    "revenue_analytics": ("clinic_id", "transaction_date", "final_amount", "payment_method"),
+    "patient_locations": ("clinic_id", "address", "address_village", "address_city", "address_state"),
+}
+# Trigger sets named after something other than the table they watch
+SOURCE_TABLES = {"patient_locations": "patients"}
+LOCATION_LEVELS = ("village", "city", "state")
+# Rollup tables each trigger set writes
+FEEDS = {
+    "patients": ("clinic_daily_stats", "clinic_treatment_counts"),
+    "patient_analytics": ("clinic_daily_stats",),
+    "revenue_analytics": ("clinic_monthly_revenue",),
+    "patient_locations": ("clinic_location_counts",),
+}
+
+
+def _upsert(table, key_columns, values, source_filter=""):
+    """INSERT ... SELECT of one signed delta row, folded into the bucket on conflict"""
+    columns = list(values)
+    counters = [c for c in columns if c not in key_columns]
+    return f'''INSERT INTO {table} ({", ".join(columns)})
+        SELECT {", ".join(values[c] for c in columns)}
+        WHERE {source_filter or "1"}
+        ON CONFLICT ({", ".join(key_columns)}) DO UPDATE SET
+            {", ".join(f"{c} = {c} + excluded.{c}" for c in counters)};'''
+
+
+def _patient_deltas(ref, sign):
+    # The analytics page's avg_age ignores '' ages, so the rollup does too
+    has_age = f"({ref}.age IS NOT NULL AND {ref}.age != '')"
+    daily = _upsert("clinic_daily_stats", ("clinic_id", "day"), {
+        "clinic_id": f"{ref}.clinic_id",
+        "day": f"COALESCE(date({ref}.created_at), '')",
+        "new_patients": f"{sign}",
+        "male_patients": f"{sign} * COALESCE({ref}.sex = 'Male', 0)",
+        "female_patients": f"{sign} * COALESCE({ref}.sex = 'Female', 0)",
+        "other_patients": f"{sign} * COALESCE({ref}.sex = 'Other', 0)",
+        "age_total": f"{sign} * (CASE WHEN {has_age} THEN CAST({ref}.age AS INTEGER) ELSE 0 END)",
+        "age_count": f"{sign} * {has_age}",
+    }, f"{ref}.clinic_id IS NOT NULL")
+    treatment = _upsert("clinic_treatment_counts", ("clinic_id", "treatment"), {
+        "clinic_id": f"{ref}.clinic_id",
+        "treatment": f"{ref}.treatment",
+        "patients": f"{sign}",
+    }, f"{ref}.clinic_id IS NOT NULL AND {ref}.treatment IS NOT NULL AND {ref}.treatment != ''")
+    return daily + "\n        " + treatment
+
+
+def _visit_deltas(ref, sign):
+    return _upsert("clinic_daily_stats", ("clinic_id", "day"), {
+        "clinic_id": f"{ref}.clinic_id",
+        "day": f"COALESCE(date({ref}.visit_date), '')",
+        "visits": f"{sign}",
+        "visit_revenue": f"{sign} * COALESCE({ref}.treatment_cost, 0)",
+    }, f"{ref}.clinic_id IS NOT NULL")
+
+
+def _revenue_deltas(ref, sign):
+    amount = f"{sign} * COALESCE({ref}.final_amount, 0)"
+    return _upsert("clinic_monthly_revenue", ("clinic_id", "month"), {
+        "clinic_id": f"{ref}.clinic_id",
+        "month": f"COALESCE(substr({ref}.transaction_date, 1, 7), '')",
+        "transactions": f"{sign}",
+        "revenue": amount,
+        "cash_revenue": f"{amount} * COALESCE({ref}.payment_method = 'Cash', 0)",
+        "card_revenue": f"{amount} * COALESCE({ref}.payment_method = 'Card', 0)",
+        "upi_revenue": f"{amount} * COALESCE({ref}.payment_method = 'UPI', 0)",
+        "insurance_revenue": f"{amount} * COALESCE({ref}.payment_method = 'Insurance', 0)",
+    }, f"{ref}.clinic_id IS NOT NULL")
+
+
+def _location_deltas(ref, sign):
+    statements = [_upsert("clinic_location_counts", ("clinic_id", "level", "location"), {
+        "clinic_id": f"{ref}.clinic_id",
+        "level": "''",
+        "location": "''",
+        "patients": f"{sign}",
+    }, f"{ref}.clinic_id IS NOT NULL AND {ref}.address IS NOT NULL AND {ref}.address != ''")]
+    for level in LOCATION_LEVELS:
+        statements.append(_upsert("clinic_location_counts", ("clinic_id", "level", "location"), {
+            "clinic_id": f"{ref}.clinic_id",
+            "level": f"'{level}'",
+            "location": f"{ref}.address_{level}",
+            "patients": f"{sign}",
+        }, f"{ref}.clinic_id IS NOT NULL AND {ref}.address_{level} IS NOT NULL"))
+    return "\n        ".join(statements)
+
+
+_DELTAS = {
+    "patients": _patient_deltas,
+    "patient_analytics": _visit_deltas,
+    "revenue_analytics": _revenue_deltas,
+    "patient_locations": _location_deltas,
+}
+
+
+def triggers(source):
+    """Insert/delete/update triggers that keep the rollups in step with one source table"""
+    deltas = _DELTAS[source]
+    table = SOURCE_TABLES.get(source, source)
+    columns = ", ".join(SOURCES[source])
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_{source}_insert AFTER INSERT ON {table} BEGIN
+        {deltas("new", 1)}
+    END''',
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_{source}_delete AFTER DELETE ON {table} BEGIN
+        {deltas("old", -1)}
+    END''',
+        # An edit moves the row out of its old buckets and into its new ones
+        f'''CREATE TRIGGER IF NOT EXISTS rollup_{source}_update AFTER UPDATE OF {columns} ON {table} BEGIN
+        {deltas("old", -1)}
+        {deltas("new", 1)}
+    END''',
+    ]
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _sources(cursor, only=None):
+    return [source for source, columns in SOURCES.items()
+            if (only is None or source in only) and set(columns) <= _columns(cursor, SOURCE_TABLES.get(source, source))]
+
+
+def ensure_schema(cursor, only=None):
+    """Create the rollup tables and a trigger set for every source table present in this schema
+
+    only limits the trigger sets to those named, for databases whose pages read just some rollups
+    """
+    for statement in TABLES:
+        cursor.execute(statement)
+    sources = _sources(cursor, only)
+    for source in sources:
+        for trigger in triggers(source):
+            cursor.execute(trigger)
+    return sources
+
+
+def rebuild(cursor, clinic_id=None, only=None):
+    """Recompute the rollups from the source tables (all clinics, or one)
+
+    Call inside a transaction: readers see either the old or the new buckets, never a half-built set.
+    only names the trigger sets to rebuild; patients and patient_analytics share clinic_daily_stats, so
+    name both or neither
+    """
+    sources = _sources(cursor, only)
+    scope = "" if clinic_id is None else "WHERE clinic_id = ?"
+    params = () if clinic_id is None else (clinic_id,)
+    tables = sorted({table for source in (only or SOURCES) for table in FEEDS[source]})
+    for table in tables:
+        cursor.execute(f"DELETE FROM {table} {scope}", params)
+    filtered = "clinic_id IS NOT NULL" + ("" if clinic_id is None else " AND clinic_id = ?")
+    if "patients" in sources:
+        cursor.execute(f'''INSERT INTO clinic_daily_stats (clinic_id, day, new_patients, male_patients,
+                female_patients, other_patients, age_total, age_count)
+            SELECT clinic_id, COALESCE(date(created_at), ''), COUNT(*),
+                COALESCE(SUM(sex = 'Male'), 0), COALESCE(SUM(sex = 'Female'), 0), COALESCE(SUM(sex = 'Other'), 0),
+                COALESCE(SUM(CASE WHEN age IS NOT NULL AND age != '' THEN CAST(age AS INTEGER) ELSE 0 END), 0),
+                COALESCE(SUM(age IS NOT NULL AND age != ''), 0)
+            FROM patients WHERE {filtered}
+            GROUP BY 1, 2''', params)
+        cursor.execute(f'''INSERT INTO clinic_treatment_counts (clinic_id, treatment, patients)
+            SELECT clinic_id, treatment, COUNT(*) FROM patients
+            WHERE {filtered} AND treatment IS NOT NULL AND treatment != ''
+            GROUP BY 1, 2''', params)
+    if "patient_analytics" in sources:
+        cursor.execute(f'''INSERT INTO clinic_daily_stats (clinic_id, day, visits, visit_revenue)
+            SELECT clinic_id, COALESCE(date(visit_date), ''), COUNT(*), COALESCE(SUM(treatment_cost), 0)
+            FROM patient_analytics WHERE {filtered}
+            GROUP BY 1, 2
+            ON CONFLICT (clinic_id, day) DO UPDATE SET
+                visits = excluded.visits, visit_revenue = excluded.visit_revenue''', params)
+    if "revenue_analytics" in sources:
+        cursor.execute(f'''INSERT INTO clinic_monthly_revenue (clinic_id, month, transactions, revenue,
+                cash_revenue, card_revenue, upi_revenue, insurance_revenue)
+            SELECT clinic_id, COALESCE(substr(transaction_date, 1, 7), ''), COUNT(*),
+                COALESCE(SUM(final_amount), 0),
+                COALESCE(SUM(CASE WHEN payment_method = 'Cash' THEN final_amount END), 0),
+                COALESCE(SUM(CASE WHEN payment_method = 'Card' THEN final_amount END), 0),
+                COALESCE(SUM(CASE WHEN payment_method = 'UPI' THEN final_amount END), 0),
+                COALESCE(SUM(CASE WHEN payment_method = 'Insurance' THEN final_amount END), 0)
+            FROM revenue_analytics WHERE {filtered}
+            GROUP BY 1, 2''', params)
+    if "patient_locations" in sources:
+        cursor.execute(f'''INSERT INTO clinic_location_counts (clinic_id, level, location, patients)
+            SELECT clinic_id, '', '', COUNT(*) FROM patients
+            WHERE {filtered} AND address IS NOT NULL AND address != ''
+            GROUP BY 1''', params)
+        for level in LOCATION_LEVELS:
+            cursor.execute(f'''INSERT INTO clinic_location_counts (clinic_id, level, location, patients)
+                SELECT clinic_id, '{level}', address_{level}, COUNT(*) FROM patients
+                WHERE {filtered} AND address_{level} IS NOT NULL
+                GROUP BY 1, 3''', params)
+
+
+# Dashboard reads: each one touches a clinic's buckets only, never its patient rows
+
+def demographics(cursor, clinic_id):
+    """(total_patients, avg_age, male_count, female_count, other_count)"""
+    cursor.execute('''SELECT COALESCE(SUM(new_patients), 0),
+            CAST(SUM(age_total) AS REAL) / NULLIF(SUM(age_count), 0),
+            COALESCE(SUM(male_patients), 0), COALESCE(SUM(female_patients), 0), COALESCE(SUM(other_patients), 0)
+        FROM clinic_daily_stats WHERE clinic_id = ?''', (clinic_id,))
+    return cursor.fetchone()
+
+
+def patient_count(cursor, clinic_id):
+    cursor.execute("SELECT COALESCE(SUM(new_patients), 0) FROM clinic_daily_stats WHERE clinic_id = ?", (clinic_id,))
+    return cursor.fetchone()[0]
+
+
+def treatment_counts(cursor, clinic_id):
+    cursor.execute('''SELECT treatment, patients FROM clinic_treatment_counts
+        WHERE clinic_id = ? AND patients > 0 ORDER BY patients DESC''', (clinic_id,))
+    return cursor.fetchall()
+
+
+def monthly_registrations(cursor, clinic_id, months=12):
+    cursor.execute('''SELECT substr(day, 1, 7) AS month, SUM(new_patients) AS registrations
+        FROM clinic_daily_stats WHERE clinic_id = ? AND day != ''
+        GROUP BY month HAVING registrations > 0
+        ORDER BY month DESC LIMIT ?''', (clinic_id, months))
+    return cursor.fetchall()
+
+
+def revenue_summary(cursor, clinic_id):
+    """(total_revenue, avg_transaction, total_transactions, cash, card, upi, insurance)"""
+    cursor.execute('''SELECT TOTAL(revenue), COALESCE(SUM(revenue) / NULLIF(SUM(transactions), 0), 0), COALESCE(SUM(transactions), 0),
+            TOTAL(cash_revenue), TOTAL(card_revenue), TOTAL(upi_revenue), TOTAL(insurance_revenue)
+        FROM clinic_monthly_revenue WHERE clinic_id = ?''', (clinic_id,))
+    return cursor.fetchone()
+
+
+
+def location_overview(cursor, clinic_id, limit=10):
+    """(patients with an address, {level: (distinct locations, busiest limit (location, patients))}) in one query"""
+    cursor.execute('''SELECT level, location, patients, locations FROM (
+            SELECT level, location, patients, COUNT(*) OVER (PARTITION BY level) AS locations,
+                ROW_NUMBER() OVER (PARTITION BY level ORDER BY patients DESC, location) AS position
+            FROM clinic_location_counts WHERE clinic_id = ? AND patients > 0)
+        WHERE position <= ? ORDER BY level, position''', (clinic_id, limit))
+    with_address = 0
+    counts = dict.fromkeys(LOCATION_LEVELS, 0)
+    busiest = {level: [] for level in LOCATION_LEVELS}
+    for level, location, patients, locations in cursor.fetchall():
+        if level == "":
+            with_address = patients
+        else:
+            counts[level] = locations
+            busiest[level].append((location, patients))
+    return with_address, {level: (counts[level], busiest[level]) for level in LOCATION_LEVELS}
+
+
+if __name__ == "__main__":
+    # Usage: python rollups.py [database] [clinic_id]  - rebuild the rollups from the source tables
+    database = sys.argv[1] if len(sys.argv) > 1 else "simple_clinic.db"
+    clinic = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    conn = sqlite3.connect(database)
+    conn.execute("BEGIN IMMEDIATE")
+    sources = ensure_schema(conn.cursor())
+    rebuild(conn.cursor(), clinic)
+    conn.commit()
+    conn.close()
+    print(f"✅ Rebuilt rollups from {', '.join(sources) or 'no source tables'} in {database}"
+          + (f" for clinic {clinic}" if clinic is not None else ""))
@@ -1,12 +1,11 @@
 # run.py
 import os
-from app import create_app, db
+from app import create_app, init_database
 
 app = create_app()
 
 # Create DB tables if missing (safe for dev)
-with app.app_context():
-    db.create_all()
+init_database(app)
 
 # For Vercel deployment
 def handler(event, context):
@@ -0,0 +1,114 @@
+# schema_indexes.py - Secondary indexes for the hot query shapes and an EXPLAIN QUERY PLAN advisor
+import sqlite3
+import sys
+
+# (index name, table, columns) - every page filters by clinic_id first, then orders or joins
+INDEXES = [
+    ("idx_clinics_email", "clinics", ("email",)),
+    ("idx_clinics_google_id", "clinics", ("google_id",)),
+    ("idx_clinics_reset_token", "clinics", ("reset_token",)),
+    ("idx_patients_clinic_id", "patients", ("clinic_id", "id")),
+    ("idx_patients_clinic_created", "patients", ("clinic_id", "created_at")),
+    ("idx_patients_clinic_code", "patients", ("clinic_id", "patient_code")),
+    ("idx_patients_clinic_treatment", "patients", ("clinic_id", "treatment")),
+    ("idx_patients_clinic_village", "patients", ("clinic_id", "address_village")),
+    ("idx_patient_analytics_clinic_patient", "patient_analytics", ("clinic_id", "patient_id")),
+    ("idx_patient_analytics_clinic_visit", "patient_analytics", ("clinic_id", "visit_date")),
+    ("idx_patient_analytics_patient", "patient_analytics", ("patient_id",)),
+    ("idx_appointments_clinic_date", "appointments", ("clinic_id", "appointment_date")),
+    ("idx_appointments_patient", "appointments", ("patient_id",)),
+    ("idx_revenue_analytics_clinic_date", "revenue_analytics", ("clinic_id", "transaction_date")),
+    ("idx_patient_feedback_clinic_patient", "patient_feedback", ("clinic_id", "patient_id")),
+    ("idx_smart_alerts_clinic_unread", "smart_alerts", ("clinic_id", "is_read", "created_at")),
+    ("idx_smart_alerts_clinic_created", "smart_alerts", ("clinic_id", "created_at")),
+    ("idx_doctor_performance_clinic", "doctor_performance", ("clinic_id",)),
+    ("idx_custom_reports_clinic", "custom_reports", ("clinic_id",)),
+]
+
+# Representative statements from the routes; ? placeholders are bound to 1 for planning
+KNOWN_QUERIES = [
+    ("clinic header", "SELECT name FROM clinics WHERE id = ?"),
+    ("login by email", "SELECT id, name FROM clinics WHERE email = ? AND password = ?"),
+    ("google login", "SELECT id, clinic_code, name FROM clinics WHERE google_id = ? OR email = ?"),
+    ("view_patients page", "SELECT id, created_at, patient_code, name FROM patients WHERE clinic_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?"),
+    ("dashboard recent", "SELECT name, treatment, created_at FROM patients WHERE clinic_id = ? ORDER BY created_at DESC LIMIT 5"),
+    ("suggest new patients", "SELECT id, patient_code, name FROM patients WHERE clinic_id = ? AND id > ?"),
+    ("patient by code", "SELECT * FROM patients WHERE clinic_id = ? AND patient_code = ?"),
+    ("treatment breakdown", "SELECT treatment, COUNT(*) FROM patients WHERE clinic_id = ? AND treatment != '' GROUP BY treatment"),
+    ("monthly registrations", "SELECT strftime('%Y-%m', created_at) AS month, COUNT(*) FROM patients WHERE clinic_id = ? AND created_at IS NOT NULL GROUP BY month"),
+    ("location analytics", "SELECT p.address_village, COUNT(DISTINCT p.id), AVG(pa.treatment_cost) FROM patients p LEFT JOIN patient_analytics pa ON pa.patient_id = p.id WHERE p.clinic_id = ? AND p.address_village IN (?) GROUP BY p.address_village"),
+    ("patient visits", "SELECT * FROM patient_analytics WHERE clinic_id = ? AND patient_id = ?"),
+    ("recent visits", "SELECT visit_date, diagnosis, treatment_cost FROM patient_analytics WHERE clinic_id = ? ORDER BY visit_date DESC LIMIT 10"),
+    ("comprehensive report", "SELECT p.patient_code, pa.visit_date, pa.treatment_cost FROM patients p LEFT JOIN patient_analytics pa ON p.id = pa.patient_id WHERE p.clinic_id = ? ORDER BY p.created_at DESC"),
+    ("appointments", "SELECT COUNT(*) FROM appointments WHERE clinic_id = ?"),
+    ("financial report", "SELECT transaction_date, final_amount FROM revenue_analytics WHERE clinic_id = ? ORDER BY transaction_date DESC"),
+    ("feedback", "SELECT AVG(rating) FROM patient_feedback WHERE clinic_id = ?"),
+    ("unread alerts", "SELECT alert_type, alert_message FROM smart_alerts WHERE clinic_id = ? AND is_read = 0 ORDER BY created_at DESC LIMIT 5"),
+]
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def ensure_indexes(cursor):
+    """Create any missing index whose table and columns exist in this schema"""
+    created = []
+    cache = {}
+    for name, table, columns in INDEXES:
+        if table not in cache:
+            cache[table] = _columns(cursor, table)
+        if not set(columns) <= cache[table]:
+            continue
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+        created.append(name)
+    return created
+
+
+def explain(cursor, sql):
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, (1,) * sql.count("?"))
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def is_full_scan(detail):
+    # "SCAN patients" reads the whole table; "SCAN p USING INDEX ..." walks an index instead
+    return detail.startswith("SCAN ") and "USING" not in detail
+
+
+def advise(cursor, queries=KNOWN_QUERIES):
+    """Return (label, plan lines, problems) for each known query shape"""
+    report = []
+    for label, sql in queries:
+        try:
+            plan = explain(cursor, sql)
+        except sqlite3.OperationalError as e:
+            report.append((label, [], [f"skipped: {e}"]))
+            continue
+        problems = [f"full table scan: {d}" for d in plan if is_full_scan(d)]
+        report.append((label, plan, problems))
+    return report
+
+
+if __name__ == "__main__":
+    # Usage: python schema_indexes.py [database] [--apply]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    database = args[0] if args else "simple_clinic.db"
+    conn = sqlite3.connect(database)
+    cursor = conn.cursor()
+    if "--apply" in sys.argv:
+        created = ensure_indexes(cursor)
+        conn.commit()
+        print(f"✅ Ensured {len(created)} indexes on {database}")
+    flagged = 0
+    for label, plan, problems in advise(cursor):
+        status = "⏭️ " if not plan else "⚠️ " if problems else "✅"
+        print(f"{status} {label}")
+        for line in plan:
+            print(f"      {line}")
+        for problem in problems:
+            print(f"      -> {problem}")
+        flagged += bool(plan and problems)
+    conn.close()
+    print(f"{flagged} of {len(KNOWN_QUERIES)} query shapes need attention")
+    sys.exit(1 if flagged else 0)
@@ -0,0 +1,96 @@
+# schema_migrations.py - Versioned schema migrations for the raw-sqlite databases
+from collections import namedtuple
+
+# batched=True migrations commit their own work in chunks instead of one long transaction
+Migration = namedtuple("Migration", ["version", "description", "apply", "batched"])
+Migration.__new__.__defaults__ = (False,)
+
+BATCH_SIZE = 5000
+
+VERSION_TABLE = '''CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description TEXT,
+    applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+)'''
+
+
+def current_version(conn):
+    """Highest applied version; a single query on a warm start"""
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except Exception:
+        # No schema_version table yet: a fresh database or one created before migrations existed
+        return 0
+
+
+def _record(conn, migration):
+    conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                 (migration.version, migration.description))
+
+
+def _is_applied(conn, version):
+    return conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,)).fetchone() is not None
+
+
+def migrate(conn, migrations):
+    """Apply every migration newer than the recorded version, in order; returns those applied"""
+    latest = max(m.version for m in migrations)
+    if current_version(conn) >= latest:
+        return []
+    conn.execute(VERSION_TABLE)
+    conn.commit()
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.batched:
+            if _is_applied(conn, migration.version):
+                continue
+            migration.apply(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            if not _is_applied(conn, migration.version):
+                _record(conn, migration)
+            conn.commit()
+            applied.append(migration)
+            continue
+        # IMMEDIATE takes the write lock up front so concurrent workers apply each version once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if _is_applied(conn, migration.version):
+                conn.rollback()
+                continue
+            migration.apply(conn)
+            _record(conn, migration)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(migration)
+    return applied
+
+
+def columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def add_missing_columns(conn, table, definitions):
+    """ALTER TABLE for each (column, type) pair the table does not have yet"""
+    existing = columns(conn, table)
+    for column, column_type in definitions:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def update_in_batches(conn, table, sql, batch_size=BATCH_SIZE):
+    """Run an UPDATE over rowid ranges, committing each range so writers are never blocked for long
+
+    sql must contain 'rowid BETWEEN ? AND ?' (or equivalent) bound to each range
+    """
+    bounds = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+    if bounds[0] is None:
+        return 0
+    low, high = bounds
+    batches = 0
+    for start in range(low, high + 1, batch_size):
+        conn.execute(sql, (start, start + batch_size - 1))
+        conn.commit()
+        batches += 1
+    return batches
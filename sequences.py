@@ -0,0 +1,93 @@
+# sequences.py - Atomic counters for patient and clinic codes
+import sqlite3
+
+# One row per (sequence name, scope); scope is the clinic id for per-clinic counters
+SEQUENCES_TABLE = '''CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT NOT NULL,
+    scope INTEGER NOT NULL DEFAULT 0,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, scope)
+)'''
+
+# The upsert takes the write lock, so the read that follows sees our own increment
+# and concurrent writers queue behind us instead of reading the same value
+_BUMP = '''INSERT INTO sequences (name, scope, value) VALUES (:name, :scope, 1)
+    ON CONFLICT (name, scope) DO UPDATE SET value = sequences.value + 1'''
+_READ = "SELECT value FROM sequences WHERE name = :name AND scope = :scope"
+_SEED = '''INSERT INTO sequences (name, scope, value) VALUES (:name, :scope, :value)
+    ON CONFLICT (name, scope) DO NOTHING'''
+
+PATIENT = "patient"
+CLINIC = "clinic"
+
+
+def _execute(conn, sql, params=None):
+    """Run a statement on a sqlite3 connection/cursor or a SQLAlchemy session"""
+    if isinstance(conn, (sqlite3.Connection, sqlite3.Cursor)):
+        return conn.execute(sql, params or {})
+    from sqlalchemy import text
+    return conn.execute(text(sql), params or {})
+
+
+def ensure_schema(conn):
+    _execute(conn, SEQUENCES_TABLE)
+
+
+def next_value(conn, name, scope=0):
+    """Increment and return a counter inside the caller's transaction"""
+    params = {"name": name, "scope": scope}
+    _execute(conn, _BUMP, params)
+    return _execute(conn, _READ, params).fetchone()[0]
+
+
+def next_patient_number(conn, clinic_id):
+    return next_value(conn, PATIENT, int(clinic_id))
+
+
+def next_clinic_number(conn):
+    return next_value(conn, CLINIC)
+
+
+def code_number(code, separator):
+    """Numeric suffix of a generated code, e.g. 'CLINIC0001-P0042' -> 42"""
+    if not code or separator not in code:
+        return None
+    suffix = code.rsplit(separator, 1)[1]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def needs_backfill(conn, name):
+    """True until a counter of this name has been seeded or allocated"""
+    return _execute(conn, "SELECT 1 FROM sequences WHERE name = :name LIMIT 1", {"name": name}).fetchone() is None
+
+
+def backfill_patient_sequences(conn):
+    """Seed per-clinic patient counters from the highest existing patient code"""
+    highest = {}
+    for clinic_id, patient_code in _execute(conn, "SELECT clinic_id, patient_code FROM patients"):
+        number = code_number(patient_code, "-P")
+        if clinic_id is not None and number is not None and number > highest.get(clinic_id, 0):
+            highest[clinic_id] = number
+    for clinic_id, value in highest.items():
+        _execute(conn, _SEED, {"name": PATIENT, "scope": clinic_id, "value": value})
+    return len(highest)
+
+
+def backfill_clinic_sequence(conn):
+    """Seed the global clinic counter from the highest existing CLINIC#### code"""
+    numbers = [code_number(code, "CLINIC") for (code,) in _execute(conn, "SELECT clinic_code FROM clinics")]
+    highest = max([n for n in numbers if n is not None], default=0)
+    if highest:
+        _execute(conn, _SEED, {"name": CLINIC, "scope": 0, "value": highest})
+    return highest
+
+
+def bootstrap(conn):
+    """Create the sequences table and seed any counter that has never been used"""
+    ensure_schema(conn)
+    seeded = {}
+    if needs_backfill(conn, CLINIC):
+        seeded[CLINIC] = backfill_clinic_sequence(conn)
+    if needs_backfill(conn, PATIENT):
+        seeded[PATIENT] = backfill_patient_sequences(conn)
+    return seeded
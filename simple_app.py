@@ -4,7 +4,8 @@ from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
 from datetime import datetime, date
-from sqlalchemy import func
+import sequences
+from sequences import next_clinic_number
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "dev_secret_key"
@@ -70,8 +71,7 @@ def register_clinic():
         name = request.form.get("name","").strip()
         location = request.form.get("location","").strip()
         incharge = request.form.get("incharge","").strip()
-        total = db.session.query(func.count(Clinic.id)).scalar() or 0
-        next_num = total + 1
+        next_num = next_clinic_number(db.session)
         clinic_code = generate_clinic_code(next_num)
         login_id = generate_login_id(name, next_num)
         password = secrets.token_urlsafe(6)
@@ -194,6 +194,8 @@ def logout():
 if __name__ == "__main__":
     with app.app_context():
         db.create_all()
+        sequences.bootstrap(db.session)
+        db.session.commit()
         print("✅ Database tables created successfully!")
     app.run(host="127.0.0.1", port=5000, debug=True)
 
@@ -201,6 +203,8 @@ if __name__ == "__main__":
 with app.app_context():
     try:
         db.create_all()
+        sequences.bootstrap(db.session)
+        db.session.commit()
         print("✅ Database initialized!")
     except Exception as e:
         print(f"⚠️ Database initialization: {e}")
@@ -0,0 +1,280 @@
+# snapshot_export.py - Incremental Parquet snapshots of patients and patient_analytics, partitioned by month
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+import pandas as pd
+
+from schema_migrations import add_missing_columns, columns as table_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = ds = pq = None
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+BATCH_SIZE = int(os.environ.get("SNAPSHOT_BATCH_SIZE", "50000"))
+# A partition's appended parts are rewritten as one file once there are more than this many
+COMPACT_PARTS = 8
+# Snapshotted tables and the date column that picks each row's month partition
+TABLES = {"patients": "created_at", "patient_analytics": "visit_date"}
+# Export run that wrote a row; a row edited after it was exported is appended again with a higher one
+VERSION_COLUMN = "_version"
+UNDATED = "undated"
+MANIFEST = "_manifest.json"
+# Ids deleted from the snapshotted tables, recorded by trigger so an incremental export can drop them
+DELETES_TABLE = '''CREATE TABLE IF NOT EXISTS snapshot_deletes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL
+)'''
+
+
+def available():
+    return pa is not None
+
+
+def ensure_change_tracking(conn, table):
+    """updated_at plus a trigger that stamps it on every edit, and one that records every delete, whichever
+    app or ORM makes the change"""
+    add_missing_columns(conn, table, [("updated_at", "TIMESTAMP")])
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_updated_at ON {table} (updated_at)")
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS snapshot_{table}_touch AFTER UPDATE ON {table}
+        WHEN new.updated_at IS old.updated_at BEGIN
+            UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE id = new.id;
+        END''')
+    conn.execute(DELETES_TABLE)
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS snapshot_{table}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO snapshot_deletes (table_name, row_id) VALUES ('{table}', old.id);
+        END''')
+    conn.commit()
+
+
+def _kind(declared):
+    # SQLite column affinity rules, plus the DATE/TIME names both ORMs and hand-written DDL use
+    declared = (declared or "").upper()
+    if "DATE" in declared or "TIME" in declared:
+        return "datetime"
+    if "INT" in declared or "BOOL" in declared:
+        return "int"
+    if any(name in declared for name in ("REAL", "FLOA", "DOUB", "NUMERIC", "DECIMAL")):
+        return "float"
+    return "string"
+
+
+def column_kinds(conn, table):
+    return {row[1]: _kind(row[2]) for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _normalize(frame, kinds):
+    """Fixed dtypes per declared column type, so every part of a table has the same Parquet schema
+
+    SQLite lets any row hold any type; values that do not fit the declared type become nulls.
+    Dates are parsed here, once, instead of on every analysis run
+    """
+    for column, kind in kinds.items():
+        values = frame[column]
+        if kind == "datetime":
+            frame[column] = pd.to_datetime(values, errors="coerce", format="ISO8601").astype("datetime64[us]")
+        elif kind == "int":
+            frame[column] = pd.to_numeric(values, errors="coerce").astype("Int64")
+        elif kind == "float":
+            frame[column] = pd.to_numeric(values, errors="coerce").astype("float64")
+        else:
+            frame[column] = values.astype("string")
+    return frame
+
+
+def _write_partitions(frame, table_dir, date_column, name):
+    """One Parquet file per month in the frame, rows sorted by clinic; returns the partition directories touched
+
+    A clinic's month is a few dozen rows, far too small for a file of its own, so clinics are a sort key
+    within each month: a clinic's rows stay contiguous and row-group statistics let readers skip the rest
+    """
+    months = frame[date_column].dt.strftime("%Y-%m").fillna(UNDATED)
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    touched = []
+    for month, part in frame.groupby(months, sort=False):
+        directory = os.path.join(table_dir, f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        part = part.sort_values(["clinic_id", "id"], kind="stable")
+        pq.write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False), os.path.join(directory, name))
+        touched.append(directory)
+    return touched
+
+
+def _latest(frame):
+    # Keyed by id: the row from the highest export run wins
+    if frame["id"].is_unique:
+        return frame
+    return frame.sort_values(VERSION_COLUMN, kind="stable").drop_duplicates("id", keep="last")
+
+
+def _compact(directory, version):
+    parts = sorted(name for name in os.listdir(directory) if name.endswith(".parquet"))
+    if len(parts) <= COMPACT_PARTS:
+        return False
+    paths = [os.path.join(directory, name) for name in parts]
+    table = ds.dataset(paths, format="parquet").to_table()
+    merged = _latest(table.to_pandas()).sort_values(["clinic_id", "id"], kind="stable")
+    # The merged file is written before the parts go; a crash in between only leaves duplicates that read() drops
+    pq.write_table(pa.Table.from_pandas(merged, schema=table.schema, preserve_index=False),
+                   os.path.join(directory, f"part-{version:06d}-compact.parquet"))
+    for path in paths:
+        os.remove(path)
+    return True
+
+
+def _drop_deleted(table_dir, ids, version):
+    """Rewrite the month partitions holding any of ids without them; returns the rows removed
+
+    An edit that moved a row to another month leaves its older copy behind, so every partition is checked,
+    reading only the id column
+    """
+    if not ids or not os.path.isdir(table_dir):
+        return 0
+    deleted = pa.array(sorted(ids), type=pa.int64())
+    removed = 0
+    for month in sorted(os.listdir(table_dir)):
+        directory = os.path.join(table_dir, month)
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet"))
+        if not paths:
+            continue
+        dataset = ds.dataset(paths, format="parquet")
+        if not dataset.count_rows(filter=ds.field("id").isin(deleted)):
+            continue
+        table = dataset.to_table()
+        kept = table.filter(pc.invert(pc.is_in(table["id"], value_set=deleted)))
+        removed += table.num_rows - kept.num_rows
+        # Hidden while written, so readers never see it; a crash before the old parts go only leaves
+        # duplicates that read() drops, and the next run repeats the deletes
+        target = os.path.join(directory, f"part-{version:06d}-deletes.parquet")
+        partial = os.path.join(directory, f".part-{version:06d}-deletes.partial")
+        pq.write_table(kept, partial)
+        os.replace(partial, target)
+        for path in paths:
+            if path != target:
+                os.remove(path)
+    return removed
+
+
+def load_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"source": None, "tables": {}}
+
+
+def _save_manifest(snapshot_dir, manifest):
+    path = os.path.join(snapshot_dir, MANIFEST)
+    with open(f"{path}.partial", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.partial", path)
+
+
+def export_table(conn, table, snapshot_dir, state):
+    """Drop the rows deleted and append the rows added or edited since state's watermarks; returns
+    (rows written, new state)"""
+    date_column = TABLES[table]
+    table_dir = os.path.join(snapshot_dir, table)
+    kinds = column_kinds(conn, table)
+    deleted_through = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM snapshot_deletes").fetchone()[0]
+    if state.get("columns") != kinds or "deleted_through" not in state:
+        # First export, the table gained or retyped columns (Parquet parts must share one schema), or the
+        # snapshot predates recorded deletes
+        shutil.rmtree(table_dir, ignore_errors=True)
+        state = {"columns": kinds, "last_id": 0, "last_updated": None, "version": 0, "deleted_through": deleted_through}
+    version = state["version"] + 1
+    removed = 0
+    if deleted_through > state["deleted_through"]:
+        ids = {row[0] for row in conn.execute(
+            "SELECT row_id FROM snapshot_deletes WHERE table_name = ? AND seq > ? AND seq <= ?",
+            (table, state["deleted_through"], deleted_through))}
+        removed = _drop_deleted(table_dir, ids, version)
+    # Bounds read before the rows, so anything written meanwhile is picked up next run. Separate
+    # statements: SQLite answers a lone MAX() from an index, but two in one SELECT scan the table
+    max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+    max_updated = conn.execute(f"SELECT MAX(updated_at) FROM {table}").fetchone()[0]
+    # Edits stamped this second may still be landing: the watermark stops short of it, so they are read
+    # again on the next run instead of being missed
+    settled = conn.execute("SELECT datetime('now', '-1 second')").fetchone()[0]
+    where, args = "(id > ? AND id <= ?)", [state["last_id"], max_id or 0]
+    if state["last_updated"]:
+        where += " OR updated_at > ?"
+        args.append(state["last_updated"])
+
+    written, touched = 0, set()
+    # Date order keeps each month's rows in as few chunks, and so files, as possible
+    sql = f"SELECT * FROM {table} WHERE {where} ORDER BY {date_column}"
+    for chunk_number, chunk in enumerate(pd.read_sql(sql, conn, params=args, chunksize=BATCH_SIZE)):
+        if chunk.empty:
+            continue
+        frame = _normalize(chunk, kinds)
+        frame[VERSION_COLUMN] = version
+        touched.update(_write_partitions(frame, table_dir, date_column, f"part-{version:06d}-{chunk_number:04d}.parquet"))
+        written += len(frame)
+    compacted = sum(_compact(directory, version) for directory in touched)
+    if written:
+        print(f"📦 {table}: {written:,} rows into {len(touched)} partition(s)"
+              + (f", {compacted} compacted" if compacted else ""))
+    if removed:
+        print(f"🗑️ {table}: {removed:,} deleted rows dropped")
+    return written, dict(state, last_id=max(state["last_id"], max_id or 0),
+                         last_updated=min(max_updated or settled, settled),
+                         version=version, deleted_through=deleted_through)
+
+
+def refresh(conn, snapshot_dir=SNAPSHOT_DIR, full=False):
+    """Bring the snapshot of every TABLES table present in conn up to date; returns {table: rows written}"""
+    if not available():
+        raise RuntimeError("pyarrow is required for Parquet snapshots (pip install pyarrow)")
+    source = os.path.abspath(conn.execute("PRAGMA database_list").fetchone()[2] or ":memory:")
+    manifest = load_manifest(snapshot_dir)
+    if full or manifest["source"] != source:
+        # Only the directories this module writes; --out may point somewhere shared
+        for table in TABLES:
+            shutil.rmtree(os.path.join(snapshot_dir, table), ignore_errors=True)
+        manifest = {"source": source, "tables": {}}
+    os.makedirs(snapshot_dir, exist_ok=True)
+    written = {}
+    for table in TABLES:
+        if not {"id", "clinic_id", TABLES[table]} <= table_columns(conn, table):
+            continue
+        ensure_change_tracking(conn, table)
+        written[table], manifest["tables"][table] = export_table(conn, table, snapshot_dir, manifest["tables"].get(table, {}))
+        # Saved per table, after its files: a crash repeats at most one table's increment
+        _save_manifest(snapshot_dir, manifest)
+    return written
+
+
+def read(table, columns=None, snapshot_dir=SNAPSHOT_DIR):
+    """One table's snapshot as a DataFrame, reading only the given columns from the Parquet files"""
+    directory = os.path.join(snapshot_dir, table)
+    if not os.path.isdir(directory):
+        return pd.DataFrame(columns=columns)
+    dataset = ds.dataset(directory, format="parquet")
+    wanted = None if columns is None else list(dict.fromkeys([*columns, "id", VERSION_COLUMN]))
+    frame = _latest(dataset.to_table(columns=wanted).to_pandas())
+    dropped = [VERSION_COLUMN] + (["id"] if columns is not None and "id" not in columns else [])
+    return frame.drop(columns=dropped).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write new and edited rows to the Parquet snapshot")
+    parser.add_argument("database", nargs="?", default="dental.db")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument("--full", action="store_true", help="discard the snapshot and export every row")
+    options = parser.parse_args()
+    conn = sqlite3.connect(options.database)
+    started = time.perf_counter()
+    written = refresh(conn, options.out, options.full)
+    conn.close()
+    print(f"✅ Snapshot of {options.database} in {options.out} is current "
+          f"({sum(written.values()):,} rows written in {time.perf_counter() - started:.2f}s)")
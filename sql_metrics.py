@@ -0,0 +1,196 @@
+# sql_metrics.py - Per-request SQL cost: query count, SQL time, slowest statement and repeated (N+1) patterns
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from functools import lru_cache
+
+from flask import g, has_app_context, request
+
+import db_pool
+
+# Instrumentation configuration (override through the environment for gunicorn workers)
+ENABLED = os.environ.get("SQL_METRICS", "1") == "1"
+SLOW_QUERY_MS = float(os.environ.get("SQL_SLOW_QUERY_MS", "100"))
+# One statement shape run this many times in a request is reported as an N+1 pattern
+REPEAT_THRESHOLD = int(os.environ.get("SQL_REPEAT_THRESHOLD", "10"))
+LOG_FILE = os.environ.get("SQL_METRICS_LOG", "")
+# WARNING logs only requests with an N+1 pattern or a slow statement; INFO adds a line for every request
+LOG_LEVEL = os.environ.get("SQL_METRICS_LOG_LEVEL", "WARNING").upper()
+MAX_PATTERNS = 5
+MAX_SQL_CHARS = 300
+
+log = logging.getLogger("sql_metrics")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+@lru_cache(maxsize=2048)
+def normalize(sql):
+    """Statement shape: literals become ?, IN lists collapse, whitespace is squeezed"""
+    shape = _NUMBER.sub("?", _STRING.sub("?", sql))
+    return _IN_LIST.sub("(?, ...)", _SPACE.sub(" ", shape)).strip()
+
+
+def _short(sql):
+    sql = _SPACE.sub(" ", sql).strip()
+    return sql if len(sql) <= MAX_SQL_CHARS else sql[:MAX_SQL_CHARS] + "..."
+
+
+def _record(sql, seconds):
+    """Add one statement to the current request; returns its [sql, seconds] entry, None outside a request"""
+    queries = g.get("sql_queries") if has_app_context() else None
+    if queries is None:
+        return None
+    entry = [sql, seconds]
+    queries.append(entry)
+    return entry
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement, fetches included; rows read by iterating the cursor are not timed"""
+
+    _entry = None
+
+    def _execute(self, method, sql, *args):
+        started = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            self._entry = _record(sql, time.perf_counter() - started)
+
+    def execute(self, sql, parameters=()):
+        return self._execute(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._execute(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self._execute(super().executescript, script)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            # SQLite does most of a SELECT's work while rows are stepped, so fetches count towards the statement
+            if self._entry is not None:
+                self._entry[1] += time.perf_counter() - started
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors, including the ones behind conn.execute(), are InstrumentedCursor"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+def instrument_engine(engine):
+    """Time every statement a SQLAlchemy engine runs, through its cursor execute events"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("sql_metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _record(statement, time.perf_counter() - conn.info["sql_metrics_started"].pop())
+
+
+def summarize(queries):
+    """Count, total and slowest statement of a request's [sql, seconds] entries, grouped by shape for repeats"""
+    patterns = {}
+    for sql, seconds in queries:
+        pattern = patterns.setdefault(normalize(sql), [0, 0.0])
+        pattern[0] += 1
+        pattern[1] += seconds
+    slowest = max(queries, key=lambda entry: entry[1], default=None)
+    repeated = sorted(((count, seconds, shape) for shape, (count, seconds) in patterns.items() if count > 1), reverse=True)
+    return {
+        "queries": len(queries),
+        "sql_ms": round(sum(seconds for _, seconds in queries) * 1000, 2),
+        "slowest_ms": round(slowest[1] * 1000, 2) if slowest else 0.0,
+        "slowest_sql": _short(slowest[0]) if slowest else None,
+        "repeated": [{"sql": _short(shape), "count": count, "ms": round(seconds * 1000, 2)}
+                     for count, seconds, shape in repeated[:MAX_PATTERNS]],
+        "n_plus_one": sum(count >= REPEAT_THRESHOLD for count, _, _ in repeated),
+    }
+
+
+def server_timing(summary, app_ms):
+    """Server-Timing header value; browser dev tools show it next to the request"""
+    return (f'sql;dur={summary["sql_ms"]:.2f};desc="{summary["queries"]} queries", '
+            f'sql-slowest;dur={summary["slowest_ms"]:.2f}, app;dur={app_ms:.2f}')
+
+
+def _start_request():
+    g.sql_queries = []
+    g.sql_started = time.perf_counter()
+
+
+def _finish_request(response):
+    queries = g.pop("sql_queries", None)
+    if queries is None:
+        return response
+    app_ms = (time.perf_counter() - g.pop("sql_started")) * 1000
+    summary = summarize(queries)
+    response.headers.add("Server-Timing", server_timing(summary, app_ms))
+    slow = [(sql, seconds) for sql, seconds in queries if seconds * 1000 >= SLOW_QUERY_MS]
+    level = logging.WARNING if summary["n_plus_one"] or slow else logging.INFO
+    # Healthy requests cost nothing here unless INFO logging was asked for
+    if not log.isEnabledFor(level):
+        return response
+    where = {"method": request.method, "path": request.path}
+    for sql, seconds in slow:
+        log.warning(json.dumps({"event": "slow_query", **where, "ms": round(seconds * 1000, 2), "sql": _short(sql)}))
+    record = {"event": "request", "ts": round(time.time(), 3), **where, "status": response.status_code,
+              "app_ms": round(app_ms, 2), **summary}
+    log.log(level, json.dumps(record))
+    return response
+
+
+def _configure_log():
+    if log.handlers:
+        return
+    handler = logging.FileHandler(LOG_FILE) if LOG_FILE else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+
+
+def init_app(app, engine=None):
+    """Measure the SQL of every request: pooled sqlite3 connections always, a SQLAlchemy engine when given"""
+    if not ENABLED:
+        return
+    _configure_log()
+    # Connections the pool opens from now on are instrumented; the apps call this before their first request
+    db_pool.connection_factory = InstrumentedConnection
+    if engine is not None:
+        instrument_engine(engine)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,438 @@
+# synthetic_data.py - Deterministic bulk clinics, patients and visit history for benchmarks and load tests
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from bisect import bisect_right
+from datetime import date, timedelta
+
+import alert_engine
+import rollups
+import schema_migrations
+import sequences
+import ultra_migrations
+
+# Columns written per table, in merge order; every other column keeps its default
+COLUMNS = {
+    "clinics": ("id", "clinic_code", "name", "location", "incharge", "login_id", "password", "email", "phone",
+                "created_at"),
+    "patients": ("id", "clinic_id", "patient_code", "name", "sex", "age", "dob", "treatment", "mobile", "email",
+                 "address", "emergency_contact", "medical_history", "allergies", "last_visit", "next_appointment",
+                 "status", "created_at", "updated_at", "insurance_provider", "insurance_number", "preferred_doctor",
+                 "referred_by", "occupation", "total_visits", "total_spent"),
+    "patient_analytics": ("clinic_id", "patient_id", "visit_date", "symptoms", "diagnosis", "treatment_given",
+                          "treatment_cost", "recovery_days", "satisfaction_rating", "doctor_assigned",
+                          "consultation_time", "payment_mode", "insurance_claim", "follow_up_required",
+                          "pain_level_before", "pain_level_after", "treatment_complexity", "created_at"),
+    "revenue_analytics": ("clinic_id", "transaction_date", "patient_id", "service_type", "base_amount",
+                          "discount_amount", "tax_amount", "final_amount", "payment_method", "payment_status",
+                          "insurance_coverage", "outstanding_amount", "transaction_reference", "created_at"),
+    "patient_feedback": ("clinic_id", "patient_id", "feedback_type", "rating", "review_text", "sentiment_score",
+                         "would_recommend", "feedback_date", "created_at"),
+    "appointments": ("clinic_id", "patient_id", "appointment_date", "treatment_type", "notes", "status", "no_show",
+                     "actual_duration", "created_at"),
+}
+# Every generated clinic logs in as USER### with this password
+PASSWORD = "synthetic123"
+# Rows buffered in a worker before one executemany per table
+BATCH_ROWS = 50000
+# Shards per worker process: clinic sizes are skewed, so smaller shards keep every process busy
+SHARDS_PER_PROCESS = 4
+# Shard files are scratch space: no journal, no fsync
+SHARD_PRAGMAS = ("PRAGMA journal_mode = OFF", "PRAGMA synchronous = OFF", "PRAGMA cache_size = -65536")
+LOAD_PRAGMAS = ("PRAGMA journal_mode = WAL", "PRAGMA synchronous = OFF", "PRAGMA cache_size = -262144",
+                "PRAGMA temp_store = MEMORY")
+
+
+
+def _cumulative(weights):
+    running, result = 0, []
+    for weight in weights:
+        running += weight
+        result.append(running)
+    return result
+
+
+def _weighted(values, weights):
+    """(values, cumulative weights): one bisect per draw instead of random.choices' per-call setup"""
+    return list(values), _cumulative(weights)
+
+
+# (city, state, share of clinics, price level)
+CITIES = [
+    ("Mumbai", "Maharashtra", 14, 1.5), ("Delhi", "Delhi", 13, 1.4), ("Bangalore", "Karnataka", 11, 1.4),
+    ("Hyderabad", "Telangana", 8, 1.2), ("Chennai", "Tamil Nadu", 8, 1.2), ("Kolkata", "West Bengal", 7, 1.1),
+    ("Pune", "Maharashtra", 7, 1.2), ("Ahmedabad", "Gujarat", 6, 1.0), ("Jaipur", "Rajasthan", 5, 0.9),
+    ("Lucknow", "Uttar Pradesh", 5, 0.85), ("Indore", "Madhya Pradesh", 4, 0.85), ("Nagpur", "Maharashtra", 3, 0.8),
+    ("Patna", "Bihar", 3, 0.7), ("Bhopal", "Madhya Pradesh", 3, 0.8), ("Coimbatore", "Tamil Nadu", 3, 0.85),
+]
+LOCALITIES = [
+    "Shivaji Nagar", "Gandhi Nagar", "Laxmi Nagar", "Civil Lines", "Model Town", "Subhash Nagar", "Nehru Colony",
+    "Rampur", "Krishna Nagar", "Shastri Nagar", "Ram Nagar", "Indira Colony", "Vijay Nagar", "Patel Nagar",
+    "Sadar Bazaar", "Station Road", "Azad Nagar", "Ganesh Peth", "Rajendra Nagar", "Ashok Vihar", "Tilak Nagar",
+    "Saket", "Kamla Nagar", "Anand Vihar", "Sector 14", "Sector 21", "Old Town", "New Colony", "Lake View",
+    "Hill Side",
+]
+# (treatment, share of first visits, base price, minutes)
+TREATMENTS = [
+    ("General Checkup", 24, 500, 20), ("Teeth Cleaning", 18, 1200, 30), ("Dental Filling", 16, 1800, 40),
+    ("Root Canal Treatment", 9, 6500, 75), ("Tooth Extraction", 8, 1500, 30), ("Crowns & Bridges", 5, 9000, 60),
+    ("Orthodontics", 4, 35000, 45), ("Teeth Whitening", 4, 8000, 60), ("Consultation", 4, 300, 15),
+    ("Periodontal Treatment", 3, 5000, 50), ("Emergency Treatment", 3, 2500, 40), ("Dental Implants", 2, 30000, 90),
+]
+# Treatment share multipliers for under-20s and over-55s
+AGE_TREATMENTS = {
+    "young": {"Orthodontics": 5, "Dental Implants": 0, "Crowns & Bridges": 0.2, "Root Canal Treatment": 0.5},
+    "adult": {},
+    "senior": {"Dental Implants": 4, "Tooth Extraction": 2, "Crowns & Bridges": 2, "Orthodontics": 0.1,
+               "Teeth Whitening": 0.3},
+}
+# GST applies to cosmetic dentistry only; clinical treatment is exempt
+TAXED = {"Teeth Whitening": 0.18}
+MALE_NAMES = ["Rajesh", "Amit", "Suresh", "Deepak", "Manoj", "Vikash", "Rohit", "Ankit", "Sanjay", "Arvind",
+              "Rakesh", "Naveen", "Sachin", "Vikas", "Rahul", "Arjun", "Karan", "Imran", "Joseph", "Harpreet"]
+FEMALE_NAMES = ["Priya", "Neha", "Kavita", "Sunita", "Pooja", "Meera", "Shruti", "Ritu", "Nisha", "Divya",
+                "Seema", "Swati", "Preeti", "Rekha", "Madhuri", "Anjali", "Fatima", "Mary", "Lakshmi", "Simran"]
+SURNAMES = ["Kumar", "Sharma", "Singh", "Gupta", "Patel", "Mishra", "Agarwal", "Yadav", "Verma", "Shah", "Jain",
+            "Reddy", "Pandey", "Desai", "Malhotra", "Khanna", "Tiwari", "Saxena", "Shukla", "Joshi", "Iyer", "Nair",
+            "Das", "Khan", "Fernandes", "Gill", "Rao", "Menon", "Chatterjee", "Kulkarni"]
+DOCTOR_NAMES = ["Dr. Mehta", "Dr. Rao", "Dr. Iyer", "Dr. Kapoor", "Dr. Bose", "Dr. Naidu", "Dr. Sethi",
+                "Dr. Pillai", "Dr. Ghosh", "Dr. Bhatt", "Dr. Chopra", "Dr. Menon"]
+CLINIC_NAMES = ["Smile", "Bright", "Pearl", "Care", "Perfect", "Sparkle", "Healthy", "Family", "City", "Apex"]
+CLINIC_KINDS = ["Dental Clinic", "Dental Care", "Dental Studio", "Dental Centre", "Dental Hospital"]
+SYMPTOMS = ["Toothache", "Bleeding gums", "Tooth sensitivity", "Bad breath", "Jaw pain", "Broken tooth",
+            "Loose tooth", "Swollen gums", "Difficulty chewing", "Tooth discoloration", "Routine visit"]
+DIAGNOSES = ["Dental Caries", "Gingivitis", "Periodontitis", "Pulpitis", "Tooth Abscess", "Malocclusion",
+             "Tooth Fracture", "Enamel Erosion", "TMJ Disorder", "Healthy"]
+MEDICAL_HISTORY = _weighted(["None", "Diabetes", "Hypertension", "Asthma", "Heart Disease", "Thyroid"], [70, 10, 10, 4, 3, 3])
+ALLERGIES = _weighted(["None", "Penicillin", "Latex", "Lidocaine", "Ibuprofen"], [85, 6, 3, 3, 3])
+INSURERS = ["Star Health", "HDFC ERGO", "ICICI Lombard", "Niva Bupa", "Care Health"]
+REFERRALS = _weighted(["Walk-in", "Friend", "Google", "Social Media", "Doctor Referral"], [30, 30, 20, 12, 8])
+OCCUPATIONS = _weighted(["Engineer", "Teacher", "Business", "Homemaker", "Student", "Retired", "Doctor", "Labourer",
+                "Government Service"], [12, 8, 14, 16, 18, 10, 3, 9, 10])
+PAYMENT_METHODS = _weighted(["UPI", "Cash", "Card"], [40, 30, 20])
+PAYMENT_STATUSES = _weighted(["Completed", "Pending", "Failed"], [94, 4, 2])
+FEEDBACK_TYPES = _weighted(["Treatment", "Service", "Staff", "Facility", "Billing"], [40, 25, 15, 10, 10])
+REVIEWS = {
+    1: ["Very painful and nobody explained anything", "Waited two hours, will not come back"],
+    2: ["Treatment was rushed", "Too expensive for what was done"],
+    3: ["Okay experience", "Treatment fine but long waiting time"],
+    4: ["Good service", "Professional staff", "Clean facility"],
+    5: ["Excellent care", "Very satisfied with treatment", "Painless, highly recommended"],
+}
+COMPLEXITY = ["Simple", "Standard", "Complex", "Highly Complex"]
+# Weekday registration weights (Mon..Sun) and clinic hours 9:00-20:59 with morning and evening peaks
+WEEKDAY_WEIGHTS = [1.0, 1.0, 0.95, 0.95, 1.0, 1.2, 0.25]
+HOURS = _weighted(range(9, 21), [6, 10, 11, 9, 5, 4, 6, 8, 10, 12, 9, 4])
+SEXES = _weighted(["Female", "Male", "Other"], [52, 47, 1])
+# Chance a patient comes back after each visit, and the mean days between visits beyond a one-week minimum
+RETURN_CHANCE = 0.55
+RETURN_DAYS = 75
+FEEDBACK_CHANCE = 0.25
+# Future appointments for patients seen in the last RECENT_DAYS
+RECENT_DAYS = 120
+BOOKED_CHANCE = 0.35
+
+
+def plan(seed, clinics, patients):
+    """Patients per clinic: lognormal sizes, so a few large clinics hold a large share as in production"""
+    rng = random.Random(f"{seed}:plan")
+    weights = [rng.lognormvariate(0, 1.0) for _ in range(clinics)]
+    total = sum(weights)
+    exact = [patients * weight / total for weight in weights]
+    counts = [int(value) for value in exact]
+    # Largest remainders take the rounding leftovers, so the counts add up to patients exactly
+    for index in sorted(range(clinics), key=lambda i: counts[i] - exact[i])[:patients - sum(counts)]:
+        counts[index] += 1
+    return counts
+
+
+def _age(rng):
+    # Children, working-age adults and seniors
+    group = rng.random()
+    if group < 0.18:
+        age = rng.gauss(10, 3.5)
+    elif group < 0.75:
+        age = rng.gauss(36, 11)
+    else:
+        age = rng.gauss(63, 9)
+    return min(95, max(3, int(age)))
+
+
+# (TREATMENTS, cumulative weights) per age group
+TREATMENT_WEIGHTS = {group: (TREATMENTS, _cumulative([share * multipliers.get(name, 1)
+                                                      for name, share, *_ in TREATMENTS]))
+                     for group, multipliers in AGE_TREATMENTS.items()}
+
+
+def generate_clinic(spec, seed, start, end, out):
+    """Append one clinic's rows to the out lists; seeded per clinic, so shards and processes do not matter"""
+    ordinal, clinic_id, number, first_patient_id, patients = spec
+    rng = random.Random(f"{seed}:{ordinal}")
+    random_ = rng.random
+
+    def pick(values, cum_weights):
+        return values[bisect_right(cum_weights, random_() * cum_weights[-1])]
+
+    def one(values):
+        return values[int(random_() * len(values))]
+
+    def between(low, high):
+        return low + int(random_() * (high - low + 1))
+
+    clinic_code = f"CLINIC{number:04d}"
+    city, state, _, price_level = rng.choices(CITIES, [city[2] for city in CITIES])[0]
+    total_days = (end - start).days + 1
+    # Most clinics predate the window; the rest open during its first 80%
+    open_day = 0 if random_() < 0.6 else int(random_() * total_days * 0.8)
+    growth = rng.uniform(0.2, 1.5)
+    price = price_level * rng.lognormvariate(0, 0.15)
+    no_show_rate = rng.betavariate(2, 20)
+    quality = rng.gauss(0, 0.35)
+    doctors = rng.sample(DOCTOR_NAMES, min(len(DOCTOR_NAMES), 1 + int(rng.paretovariate(2))))
+    doctor_weights = _cumulative([1 / (rank + 1) for rank in range(len(doctors))])
+    localities = rng.sample(LOCALITIES, 12)
+    locality_weights = _cumulative([1 / (rank + 1) for rank in range(len(localities))])
+    pin = between(110, 855) * 1000
+    opened = start + timedelta(days=open_day - (between(30, 3000) if open_day == 0 else 0))
+    out["clinics"].append((
+        clinic_id, clinic_code, f"{one(CLINIC_NAMES)} {one(CLINIC_KINDS)} {city}",
+        f"{one(localities)}, {city}", doctors[0], f"USER{number:03d}", PASSWORD,
+        f"clinic{number}@synthetic.example", f"+91{between(6000000000, 9999999999)}", f"{opened} 10:00:00"))
+
+    days = [(start + timedelta(days=offset)).isoformat() for offset in range(total_days)]
+    weekday = start.weekday()
+    # Registrations grow linearly over the clinic's life and follow the weekly pattern
+    day_weights = _cumulative([
+        0 if offset < open_day else WEEKDAY_WEIGHTS[(weekday + offset) % 7] * (1 + growth * offset / total_days)
+        for offset in range(total_days)])
+    registrations = sorted(rng.choices(range(total_days), cum_weights=day_weights, k=patients))
+    recent = total_days - RECENT_DAYS
+    visits = 0
+
+    for index, registered in enumerate(registrations):
+        patient_id = first_patient_id + index
+        sex = pick(*SEXES)
+        first = one(FEMALE_NAMES if sex == "Female" else MALE_NAMES)
+        surname = one(SURNAMES)
+        age = _age(rng)
+        treatments, weights = TREATMENT_WEIGHTS["young" if age < 20 else "senior" if age >= 55 else "adult"]
+        treatment = pick(treatments, weights)
+        insured = random_() < 0.2
+        insurer = one(INSURERS) if insured else None
+        doctor = pick(doctors, doctor_weights)
+        address = (f"{pick(localities, locality_weights)}, {city}, {state}, India - "
+                   f"{pin + between(1, 99):06d}" if random_() < 0.85 else "")
+
+        # Visit history: the first visit is the registration, then geometric returns with exponential gaps
+        day, visit_treatment, spent, count, last = registered, treatment, 0.0, 0, None
+        while day < total_days:
+            name, _, base, minutes = visit_treatment
+            stamp = f"{days[day]} {pick(*HOURS):02d}:{between(0, 59):02d}:00"
+            if random_() < no_show_rate / (1 - no_show_rate):
+                missed = max(registered, day - between(1, 14))
+                out["appointments"].append((clinic_id, patient_id, f"{days[missed]} {stamp[11:]}", name,
+                                            "Missed", "No Show", 1, None, stamp))
+            cost = round(base * price * rng.lognormvariate(0, 0.3), -1)
+            rating = min(5, max(1, round(rng.gauss(4.1 + quality, 0.9))))
+            pain = between(2, 9)
+            method = "Insurance" if insured and random_() < 0.5 else pick(*PAYMENT_METHODS)
+            duration = max(10, int(rng.gauss(minutes, minutes * 0.25)))
+            out["patient_analytics"].append((
+                clinic_id, patient_id, days[day], one(SYMPTOMS), one(DIAGNOSES), name, cost,
+                between(0, 14), rating, doctor if random_() < 0.8 else pick(doctors, doctor_weights),
+                duration, method, round(cost * 0.7, 2) if method == "Insurance" else 0,
+                "Yes" if random_() < 0.3 else "No", pain, max(0, pain - between(3, 8)),
+                COMPLEXITY[min(3, int(math.log10(max(base, 100))) - 2 + (random_() < 0.3))], stamp))
+            discount = round(cost * rng.uniform(0.05, 0.15), 2) if random_() < 0.12 else 0
+            tax = round((cost - discount) * TAXED.get(name, 0), 2)
+            final = round(cost - discount + tax, 2)
+            status = pick(*PAYMENT_STATUSES)
+            out["revenue_analytics"].append((
+                clinic_id, stamp, patient_id, name, cost, discount, tax, final, method, status,
+                round(final * 0.7, 2) if method == "Insurance" else 0, final if status == "Pending" else 0,
+                f"TXN-{clinic_code}-{visits + 1:07d}", stamp))
+            out["appointments"].append((clinic_id, patient_id, stamp, name, None, "Completed", 0, duration, stamp))
+            # Very happy and unhappy patients are the likeliest to leave a review
+            if random_() < FEEDBACK_CHANCE * (1.6 if rating <= 2 else 1):
+                score = max(-1.0, min(1.0, (rating - 3) / 2 + rng.gauss(0, 0.15)))
+                given = min(total_days - 1, day + between(0, 5))
+                out["patient_feedback"].append((
+                    clinic_id, patient_id, pick(*FEEDBACK_TYPES), rating, one(REVIEWS[rating]),
+                    round(score, 2), int(rating >= 4), days[given], f"{days[given]} 20:00:00"))
+            spent += cost
+            count += 1
+            visits += 1
+            last = day
+            if random_() >= RETURN_CHANCE:
+                break
+            day += 7 + int(rng.expovariate(1 / RETURN_DAYS))
+            # Returns are mostly follow-ups of the same treatment
+            visit_treatment = visit_treatment if random_() < 0.5 else pick(treatments, weights)
+
+        booked = None
+        if last >= recent and random_() < BOOKED_CHANCE:
+            booked = f"{end + timedelta(days=between(1, 30))} {pick(*HOURS):02d}:00:00"
+            out["appointments"].append((clinic_id, patient_id, booked, treatment[0], "Follow-up", "Scheduled", 0,
+                                        None, f"{days[last]} 21:00:00"))
+        created = f"{days[registered]} {between(9, 20):02d}:{between(0, 59):02d}:00"
+        dob = date.fromisoformat(days[registered]) - timedelta(days=age * 365 + between(0, 364))
+        out["patients"].append((
+            patient_id, clinic_id, f"{clinic_code}-P{index + 1:04d}", f"{first} {surname}", sex, age, dob.isoformat(),
+            treatment[0], f"{one('6789')}{between(0, 999999999):09d}",
+            f"{first.lower()}.{surname.lower()}{between(1, 999)}@example.com" if random_() < 0.55 else "",
+            address, f"{between(6000000000, 9999999999)}", pick(*MEDICAL_HISTORY), pick(*ALLERGIES),
+            days[last], booked, "Active" if last >= total_days - 365 else "Inactive", created,
+            f"{days[last]} 21:00:00", insurer, f"INS{between(100000, 999999)}" if insured else "", doctor,
+            pick(*REFERRALS), pick(*OCCUPATIONS), count, round(spent, 2)))
+
+
+def _flush(conn, out, counts):
+    for table, rows in out.items():
+        if rows:
+            columns = COLUMNS[table]
+            conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                             rows)
+            counts[table] += len(rows)
+            rows.clear()
+
+
+def generate_shard(task):
+    """Write a contiguous run of clinics to a scratch SQLite file; returns (path, rows per table)"""
+    path, seed, start, end, specs = task
+    conn = sqlite3.connect(path)
+    for pragma in SHARD_PRAGMAS:
+        conn.execute(pragma)
+    for table, columns in COLUMNS.items():
+        conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+    out, counts = {table: [] for table in COLUMNS}, dict.fromkeys(COLUMNS, 0)
+    for spec in specs:
+        generate_clinic(spec, seed, start, end, out)
+        if sum(len(rows) for rows in out.values()) >= BATCH_ROWS:
+            _flush(conn, out, counts)
+    _flush(conn, out, counts)
+    conn.commit()
+    conn.close()
+    return path, counts
+
+
+def _shards(specs, count):
+    """Split clinic specs into count contiguous runs of about equal patients"""
+    total = sum(spec[4] for spec in specs) or 1
+    shards, current, filled = [], [], 0
+    for spec in specs:
+        current.append(spec)
+        filled += spec[4]
+        if filled >= total * (len(shards) + 1) / count and len(shards) < count - 1:
+            shards.append(current)
+            current = []
+    return [shard for shard in shards + [current] if shard]
+
+
+def _merge(cursor, path, specs):
+    """Copy one shard into the main database in a single transaction, with the code counters it uses"""
+    cursor.execute("ATTACH DATABASE ? AS shard", (path,))
+    cursor.execute("BEGIN IMMEDIATE")
+    for table, columns in COLUMNS.items():
+        cursor.execute(f"INSERT INTO main.{table} ({', '.join(columns)}) "
+                       f"SELECT {', '.join(columns)} FROM shard.{table} ORDER BY rowid")
+    cursor.execute("""INSERT INTO sequences (name, scope, value) VALUES (?, 0, ?)
+        ON CONFLICT (name, scope) DO UPDATE SET value = MAX(value, excluded.value)""",
+                   (sequences.CLINIC, specs[-1][2]))
+    cursor.executemany("INSERT OR REPLACE INTO sequences (name, scope, value) VALUES (?, ?, ?)",
+                       [(sequences.PATIENT, spec[1], spec[4]) for spec in specs if spec[4]])
+    cursor.execute("COMMIT")
+    cursor.execute("DETACH DATABASE shard")
+
+
+def _counter(conn, name):
+    row = conn.execute("SELECT value FROM sequences WHERE name = ? AND scope = 0", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def generate(database, clinics, patients, seed=1, processes=None, months=24, end=None):
+    """Append clinics and their patients to an ultra_simple_app database; returns rows written per table
+
+    Clinic ids, codes and patient ids continue after whatever the database already holds. Workers write
+    shards in parallel and each shard is merged in clinic order in one transaction, so the same seed
+    and --end give the same rows whatever the process count
+    """
+    end = end or date.today()
+    start = end - timedelta(days=round(months * 30.44))
+    processes = processes or os.cpu_count() or 1
+    conn = sqlite3.connect(database, isolation_level=None)
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+    schema_migrations.migrate(conn, ultra_migrations.MIGRATIONS)
+    sequences.bootstrap(conn)
+    first_clinic = conn.execute("SELECT COALESCE(MAX(id), 0) FROM clinics").fetchone()[0] + 1
+    first_number = _counter(conn, sequences.CLINIC) + 1
+    next_patient = conn.execute("SELECT COALESCE(MAX(id), 0) FROM patients").fetchone()[0] + 1
+    specs = []
+    for ordinal, count in enumerate(plan(seed, clinics, patients)):
+        specs.append((ordinal + 1, first_clinic + ordinal, first_number + ordinal, next_patient, count))
+        next_patient += count
+
+    workdir = tempfile.mkdtemp(prefix="synthetic-", dir=os.path.dirname(os.path.abspath(database)))
+    tasks = [(os.path.join(workdir, f"shard-{index:04d}.db"), seed, start, end, shard)
+             for index, shard in enumerate(_shards(specs, min(clinics, processes * SHARDS_PER_PROCESS)))]
+    totals = dict.fromkeys(COLUMNS, 0)
+    cursor = conn.cursor()
+    placeholders = ", ".join("?" * len(COLUMNS))
+    triggers = cursor.execute(f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' "
+                              f"AND tbl_name IN ({placeholders}) ORDER BY name", list(COLUMNS)).fetchall()
+    # Per-row rollup triggers would double the merge time; the rollups are rebuilt in one pass instead
+    cursor.execute("BEGIN IMMEDIATE")
+    for name, _ in triggers:
+        cursor.execute(f"DROP TRIGGER {name}")
+    cursor.execute("COMMIT")
+    try:
+        with multiprocessing.Pool(processes) as pool:
+            # imap hands shards back in order: each one is merged while later ones are still generating
+            for number, (path, counts) in enumerate(pool.imap(generate_shard, tasks), 1):
+                _merge(cursor, path, tasks[number - 1][4])
+                os.remove(path)
+                for table, count in counts.items():
+                    totals[table] += count
+                print(f"🧩 Shard {number}/{len(tasks)} merged ({sum(totals.values()):,} rows so far)")
+    finally:
+        # Also after a failed run, so the shards merged so far are counted and later writes are tracked
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        cursor.execute("BEGIN IMMEDIATE")
+        for _, sql in triggers:
+            cursor.execute(sql)
+        rollups.rebuild(cursor)
+        cursor.execute("COMMIT")
+        shutil.rmtree(workdir, ignore_errors=True)
+    # Generated history is not news: the alert engine starts from the end of it
+    alert_engine.skip_history(conn)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append deterministic synthetic clinics and patient history")
+    parser.add_argument("database", nargs="?", default="simple_clinic.db")
+    parser.add_argument("--clinics", type=int, default=100)
+    parser.add_argument("--patients", type=int, default=100000, help="total patients across all clinics")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--months", type=int, default=24, help="history length ending at --end")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day of history (default today); "
+                        "fix it to reproduce a database exactly")
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per CPU)")
+    options = parser.parse_args()
+    started = time.perf_counter()
+    written = generate(options.database, options.clinics, options.patients, options.seed, options.processes,
+                       options.months, options.end)
+    elapsed = time.perf_counter() - started
+    for table, count in written.items():
+        print(f"   {table:<20} {count:>12,}")
+    print(f"✅ Wrote {sum(written.values()):,} rows to {options.database} in {elapsed:.1f}s "
+          f"({sum(written.values()) / elapsed:,.0f} rows/s)")
@@ -0,0 +1,63 @@
+# tests/test_alert_engine.py - Revenue days are judged by the calendar; closed days are not drops, outages alert once
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import alert_engine
+import ultra_migrations
+
+START = date(2024, 1, 1)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    ultra_migrations.create_base_tables(conn)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def add_revenue(conn, clinic_id, days, amount=1000.0):
+    conn.executemany("INSERT INTO revenue_analytics (clinic_id, transaction_date, final_amount) VALUES (?, ?, ?)",
+                     [(clinic_id, (START + timedelta(days=d)).isoformat(), amount) for d in days])
+    conn.commit()
+
+
+def drop_days(conn, clinic_id):
+    rows = conn.execute("SELECT dedupe_key FROM smart_alerts WHERE clinic_id = ? ORDER BY dedupe_key", (clinic_id,))
+    return [key.split(":", 1)[1] for key, in rows]
+
+
+def test_real_drop_is_judged(conn):
+    add_revenue(conn, 1, range(25))
+    add_revenue(conn, 1, [25], amount=100.0)
+    add_revenue(conn, 1, range(26, 30))
+    alert_engine.process(conn, now=START + timedelta(days=30))
+    assert drop_days(conn, 1) == [(START + timedelta(days=25)).isoformat()]
+
+
+def test_weekly_closed_day_is_not_a_drop(conn):
+    # START is a Monday; the clinic never opens on Sundays
+    add_revenue(conn, 1, [d for d in range(90) if (START + timedelta(days=d)).weekday() != 6])
+    alert_engine.process(conn, now=START + timedelta(days=90))
+    assert drop_days(conn, 1) == []
+
+
+def test_outage_alerts_once_by_date(conn):
+    add_revenue(conn, 1, range(20))
+    alert_engine.process(conn, now=START + timedelta(days=20))
+    assert drop_days(conn, 1) == []
+
+    # No transaction since day 19: follow passes close the finished days and flag the outage once
+    first_missing = (START + timedelta(days=20)).isoformat()
+    for offset in range(22, 60):
+        alert_engine.process(conn, now=START + timedelta(days=offset))
+        expected = [f"outage:{first_missing}"] if offset - alert_engine.LATE_DAYS >= 20 + alert_engine.OUTAGE_DAYS else []
+        assert drop_days(conn, 1) == expected
+
+    # Trading again, then a second outage is a second alert
+    add_revenue(conn, 1, range(60, 70))
+    alert_engine.process(conn, now=START + timedelta(days=80))
+    assert drop_days(conn, 1) == [f"outage:{first_missing}", f"outage:{(START + timedelta(days=70)).isoformat()}"]
@@ -0,0 +1,64 @@
+# tests/test_analytics_summary.py - The dashboard summaries stay at a fixed number of statements
+import sqlite3
+
+import pytest
+
+import addresses
+import analytics_summary
+import rollups
+
+ADDRESSES = ["Kothrud, Pune, Maharashtra, India - 411038", "Baner, Pune, Maharashtra, India - 411045",
+             "Satellite, Ahmedabad, Gujarat, India - 380015"]
+
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE patients (id INTEGER PRIMARY KEY, clinic_id INTEGER, name TEXT, sex TEXT, age TEXT,
+            treatment TEXT, address TEXT, created_at TEXT, total_visits INTEGER, total_spent REAL);
+        CREATE TABLE patient_analytics (id INTEGER PRIMARY KEY, patient_id INTEGER, clinic_id INTEGER,
+            visit_date TEXT, diagnosis TEXT, treatment_cost REAL, doctor_assigned TEXT,
+            satisfaction_rating INTEGER, treatment_success_rate REAL);
+    """)
+    addresses.ensure_schema(conn)
+    rollups.ensure_schema(conn.cursor())
+    for i in range(30):
+        village, city, state = addresses.parse(ADDRESSES[i % 3])
+        conn.execute("""INSERT INTO patients (clinic_id, name, sex, age, treatment, address, address_village,
+                address_city, address_state, created_at, total_visits, total_spent)
+            VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, '2026-01-15 10:00:00', ?, ?)""",
+                     (f"Patient {i}", ("Male", "Female")[i % 2], str(20 + i), ("Cleaning", "Filling")[i % 2],
+                      ADDRESSES[i % 3], village, city, state, 1 + i % 3, 500.0 * i))
+        conn.execute("""INSERT INTO patient_analytics (patient_id, clinic_id, visit_date, diagnosis, treatment_cost,
+                doctor_assigned, satisfaction_rating, treatment_success_rate)
+            VALUES (?, 1, '2026-01-20', 'Caries', 1500, 'Dr. Rao', 4, 90)""", (i + 1,))
+    conn.commit()
+    yield conn.cursor()
+    conn.close()
+
+
+def count_statements(cursor, summarize):
+    statements = []
+    cursor.connection.set_trace_callback(statements.append)
+    try:
+        result = summarize()
+    finally:
+        cursor.connection.set_trace_callback(None)
+    return result, len(statements)
+
+
+@pytest.mark.parametrize("extended", [False, True])
+def test_clinic_summary_statement_count(cursor, extended):
+    summary, statements = count_statements(cursor, lambda: analytics_summary.clinic_summary(cursor, 1, extended))
+    assert summary.total_patients == 30 and summary.total_visits == 30
+    assert statements == analytics_summary.QUERY_COUNT
+
+
+def test_address_summary_statement_count(cursor):
+    summary, statements = count_statements(cursor, lambda: analytics_summary.address_summary(cursor, 1))
+    assert summary.patients_with_address == 30
+    assert (summary.village_count, summary.city_count, summary.state_count) == (3, 2, 2)
+    assert summary.top_cities == [("Pune", 20), ("Ahmedabad", 10)]
+    assert sum(location.patients for location in summary.locations) == 30
+    assert statements == analytics_summary.QUERY_COUNT
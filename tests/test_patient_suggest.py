@@ -0,0 +1,58 @@
+# tests/test_patient_suggest.py - Suggest indexes are capped per worker and one clinic's build never blocks another
+import threading
+
+import pytest
+
+import patient_suggest
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Replace the table read with an empty index; clinic 1's build waits until released"""
+    started, release = threading.Event(), threading.Event()
+    built = []
+
+    def build(database, clinic_id):
+        built.append(clinic_id)
+        if clinic_id == 1:
+            started.set()
+            release.wait(5)
+        return patient_suggest.PrefixIndex()
+
+    monkeypatch.setattr(patient_suggest, "_build", build)
+    patient_suggest.invalidate()
+    yield started, release, built
+    release.set()
+    patient_suggest.invalidate()
+
+
+def test_other_clinics_are_served_during_a_build(builds):
+    started, release, built = builds
+    slow = threading.Thread(target=patient_suggest.get_index, args=("clinic.db", 1))
+    waiting = threading.Thread(target=patient_suggest.get_index, args=("clinic.db", 1))
+    slow.start()
+    assert started.wait(5)
+    waiting.start()
+
+    assert patient_suggest.get_index("clinic.db", 2) is not None
+    assert slow.is_alive()
+
+    release.set()
+    slow.join(5)
+    waiting.join(5)
+    # The second lookup of clinic 1 waited for the first build instead of starting its own
+    assert built == [1, 2]
+
+
+def test_indexes_are_capped_least_recently_used_first(builds, monkeypatch):
+    monkeypatch.setattr(patient_suggest, "MAX_INDEXES", 3)
+    _, release, built = builds
+    release.set()
+    for clinic_id in (1, 2, 3):
+        patient_suggest.get_index("clinic.db", clinic_id)
+    patient_suggest.get_index("clinic.db", 1)
+    patient_suggest.get_index("clinic.db", 4)
+
+    assert list(patient_suggest._indexes) == [("clinic.db", 3), ("clinic.db", 1), ("clinic.db", 4)]
+    patient_suggest.get_index("clinic.db", 2)
+    assert built == [1, 2, 3, 4, 2]
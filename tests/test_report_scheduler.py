@@ -0,0 +1,62 @@
+# tests/test_report_scheduler.py - Saved filters match SQLite's types, and a failed scan leaves no files behind
+import csv
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import report_export
+import report_scheduler
+import ultra_migrations
+
+NOW = datetime(2026, 3, 1, 2, 0, 0)
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_scheduler, "OUTPUT_DIR", str(tmp_path / "reports"))
+    conn = sqlite3.connect(":memory:")
+    ultra_migrations.create_base_tables(conn)
+    ultra_migrations.create_custom_report_runs(conn)
+    conn.executemany("INSERT INTO patients (clinic_id, patient_code, name, sex, age, treatment, created_at) VALUES (1, ?, ?, ?, ?, ?, ?)",
+                     [(f"CLINIC0001-P{i:04d}", f"Patient {i}", ("Male", "Female")[i % 2], 28 + i % 4,
+                       ("Cleaning", "Filling")[i % 2], "2026-02-20 10:00:00") for i in range(1, 21)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def schedule(conn, filters):
+    cursor = conn.execute("""INSERT INTO custom_reports (clinic_id, report_name, report_type, filters, columns,
+            is_scheduled, schedule_frequency) VALUES (1, 'Filtered', 'comprehensive', ?, ?, 1, 'monthly')""",
+                          (json.dumps(filters), json.dumps(["patient_code", "age"])))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def written_ages(report_id):
+    with open(report_scheduler.output_path(report_id), encoding="utf-8-sig") as f:
+        return [row[1] for row in list(csv.reader(f))[1:]]
+
+
+@pytest.mark.parametrize("age", [30, "30", 30.0])
+def test_filter_value_is_compared_as_the_column_type(conn, age):
+    report_id = schedule(conn, {"age": age, "window_days": 0})
+    assert report_scheduler.run_due(conn, NOW) == (1, 1)
+    assert written_ages(report_id) == ["30"] * 5
+
+
+def test_failed_scan_removes_partial_files(conn, monkeypatch):
+    report_ids = [schedule(conn, {"sex": "Male"}), schedule(conn, {"sex": "Female"})]
+
+    def failing(cursor, batch_size=report_export.BATCH_SIZE):
+        yield cursor.fetchmany(5)
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(report_export, "iter_batches", failing)
+    assert report_scheduler.run_due(conn, NOW) == (0, 1)
+    assert os.listdir(report_scheduler.OUTPUT_DIR) == []
+    errors = conn.execute("SELECT report_id, error FROM custom_report_runs ORDER BY report_id").fetchall()
+    assert errors == [(report_id, "disk I/O error") for report_id in report_ids]
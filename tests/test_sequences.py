@@ -0,0 +1,68 @@
+# tests/test_sequences.py - Patient codes issued by POST /api/patients under concurrent requests
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db, init_database
+from app.models import Clinic, Patient
+
+THREADS = 8
+PER_THREAD = 5
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'dental.db'}")
+    app = create_app(["api"])
+    init_database(app)
+    with app.app_context():
+        db.session.add(Clinic(clinic_code="CLINIC0001", name="Test Clinic", login_id="test",
+                              password_hash=generate_password_hash("secret")))
+        db.session.commit()
+    token = app.test_client().post("/api/token", json={"login_id": "test", "password": "secret"}).json["access_token"]
+    return app, {"Authorization": f"Bearer {token}"}
+
+
+def add_patients(app, headers):
+    """POST PER_THREAD patients from each of THREADS threads at once; returns the issued numbers"""
+    codes = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def post():
+        client = app.test_client()
+        start.wait()
+        for i in range(PER_THREAD):
+            response = client.post("/api/patients", json={"name": f"Patient {i}"}, headers=headers)
+            with lock:
+                if response.status_code == 200:
+                    codes.append(response.json["patient_code"])
+                else:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=post) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert all(code.startswith("CLINIC0001-P") for code in codes)
+    return [int(code.rsplit("-P", 1)[1]) for code in codes]
+
+
+def test_concurrent_codes_are_unique_and_contiguous(api):
+    numbers = add_patients(*api)
+    assert sorted(numbers) == list(range(1, THREADS * PER_THREAD + 1))
+
+
+def test_codes_continue_after_delete(api):
+    app, headers = api
+    first = add_patients(app, headers)
+    with app.app_context():
+        db.session.delete(Patient.query.filter_by(patient_code=f"CLINIC0001-P{max(first):04d}").one())
+        db.session.commit()
+    # The deleted patient's number is never handed out again
+    numbers = add_patients(app, headers)
+    assert sorted(numbers) == list(range(len(first) + 1, 2 * len(first) + 1))
@@ -0,0 +1,49 @@
+# tests/test_snapshot_export.py - An incremental snapshot drops deleted rows and matches the live table
+import sqlite3
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import snapshot_export  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "dental.db")
+    conn.execute("""CREATE TABLE patients (id INTEGER PRIMARY KEY, clinic_id INTEGER, treatment_type TEXT,
+        age INTEGER, created_at DATETIME)""")
+    conn.executemany("INSERT INTO patients (clinic_id, treatment_type, age, created_at) VALUES (?, ?, ?, ?)",
+                     [(1 + i % 3, ("Cleaning", "Filling")[i % 2], 20 + i, f"2026-0{1 + i % 3}-10 09:00:00")
+                      for i in range(30)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def snapshot_ids(snapshot_dir):
+    return sorted(snapshot_export.read("patients", ["id"], snapshot_dir)["id"].tolist())
+
+
+def live_ids(conn):
+    return [row[0] for row in conn.execute("SELECT id FROM patients ORDER BY id")]
+
+
+def test_deletes_leave_the_snapshot(conn, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    snapshot_export.refresh(conn, snapshot_dir)
+    assert snapshot_ids(snapshot_dir) == live_ids(conn)
+
+    # Row 5 is edited into another month first, so both of its copies must go
+    conn.execute("UPDATE patients SET created_at = '2026-03-20 09:00:00' WHERE id = 5")
+    conn.commit()
+    snapshot_export.refresh(conn, snapshot_dir)
+    conn.execute("DELETE FROM patients WHERE id IN (2, 5, 17)")
+    conn.execute("INSERT INTO patients (clinic_id, treatment_type, age, created_at) VALUES (2, 'Filling', 44, '2026-02-01')")
+    conn.commit()
+
+    snapshot_export.refresh(conn, snapshot_dir)
+    assert snapshot_ids(snapshot_dir) == live_ids(conn)
+    # Nothing new: the deletes are not applied twice
+    assert snapshot_export.refresh(conn, snapshot_dir) == {"patients": 0}
+    assert snapshot_ids(snapshot_dir) == live_ids(conn)
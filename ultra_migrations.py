@@ -0,0 +1,495 @@
+# ultra_migrations.py - Ordered schema migrations for simple_clinic.db (ultra_simple_app)
+from schema_migrations import Migration, add_missing_columns, update_in_batches
+
+# Version 1 schema; CREATE IF NOT EXISTS lets databases from before versioning adopt it as-is
+BASE_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS clinics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_code TEXT UNIQUE,
+        name TEXT NOT NULL,
+        location TEXT,
+        incharge TEXT,
+        login_id TEXT UNIQUE,
+        password TEXT,
+        email TEXT,
+        phone TEXT,
+        google_id TEXT,
+        reset_token TEXT,
+        reset_expires DATETIME,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS patients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_id INTEGER,
+        patient_code TEXT UNIQUE,
+        name TEXT NOT NULL,
+        sex TEXT,
+        age INTEGER,
+        dob DATE,
+        treatment TEXT,
+        mobile TEXT,
+        email TEXT,
+        address TEXT,
+        emergency_contact TEXT,
+        medical_history TEXT,
+        allergies TEXT,
+        last_visit DATE,
+        next_appointment DATETIME,
+        status TEXT DEFAULT 'Active',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (clinic_id) REFERENCES clinics (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_id INTEGER,
+        patient_id INTEGER,
+        appointment_date DATETIME,
+        treatment_type TEXT,
+        notes TEXT,
+        status TEXT DEFAULT 'Scheduled',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (clinic_id) REFERENCES clinics (id),
+        FOREIGN KEY (patient_id) REFERENCES patients (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS patient_analytics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_id INTEGER,
+        patient_id INTEGER,
+        visit_date TEXT,
+        symptoms TEXT,
+        diagnosis TEXT,
+        treatment_given TEXT,
+        treatment_cost REAL,
+        recovery_days INTEGER,
+        satisfaction_rating INTEGER,
+        doctor_assigned TEXT,
+        consultation_time INTEGER,
+        payment_mode TEXT,
+        insurance_claim REAL,
+        follow_up_required TEXT,
+        patient_feedback TEXT,
+        treatment_success_rate REAL DEFAULT 100.0,
+        pain_level_before INTEGER,
+        pain_level_after INTEGER,
+        medication_prescribed TEXT,
+        side_effects TEXT,
+        treatment_complexity TEXT DEFAULT 'Standard',
+        referral_required BOOLEAN DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (clinic_id) REFERENCES clinics (id),
+        FOREIGN KEY (patient_id) REFERENCES patients (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS revenue_analytics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_id INTEGER,
+        transaction_date TEXT,
+        patient_id INTEGER,
+        service_type TEXT,
+        base_amount REAL,
+        discount_amount REAL DEFAULT 0,
+        tax_amount REAL DEFAULT 0,
+        final_amount REAL,
+        payment_method TEXT,
+        payment_status TEXT DEFAULT 'Completed',
+        insurance_coverage REAL DEFAULT 0,
+        outstanding_amount REAL DEFAULT 0,
+        transaction_reference TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (clinic_id) REFERENCES clinics (id),
+        FOREIGN KEY (patient_id) REFERENCES patients (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS doctor_performance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_id INTEGER,
+        doctor_name TEXT,
+        specialization TEXT,
+        patients_treated INTEGER DEFAULT 0,
+        average_treatment_time REAL DEFAULT 30.0,
+        success_rate REAL DEFAULT 100.0,
+        patient_satisfaction REAL DEFAULT 5.0,
+        revenue_generated REAL DEFAULT 0,
+        appointments_completed INTEGER DEFAULT 0,
+        no_shows INTEGER DEFAULT 0,
+        cancellations INTEGER DEFAULT 0,
+        efficiency_score REAL DEFAULT 100.0,
+        month_year TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (clinic_id) REFERENCES clinics (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS patient_feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_id INTEGER,
+        patient_id INTEGER,
+        feedback_type TEXT,
+        rating INTEGER,
+        review_text TEXT,
+        sentiment_score REAL,
+        areas_for_improvement TEXT,
+        would_recommend BOOLEAN DEFAULT 1,
+        feedback_date TEXT,
+        response_from_clinic TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (clinic_id) REFERENCES clinics (id),
+        FOREIGN KEY (patient_id) REFERENCES patients (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS smart_alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_id INTEGER,
+        alert_type TEXT,
+        alert_message TEXT,
+        severity TEXT DEFAULT 'Medium',
+        is_read BOOLEAN DEFAULT 0,
+        action_required BOOLEAN DEFAULT 0,
+        related_patient_id INTEGER,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (clinic_id) REFERENCES clinics (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS custom_reports (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clinic_id INTEGER,
+        report_name TEXT,
+        report_type TEXT,
+        filters JSON,
+        columns JSON,
+        created_by TEXT,
+        is_scheduled BOOLEAN DEFAULT 0,
+        schedule_frequency TEXT,
+        last_generated TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (clinic_id) REFERENCES clinics (id)
+    )'''
+]
+
+
+# Version 5 indexes as first shipped; later indexes get their own migration
+CLINIC_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_clinics_email ON clinics (email)",
+    "CREATE INDEX IF NOT EXISTS idx_clinics_google_id ON clinics (google_id)",
+    "CREATE INDEX IF NOT EXISTS idx_clinics_reset_token ON clinics (reset_token)",
+    "CREATE INDEX IF NOT EXISTS idx_patients_clinic_created ON patients (clinic_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_patients_clinic_code ON patients (clinic_id, patient_code)",
+    "CREATE INDEX IF NOT EXISTS idx_patients_clinic_treatment ON patients (clinic_id, treatment)",
+    "CREATE INDEX IF NOT EXISTS idx_patient_analytics_clinic_patient ON patient_analytics (clinic_id, patient_id)",
+    "CREATE INDEX IF NOT EXISTS idx_patient_analytics_clinic_visit ON patient_analytics (clinic_id, visit_date)",
+    "CREATE INDEX IF NOT EXISTS idx_patient_analytics_patient ON patient_analytics (patient_id)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_clinic_date ON appointments (clinic_id, appointment_date)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient_id)",
+    "CREATE INDEX IF NOT EXISTS idx_revenue_analytics_clinic_date ON revenue_analytics (clinic_id, transaction_date)",
+    "CREATE INDEX IF NOT EXISTS idx_patient_feedback_clinic_patient ON patient_feedback (clinic_id, patient_id)",
+    "CREATE INDEX IF NOT EXISTS idx_smart_alerts_clinic_unread ON smart_alerts (clinic_id, is_read, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_smart_alerts_clinic_created ON smart_alerts (clinic_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_doctor_performance_clinic ON doctor_performance (clinic_id)",
+    "CREATE INDEX IF NOT EXISTS idx_custom_reports_clinic ON custom_reports (clinic_id)",
+]
+
+# Version 8 rollup tables and triggers as first shipped; rollups.py may grow, this must not
+ROLLUP_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS clinic_daily_stats (
+        clinic_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        new_patients INTEGER NOT NULL DEFAULT 0,
+        male_patients INTEGER NOT NULL DEFAULT 0,
+        female_patients INTEGER NOT NULL DEFAULT 0,
+        other_patients INTEGER NOT NULL DEFAULT 0,
+        age_total INTEGER NOT NULL DEFAULT 0,
+        age_count INTEGER NOT NULL DEFAULT 0,
+        visits INTEGER NOT NULL DEFAULT 0,
+        visit_revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (clinic_id, day)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS clinic_treatment_counts (
+        clinic_id INTEGER NOT NULL,
+        treatment TEXT NOT NULL,
+        patients INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (clinic_id, treatment)
+    ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS clinic_monthly_revenue (
+        clinic_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        transactions INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        cash_revenue REAL NOT NULL DEFAULT 0,
+        card_revenue REAL NOT NULL DEFAULT 0,
+        upi_revenue REAL NOT NULL DEFAULT 0,
+        insurance_revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (clinic_id, month)
+    ) WITHOUT ROWID''',
+]
+# Source table -> (columns whose update moves a row between buckets, one signed delta; {ref} is new/old)
+ROLLUP_DELTAS = {
+    "patients": ("clinic_id, created_at, sex, age, treatment", '''
+        INSERT INTO clinic_daily_stats (clinic_id, day, new_patients, male_patients, female_patients,
+            other_patients, age_total, age_count)
+        SELECT {ref}.clinic_id, COALESCE(date({ref}.created_at), ''), {sign},
+            {sign} * COALESCE({ref}.sex = 'Male', 0), {sign} * COALESCE({ref}.sex = 'Female', 0),
+            {sign} * COALESCE({ref}.sex = 'Other', 0),
+            {sign} * (CASE WHEN {ref}.age IS NOT NULL AND {ref}.age != '' THEN CAST({ref}.age AS INTEGER) ELSE 0 END),
+            {sign} * ({ref}.age IS NOT NULL AND {ref}.age != '')
+        WHERE {ref}.clinic_id IS NOT NULL
+        ON CONFLICT (clinic_id, day) DO UPDATE SET
+            new_patients = new_patients + excluded.new_patients, male_patients = male_patients + excluded.male_patients,
+            female_patients = female_patients + excluded.female_patients,
+            other_patients = other_patients + excluded.other_patients,
+            age_total = age_total + excluded.age_total, age_count = age_count + excluded.age_count;
+        INSERT INTO clinic_treatment_counts (clinic_id, treatment, patients)
+        SELECT {ref}.clinic_id, {ref}.treatment, {sign}
+        WHERE {ref}.clinic_id IS NOT NULL AND {ref}.treatment IS NOT NULL AND {ref}.treatment != ''
+        ON CONFLICT (clinic_id, treatment) DO UPDATE SET patients = patients + excluded.patients;'''),
+    "patient_analytics": ("clinic_id, visit_date, treatment_cost", '''
+        INSERT INTO clinic_daily_stats (clinic_id, day, visits, visit_revenue)
+        SELECT {ref}.clinic_id, COALESCE(date({ref}.visit_date), ''), {sign}, {sign} * COALESCE({ref}.treatment_cost, 0)
+        WHERE {ref}.clinic_id IS NOT NULL
+        ON CONFLICT (clinic_id, day) DO UPDATE SET
+            visits = visits + excluded.visits, visit_revenue = visit_revenue + excluded.visit_revenue;'''),
+    "revenue_analytics": ("clinic_id, transaction_date, final_amount, payment_method", '''
+        INSERT INTO clinic_monthly_revenue (clinic_id, month, transactions, revenue,
+            cash_revenue, card_revenue, upi_revenue, insurance_revenue)
+        SELECT {ref}.clinic_id, COALESCE(substr({ref}.transaction_date, 1, 7), ''), {sign},
+            {sign} * COALESCE({ref}.final_amount, 0),
+            {sign} * COALESCE({ref}.final_amount, 0) * COALESCE({ref}.payment_method = 'Cash', 0),
+            {sign} * COALESCE({ref}.final_amount, 0) * COALESCE({ref}.payment_method = 'Card', 0),
+            {sign} * COALESCE({ref}.final_amount, 0) * COALESCE({ref}.payment_method = 'UPI', 0),
+            {sign} * COALESCE({ref}.final_amount, 0) * COALESCE({ref}.payment_method = 'Insurance', 0)
+        WHERE {ref}.clinic_id IS NOT NULL
+        ON CONFLICT (clinic_id, month) DO UPDATE SET
+            transactions = transactions + excluded.transactions, revenue = revenue + excluded.revenue,
+            cash_revenue = cash_revenue + excluded.cash_revenue, card_revenue = card_revenue + excluded.card_revenue,
+            upi_revenue = upi_revenue + excluded.upi_revenue,
+            insurance_revenue = insurance_revenue + excluded.insurance_revenue;'''),
+}
+# One clinic's buckets recomputed from its source rows
+ROLLUP_BACKFILL = [
+    "DELETE FROM clinic_daily_stats WHERE clinic_id = ?",
+    "DELETE FROM clinic_treatment_counts WHERE clinic_id = ?",
+    "DELETE FROM clinic_monthly_revenue WHERE clinic_id = ?",
+    '''INSERT INTO clinic_daily_stats (clinic_id, day, new_patients, male_patients,
+            female_patients, other_patients, age_total, age_count)
+        SELECT clinic_id, COALESCE(date(created_at), ''), COUNT(*),
+            COALESCE(SUM(sex = 'Male'), 0), COALESCE(SUM(sex = 'Female'), 0), COALESCE(SUM(sex = 'Other'), 0),
+            COALESCE(SUM(CASE WHEN age IS NOT NULL AND age != '' THEN CAST(age AS INTEGER) ELSE 0 END), 0),
+            COALESCE(SUM(age IS NOT NULL AND age != ''), 0)
+        FROM patients WHERE clinic_id = ?
+        GROUP BY 1, 2''',
+    '''INSERT INTO clinic_treatment_counts (clinic_id, treatment, patients)
+        SELECT clinic_id, treatment, COUNT(*) FROM patients
+        WHERE clinic_id = ? AND treatment IS NOT NULL AND treatment != ''
+        GROUP BY 1, 2''',
+    '''INSERT INTO clinic_daily_stats (clinic_id, day, visits, visit_revenue)
+        SELECT clinic_id, COALESCE(date(visit_date), ''), COUNT(*), COALESCE(SUM(treatment_cost), 0)
+        FROM patient_analytics WHERE clinic_id = ?
+        GROUP BY 1, 2
+        ON CONFLICT (clinic_id, day) DO UPDATE SET
+            visits = excluded.visits, visit_revenue = excluded.visit_revenue''',
+    '''INSERT INTO clinic_monthly_revenue (clinic_id, month, transactions, revenue,
+            cash_revenue, card_revenue, upi_revenue, insurance_revenue)
+        SELECT clinic_id, COALESCE(substr(transaction_date, 1, 7), ''), COUNT(*),
+            COALESCE(SUM(final_amount), 0),
+            COALESCE(SUM(CASE WHEN payment_method = 'Cash' THEN final_amount END), 0),
+            COALESCE(SUM(CASE WHEN payment_method = 'Card' THEN final_amount END), 0),
+            COALESCE(SUM(CASE WHEN payment_method = 'UPI' THEN final_amount END), 0),
+            COALESCE(SUM(CASE WHEN payment_method = 'Insurance' THEN final_amount END), 0)
+        FROM revenue_analytics WHERE clinic_id = ?
+        GROUP BY 1, 2''',
+]
+
+# Every clinic the sources mention, with or without a clinics row, as rollups.rebuild counts them
+ROLLUP_CLINICS = """SELECT id FROM clinics
+    UNION SELECT clinic_id FROM patients WHERE clinic_id IS NOT NULL
+    UNION SELECT clinic_id FROM patient_analytics WHERE clinic_id IS NOT NULL
+    UNION SELECT clinic_id FROM revenue_analytics WHERE clinic_id IS NOT NULL"""
+
+# Version 6 sequences table and seed as first shipped (sequences.bootstrap)
+SEQUENCES_TABLE = '''CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT NOT NULL,
+    scope INTEGER NOT NULL DEFAULT 0,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, scope)
+)'''
+SEQUENCE_SEED = '''INSERT INTO sequences (name, scope, value) VALUES (?, ?, ?)
+    ON CONFLICT (name, scope) DO NOTHING'''
+
+# Version 9 report run history as first shipped (report_scheduler.ensure_schema)
+CUSTOM_REPORT_RUNS = [
+    '''CREATE TABLE IF NOT EXISTS custom_report_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report_id INTEGER NOT NULL,
+    clinic_id INTEGER,
+    generated_at TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    scan_ms REAL,
+    batch_reports INTEGER NOT NULL DEFAULT 1,
+    output_path TEXT,
+    error TEXT,
+    FOREIGN KEY (report_id) REFERENCES custom_reports (id)
+)''',
+    "CREATE INDEX IF NOT EXISTS idx_custom_report_runs_report ON custom_report_runs (report_id, generated_at)",
+]
+
+# Version 10 alert engine state as first shipped (alert_engine.ensure_schema); every source table it
+# reads exists by then, so its indexes are created unconditionally
+ALERT_ENGINE_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS alert_watermarks (
+        source TEXT PRIMARY KEY,
+        position TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS alert_state (
+        clinic_id INTEGER NOT NULL,
+        rule TEXT NOT NULL,
+        state TEXT NOT NULL,
+        PRIMARY KEY (clinic_id, rule)
+    ) WITHOUT ROWID''',
+]
+ALERT_ENGINE_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_smart_alerts_dedupe ON smart_alerts (clinic_id, dedupe_key)",
+    "CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments (appointment_date)",
+]
+
+
+def create_base_tables(conn):
+    for statement in BASE_TABLES:
+        conn.execute(statement)
+
+
+def add_clinic_contact_columns(conn):
+    # Clinics created by the first release only had code/name/location/login columns
+    add_missing_columns(conn, "clinics", [
+        ("email", "TEXT"),
+        ("phone", "TEXT"),
+        ("google_id", "TEXT"),
+        ("reset_token", "TEXT"),
+        ("reset_expires", "DATETIME"),
+        # ALTER TABLE cannot add a CURRENT_TIMESTAMP default; new rows set it on insert
+        ("created_at", "DATETIME"),
+    ])
+
+
+def add_patient_profile_columns(conn):
+    # Fields collected by add_patient and read by advanced_analytics
+    add_missing_columns(conn, "patients", [
+        ("insurance_provider", "TEXT"),
+        ("insurance_number", "TEXT"),
+        ("preferred_doctor", "TEXT"),
+        ("referred_by", "TEXT"),
+        ("occupation", "TEXT"),
+        ("total_visits", "INTEGER DEFAULT 0"),
+        ("total_spent", "REAL DEFAULT 0"),
+    ])
+    add_missing_columns(conn, "appointments", [
+        ("no_show", "INTEGER DEFAULT 0"),
+        ("actual_duration", "INTEGER"),
+    ])
+
+
+def backfill_patient_totals(conn):
+    """Fill total_visits/total_spent from the visit history, one rowid range per transaction"""
+    update_in_batches(conn, "patients", """
+        UPDATE patients SET
+            total_visits = MAX(1, (SELECT COUNT(*) FROM patient_analytics pa WHERE pa.patient_id = patients.id)),
+            total_spent = COALESCE((SELECT SUM(treatment_cost) FROM patient_analytics pa WHERE pa.patient_id = patients.id), 0)
+        WHERE rowid BETWEEN ? AND ? AND COALESCE(total_visits, 0) = 0
+    """)
+
+
+def backfill_patient_created_at(conn):
+    """Keyset pagination orders by (created_at, id); a NULL key would drop rows from every page"""
+    update_in_batches(conn, "patients", """
+        UPDATE patients SET created_at = CURRENT_TIMESTAMP
+        WHERE rowid BETWEEN ? AND ? AND created_at IS NULL
+    """)
+
+
+def create_indexes(conn):
+    for statement in CLINIC_INDEXES:
+        conn.execute(statement)
+
+
+def create_analytics_rollups(conn):
+    """Rollup tables and triggers in one transaction, then each clinic's buckets backfilled in its own
+
+    The triggers count every write from the first commit on, and a clinic's backfill recounts the rows
+    written before it, so dashboards stay correct while the other clinics are still being filled
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    for statement in ROLLUP_TABLES:
+        conn.execute(statement)
+    for source, (columns, delta) in ROLLUP_DELTAS.items():
+        added, removed = delta.format(ref="new", sign=1), delta.format(ref="old", sign=-1)
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS rollup_{source}_insert AFTER INSERT ON {source} BEGIN {added} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS rollup_{source}_delete AFTER DELETE ON {source} BEGIN {removed} END")
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS rollup_{source}_update AFTER UPDATE OF {columns} ON {source} "
+                     f"BEGIN {removed} {added} END")
+    conn.commit()
+    for (clinic_id,) in conn.execute(ROLLUP_CLINICS).fetchall():
+        conn.execute("BEGIN IMMEDIATE")
+        for statement in ROLLUP_BACKFILL:
+            conn.execute(statement, (clinic_id,))
+        conn.commit()
+
+
+def _code_number(code, separator):
+    # Numeric suffix after the last separator, e.g. 'CLINIC0001-P0042' -> 42
+    if not code or separator not in code:
+        return None
+    suffix = code.rsplit(separator, 1)[1]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def seed_code_sequences(conn):
+    """Counters start after the highest existing code; a counter already in use is left alone"""
+    conn.execute(SEQUENCES_TABLE)
+    if conn.execute("SELECT 1 FROM sequences WHERE name = 'clinic' LIMIT 1").fetchone() is None:
+        numbers = [_code_number(code, "CLINIC") for (code,) in conn.execute("SELECT clinic_code FROM clinics")]
+        highest = max([number for number in numbers if number is not None], default=0)
+        if highest:
+            conn.execute(SEQUENCE_SEED, ("clinic", 0, highest))
+    if conn.execute("SELECT 1 FROM sequences WHERE name = 'patient' LIMIT 1").fetchone() is None:
+        highest = {}
+        for clinic_id, patient_code in conn.execute("SELECT clinic_id, patient_code FROM patients"):
+            number = _code_number(patient_code, "-P")
+            if clinic_id is not None and number is not None and number > highest.get(clinic_id, 0):
+                highest[clinic_id] = number
+        conn.executemany(SEQUENCE_SEED, [("patient", clinic_id, value) for clinic_id, value in highest.items()])
+
+
+def create_custom_report_runs(conn):
+    for statement in CUSTOM_REPORT_RUNS:
+        conn.execute(statement)
+
+
+def create_alert_engine_state(conn):
+    for statement in ALERT_ENGINE_TABLES:
+        conn.execute(statement)
+    add_missing_columns(conn, "smart_alerts", [("dedupe_key", "TEXT")])
+    for statement in ALERT_ENGINE_INDEXES:
+        conn.execute(statement)
+
+
+def create_suggest_delta_index(conn):
+    # Patient suggestions pull each clinic's newest rows by id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_clinic_id ON patients (clinic_id, id)")
+
+
+def create_page_cache_generations(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS page_cache_generations (
+        clinic_id INTEGER PRIMARY KEY,
+        generation INTEGER NOT NULL DEFAULT 0
+    )''')
+
+
+# Append new migrations with the next version number; never renumber or edit applied ones.
+# Write their DDL out here rather than calling a helper module, whose schema moves on after they ship
+MIGRATIONS = [
+    Migration(1, "base tables", create_base_tables),
+    Migration(2, "clinic contact and oauth columns", add_clinic_contact_columns),
+    Migration(3, "patient profile and appointment tracking columns", add_patient_profile_columns),
+    Migration(4, "backfill patient visit totals", backfill_patient_totals, batched=True),
+    Migration(5, "clinic_id composite indexes", create_indexes),
+    Migration(6, "clinic and patient code sequences", seed_code_sequences),
+    Migration(7, "backfill missing patient created_at", backfill_patient_created_at, batched=True),
+    Migration(8, "per-clinic analytics rollup tables", create_analytics_rollups, batched=True),
+    Migration(9, "scheduled custom report run history", create_custom_report_runs),
+    Migration(10, "smart alert engine watermarks, state and dedupe key", create_alert_engine_state),
+    Migration(11, "clinic_id, id index for patient suggestion deltas", create_suggest_delta_index),
+    Migration(12, "page cache generations shared by all workers", create_page_cache_generations),
+]
@@ -1,19 +1,32 @@
 # ultra_simple_app.py - Enhanced version with advanced features
-from flask import Flask, request, redirect, session, jsonify, url_for
+from flask import Blueprint, Flask, request, redirect, session, jsonify, url_for, render_template, send_file
+from markupsafe import Markup
 import sqlite3
 import secrets
 import os
 import re
 from datetime import datetime, timedelta
 import urllib.parse
-import requests
 import json
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import Flow
-from google.oauth2 import id_token
-
-app = Flask(__name__)
-app.secret_key = "simple_key"
+import db_pool
+from db_pool import get_db
+import sequences
+import pagination
+import rollups
+import analytics_summary
+import patient_suggest
+import page_cache
+import clinic_cache
+import templating
+import report_export
+import report_queries
+import report_scheduler
+import job_queue
+import schema_migrations
+import ultra_migrations
+import sql_metrics
+import metrics
+from factory import register_features
 
 # Google OAuth Configuration
 # For demo purposes - replace with your real Google Cloud credentials
@@ -28,6 +41,35 @@ GOOGLE_REDIRECT_URI = "http://127.0.0.1:5000/auth/google/callback"
 # Database setup
 DATABASE = "simple_clinic.db"
 
+# Feature blueprints; create_app() registers the ones a deployment serves
+auth_bp = Blueprint("auth", __name__)
+oauth_bp = Blueprint("oauth", __name__)
+patients_bp = Blueprint("patients", __name__)
+analytics_bp = Blueprint("analytics", __name__)
+reports_bp = Blueprint("reports", __name__)
+FEATURES = {"auth": auth_bp, "oauth": oauth_bp, "patients": patients_bp, "analytics": analytics_bp, "reports": reports_bp}
+
+def create_app(features=None):
+    """The clinic app over simple_clinic.db with the named FEATURES, all of them by default"""
+    app = Flask(__name__)
+    app.secret_key = "simple_key"
+    db_pool.init_app(app, DATABASE)
+    sql_metrics.init_app(app)
+    patient_suggest.init_app(app)
+    page_cache.init_app(app)
+    clinic_cache.init_app(app)
+    templating.init_app(app)
+    job_queue.init_app(app)
+    metrics.init_app(app, queue_stats=job_queue.stats)
+    return register_features(app, FEATURES, features)
+
+def __getattr__(name):
+    # `gunicorn ultra_simple_app:app` and other module.app users get every feature, built on first access
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Utility function for better navigation
 def get_back_navigation(clinic_id, current_page="home", include_analytics=True):
     """Generate contextual navigation based on current page and clinic context"""
@@ -110,240 +152,16 @@ def get_navigation_script():
     '''
 
 def init_db():
-    """Initialize database with proper schema and migrations"""
+    """Bring the database schema up to the latest migration version"""
     conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    # Create clinics table with additional fields
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS clinics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_code TEXT UNIQUE,
-            name TEXT NOT NULL,
-            location TEXT,
-            incharge TEXT,
-            login_id TEXT UNIQUE,
-            password TEXT,
-            email TEXT,
-            phone TEXT,
-            google_id TEXT,
-            reset_token TEXT,
-            reset_expires DATETIME,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Perform database migrations for existing databases
-    try:
-        # Check if email column exists, if not add it
-        cursor.execute("PRAGMA table_info(clinics)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'email' not in columns:
-            cursor.execute("ALTER TABLE clinics ADD COLUMN email TEXT")
-            print("✅ Added 'email' column to clinics table")
-        
-        if 'phone' not in columns:
-            cursor.execute("ALTER TABLE clinics ADD COLUMN phone TEXT")
-            print("✅ Added 'phone' column to clinics table")
-            
-        if 'google_id' not in columns:
-            cursor.execute("ALTER TABLE clinics ADD COLUMN google_id TEXT")
-            print("✅ Added 'google_id' column to clinics table")
-            
-        if 'reset_token' not in columns:
-            cursor.execute("ALTER TABLE clinics ADD COLUMN reset_token TEXT")
-            print("✅ Added 'reset_token' column to clinics table")
-            
-        if 'reset_expires' not in columns:
-            cursor.execute("ALTER TABLE clinics ADD COLUMN reset_expires DATETIME")
-            print("✅ Added 'reset_expires' column to clinics table")
-            
-        if 'created_at' not in columns:
-            cursor.execute("ALTER TABLE clinics ADD COLUMN created_at DATETIME DEFAULT CURRENT_TIMESTAMP")
-            print("✅ Added 'created_at' column to clinics table")
-            
-    except Exception as e:
-        print(f"Migration error: {e}")
-    
-    # Create patients table with enhanced fields
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS patients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_id INTEGER,
-            patient_code TEXT UNIQUE,
-            name TEXT NOT NULL,
-            sex TEXT,
-            age INTEGER,
-            dob DATE,
-            treatment TEXT,
-            mobile TEXT,
-            email TEXT,
-            address TEXT,
-            emergency_contact TEXT,
-            medical_history TEXT,
-            allergies TEXT,
-            last_visit DATE,
-            next_appointment DATETIME,
-            status TEXT DEFAULT 'Active',
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (clinic_id) REFERENCES clinics (id)
-        )
-    ''')
-    
-    # Create appointments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS appointments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_id INTEGER,
-            patient_id INTEGER,
-            appointment_date DATETIME,
-            treatment_type TEXT,
-            notes TEXT,
-            status TEXT DEFAULT 'Scheduled',
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (clinic_id) REFERENCES clinics (id),
-            FOREIGN KEY (patient_id) REFERENCES patients (id)
-        )
-    ''')
-    
-    # Enhanced patient analytics table for comprehensive analysis
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS patient_analytics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_id INTEGER,
-            patient_id INTEGER,
-            visit_date TEXT,
-            symptoms TEXT,
-            diagnosis TEXT,
-            treatment_given TEXT,
-            treatment_cost REAL,
-            recovery_days INTEGER,
-            satisfaction_rating INTEGER,
-            doctor_assigned TEXT,
-            consultation_time INTEGER,
-            payment_mode TEXT,
-            insurance_claim REAL,
-            follow_up_required TEXT,
-            patient_feedback TEXT,
-            treatment_success_rate REAL DEFAULT 100.0,
-            pain_level_before INTEGER,
-            pain_level_after INTEGER,
-            medication_prescribed TEXT,
-            side_effects TEXT,
-            treatment_complexity TEXT DEFAULT 'Standard',
-            referral_required BOOLEAN DEFAULT 0,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (clinic_id) REFERENCES clinics (id),
-            FOREIGN KEY (patient_id) REFERENCES patients (id)
-        )
-    ''')
-
-    # Create revenue analytics table for financial insights
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS revenue_analytics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_id INTEGER,
-            transaction_date TEXT,
-            patient_id INTEGER,
-            service_type TEXT,
-            base_amount REAL,
-            discount_amount REAL DEFAULT 0,
-            tax_amount REAL DEFAULT 0,
-            final_amount REAL,
-            payment_method TEXT,
-            payment_status TEXT DEFAULT 'Completed',
-            insurance_coverage REAL DEFAULT 0,
-            outstanding_amount REAL DEFAULT 0,
-            transaction_reference TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (clinic_id) REFERENCES clinics (id),
-            FOREIGN KEY (patient_id) REFERENCES patients (id)
-        )
-    ''')
-
-    # Create doctor performance tracking table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS doctor_performance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_id INTEGER,
-            doctor_name TEXT,
-            specialization TEXT,
-            patients_treated INTEGER DEFAULT 0,
-            average_treatment_time REAL DEFAULT 30.0,
-            success_rate REAL DEFAULT 100.0,
-            patient_satisfaction REAL DEFAULT 5.0,
-            revenue_generated REAL DEFAULT 0,
-            appointments_completed INTEGER DEFAULT 0,
-            no_shows INTEGER DEFAULT 0,
-            cancellations INTEGER DEFAULT 0,
-            efficiency_score REAL DEFAULT 100.0,
-            month_year TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (clinic_id) REFERENCES clinics (id)
-        )
-    ''')
-
-    # Create patient feedback and sentiment analysis table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS patient_feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_id INTEGER,
-            patient_id INTEGER,
-            feedback_type TEXT,
-            rating INTEGER,
-            review_text TEXT,
-            sentiment_score REAL,
-            areas_for_improvement TEXT,
-            would_recommend BOOLEAN DEFAULT 1,
-            feedback_date TEXT,
-            response_from_clinic TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (clinic_id) REFERENCES clinics (id),
-            FOREIGN KEY (patient_id) REFERENCES patients (id)
-        )
-    ''')
-
-    # Create smart alerts and notifications table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS smart_alerts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_id INTEGER,
-            alert_type TEXT,
-            alert_message TEXT,
-            severity TEXT DEFAULT 'Medium',
-            is_read BOOLEAN DEFAULT 0,
-            action_required BOOLEAN DEFAULT 0,
-            related_patient_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (clinic_id) REFERENCES clinics (id)
-        )
-    ''')
-
-    # Create custom reports configuration table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS custom_reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            clinic_id INTEGER,
-            report_name TEXT,
-            report_type TEXT,
-            filters JSON,
-            columns JSON,
-            created_by TEXT,
-            is_scheduled BOOLEAN DEFAULT 0,
-            schedule_frequency TEXT,
-            last_generated TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (clinic_id) REFERENCES clinics (id)
-        )
-    ''')
-    
-    conn.commit()
+    # Warm starts are a single schema_version lookup; only pending migrations run
+    applied = schema_migrations.migrate(conn, ultra_migrations.MIGRATIONS)
     conn.close()
+    for migration in applied:
+        print(f"✅ Applied migration {migration.version}: {migration.description}")
     print("✅ Enhanced database with analytics initialized!")
 
-@app.route("/")
+@auth_bp.route("/")
 def home():
     return '''
     <html>
@@ -417,7 +235,7 @@ def home():
     </html>
     '''
 
-@app.route("/register", methods=["GET", "POST"])
+@auth_bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
         try:
@@ -435,19 +253,16 @@ def register():
                 return "<h3>❌ Error: Valid email is required!</h3><a href='/register'>← Try Again</a>"
             
             # Connect to database
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             
             # Check if email already exists
             cursor.execute("SELECT id FROM clinics WHERE email = ?", (email,))
             if cursor.fetchone():
-                conn.close()
                 return "<h3>❌ Error: Email already registered!</h3><a href='/register'>← Try Again</a>"
             
-            # Get next clinic number
-            cursor.execute("SELECT COUNT(*) FROM clinics")
-            count = cursor.fetchone()[0]
-            next_num = count + 1
+            # Allocate the next clinic number atomically inside this insert's transaction
+            next_num = sequences.next_clinic_number(cursor)
             
             # Generate codes
             clinic_code = f"CLINIC{next_num:04d}"
@@ -461,7 +276,7 @@ def register():
             """, (clinic_code, name, location, incharge, login_id, password, email, phone))
             
             conn.commit()
-            conn.close()
+            clinic_cache.invalidate(cursor.lastrowid)
             
             return f'''
             <html>
@@ -594,7 +409,7 @@ def register():
     </html>
     '''
 
-@app.route("/login", methods=["GET", "POST"])
+@auth_bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         login_id = request.form.get("login_id", "").strip()
@@ -604,20 +419,18 @@ def login():
             return "<h3>❌ Error: Please enter both login ID and password!</h3><a href='/login'>← Try Again</a>"
         
         try:
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute("SELECT id, clinic_code, name FROM clinics WHERE login_id = ? AND password = ?", (login_id, password))
             clinic = cursor.fetchone()
-            conn.close()
             
             if clinic:
                 clinic_id, clinic_code, clinic_name = clinic
                 # Get patient count for this clinic
-                conn = sqlite3.connect(DATABASE)
+                conn = get_db()
                 cursor = conn.cursor()
                 cursor.execute("SELECT COUNT(*) FROM patients WHERE clinic_id = ?", (clinic_id,))
                 patient_count = cursor.fetchone()[0]
-                conn.close()
                 
                 return f'''
                 <html>
@@ -707,7 +520,7 @@ def login():
     '''
 
 # Forgot Password functionality
-@app.route("/forgot-password", methods=["GET", "POST"])
+@auth_bp.route("/forgot-password", methods=["GET", "POST"])
 def forgot_password():
     if request.method == "POST":
         email = request.form.get("email", "").strip()
@@ -716,7 +529,7 @@ def forgot_password():
             return "<h3>❌ Error: Email is required!</h3><a href='/forgot-password'>← Try Again</a>"
         
         try:
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             
             # Check if email exists
@@ -738,7 +551,7 @@ def forgot_password():
                 """, (reset_token, expires, clinic_id))
                 
                 conn.commit()
-                conn.close()
+                clinic_cache.invalidate(clinic_id)
                 
                 # In a real app, you would send an email here
                 # For demo purposes, we'll show the reset link
@@ -775,7 +588,6 @@ def forgot_password():
                 </html>
                 '''
             else:
-                conn.close()
                 return '''
                 <html>
                 <body style="font-family: Arial; margin: 40px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh;">
@@ -835,7 +647,7 @@ def forgot_password():
     </html>
     '''
 
-@app.route("/reset-password", methods=["GET", "POST"])
+@auth_bp.route("/reset-password", methods=["GET", "POST"])
 def reset_password():
     token = request.args.get("token")
     
@@ -853,7 +665,7 @@ def reset_password():
             return "<h3>❌ Error: Passwords don't match!</h3><a href='javascript:history.back()'>← Try Again</a>"
         
         try:
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             
             # Check token validity
@@ -874,7 +686,7 @@ def reset_password():
                 """, (new_password, clinic_id))
                 
                 conn.commit()
-                conn.close()
+                clinic_cache.invalidate(clinic_id)
                 
                 return f'''
                 <html>
@@ -899,7 +711,6 @@ def reset_password():
                 </html>
                 '''
             else:
-                conn.close()
                 return '''
                 <html>
                 <body style="font-family: Arial; margin: 40px;">
@@ -915,7 +726,7 @@ def reset_password():
             return f"<h3>❌ Error: {str(e)}</h3><a href='/forgot-password'>← Try Again</a>"
     
     # GET request - show reset password form
-    return f'''
+    return '''
     <html>
     <body style="font-family: Arial; margin: 40px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh;">
         <div style="background: white; padding: 40px; border-radius: 15px; box-shadow: 0 10px 30px rgba(0,0,0,0.2); max-width: 500px; margin: 0 auto;">
@@ -944,7 +755,7 @@ def reset_password():
     </html>
     '''
 
-@app.route("/add_patient", methods=["GET", "POST"])
+@patients_bp.route("/add_patient", methods=["GET", "POST"])
 def add_patient():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
@@ -982,21 +793,18 @@ def add_patient():
                 return "<h3>❌ Error: Patient name is required!</h3><a href='javascript:history.back()'>← Try Again</a>"
             
             # Connect to database
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             
             # Get clinic info and patient count
-            cursor.execute("SELECT clinic_code, name FROM clinics WHERE id = ?", (clinic_id,))
-            clinic_info = cursor.fetchone()
+            clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
             if not clinic_info:
                 return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
             
-            clinic_code, clinic_name = clinic_info
+            clinic_code, clinic_name = clinic_info.clinic_code, clinic_info.name
             
-            # Get next patient number for this clinic
-            cursor.execute("SELECT COUNT(*) FROM patients WHERE clinic_id = ?", (clinic_id,))
-            patient_count = cursor.fetchone()[0]
-            next_patient_num = patient_count + 1
+            # Allocate the next patient number atomically inside this insert's transaction
+            next_patient_num = sequences.next_patient_number(cursor, clinic_id)
             
             # Generate patient code
             patient_code = f"{clinic_code}-P{next_patient_num:04d}"
@@ -1048,8 +856,9 @@ def add_patient():
                     float(treatment_cost), float(treatment_cost), payment_mode
                 ))
             
+            page_cache.invalidate(cursor, clinic_id)
             conn.commit()
-            conn.close()
+            patient_suggest.refresh_patient(cursor, clinic_id, patient_code)
             
             return f'''
             <html>
@@ -1098,11 +907,9 @@ def add_patient():
     
     # GET request - show comprehensive form
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
-        conn.close()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
@@ -1385,148 +1192,79 @@ def add_patient():
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/'>← Back to Home</a>"
 
-@app.route("/view_patients")
+@patients_bp.route("/view_patients")
 def view_patients():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
+    show_all = request.args.get("all") == "1"
+    per_page = pagination.page_size(request.args.get("per_page"))
+    after = pagination.decode_cursor(request.args.get("after"))
+    columns = "patient_code, name, sex, age, treatment, mobile"
+    
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
         
         clinic_name = clinic_info[0]
+        # The registration rollup holds the total; counting the clinic's rows would rescan them on every page
+        total_patients = rollups.patient_count(cursor, clinic_id)
         
-        # Get all patients for this clinic
-        cursor.execute("""
-            SELECT patient_code, name, sex, age, treatment, mobile 
-            FROM patients 
-            WHERE clinic_id = ? 
-            ORDER BY id DESC
-        """, (clinic_id,))
-        patients = cursor.fetchall()
-        conn.close()
-        
-        # Build patients table
-        patients_html = ""
-        if patients:
-            for patient in patients:
-                patient_code, name, sex, age, treatment, mobile = patient
-                patients_html += f'''
-                <tr style="border-bottom: 1px solid #ddd;">
-                    <td style="padding: 12px; border-right: 1px solid #eee;"><code style="background: #f8f9fa; padding: 4px 8px; border-radius: 4px;">{patient_code}</code></td>
-                    <td style="padding: 12px; border-right: 1px solid #eee; font-weight: bold;">{name}</td>
-                    <td style="padding: 12px; border-right: 1px solid #eee;">{sex or "-"}</td>
-                    <td style="padding: 12px; border-right: 1px solid #eee;">{age or "-"}</td>
-                    <td style="padding: 12px; border-right: 1px solid #eee;">{treatment or "-"}</td>
-                    <td style="padding: 12px;">{mobile or "-"}</td>
-                </tr>
-                '''
-        else:
-            patients_html = '<tr><td colspan="6" style="padding: 20px; text-align: center; color: #666;">No patients registered yet. <a href="/add_patient?clinic_id=' + clinic_id + '">Add the first patient!</a></td></tr>'
+        context = dict(
+            clinic_id=clinic_id, clinic_name=clinic_name, total_patients=total_patients,
+            navigation=Markup(get_back_navigation(clinic_id, "patient_list")),
+            page_sizes=pagination.PAGE_SIZES, per_page=per_page, show_all=show_all,
+        )
         
-        return f'''
-        <html>
-        <body style="font-family: Arial; margin: 40px; background: #f0f8ff;">
-            <div style="background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
-                <h2 style="color: #2c5aa0;">👥 Patients - {clinic_name}</h2>
-                <p style="color: #666; margin-bottom: 30px;">Total Patients: <strong>{len(patients)}</strong></p>
-                
-                <div style="margin: 20px 0;">
-                    {get_back_navigation(clinic_id, "patient_list")}
-                </div>
-                
-                <div style="overflow-x: auto; margin-top: 30px;">
-                    <table style="width: 100%; border-collapse: collapse; background: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                        <thead>
-                            <tr style="background: #f8f9fa; border-bottom: 2px solid #dee2e6;">
-                                <th style="padding: 15px; text-align: left; font-weight: bold; color: #495057;">Patient ID</th>
-                                <th style="padding: 15px; text-align: left; font-weight: bold; color: #495057;">Name</th>
-                                <th style="padding: 15px; text-align: left; font-weight: bold; color: #495057;">Gender</th>
-                                <th style="padding: 15px; text-align: left; font-weight: bold; color: #495057;">Age</th>
-                                <th style="padding: 15px; text-align: left; font-weight: bold; color: #495057;">Treatment</th>
-                                <th style="padding: 15px; text-align: left; font-weight: bold; color: #495057;">Mobile</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {patients_html}
-                        </tbody>
-                    </table>
-                </div>
-                
-                <div style="background: #e8f4fd; padding: 20px; border-radius: 8px; margin-top: 30px;">
-                    <h4 style="margin-top: 0; color: #2c5aa0;">📊 Patient Management Features:</h4>
-                    <ul style="color: #495057;">
-                        <li>✅ Complete patient records with unique IDs</li>
-                        <li>📋 Treatment tracking and medical history</li>
-                        <li>📱 Contact information for appointments</li>
-                        <li>🔍 Easy search and reference system</li>
-                    </ul>
-                </div>
-            </div>
-        </body>
-        </html>
-        '''
+        if show_all:
+            # Stream keyset chunks so memory stays flat however large the clinic is
+            chunks = pagination.iter_chunks(conn.cursor(), columns, clinic_id)
+            row_batches = templating.render_batches("clinic/_patient_rows.html", chunks)
+            return templating.stream("clinic/view_patients.html", row_batches=row_batches, **context)
+        
+        patients, next_key = pagination.fetch_page(cursor, columns, clinic_id, after, per_page)
+        return render_template(
+            "clinic/view_patients.html", show_first_link=after is not None,
+            row_batches=templating.render_batches("clinic/_patient_rows.html", [patients] if patients else []),
+            next_cursor=pagination.encode_cursor(next_key) if next_key else None, **context,
+        )
         
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/'>← Back to Home</a>"
 
-@app.route("/analytics")
+@analytics_bp.route("/analytics")
+@page_cache.cached("analytics")
 def analytics():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
         
         clinic_name = clinic_info[0]
         
+        # Read from the rollup tables: one row per day/treatment bucket, not per patient
         # 1. Patient Demographics & Distribution
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_patients,
-                AVG(CASE WHEN age != '' THEN CAST(age AS INTEGER) END) as avg_age,
-                COUNT(CASE WHEN sex = 'Male' THEN 1 END) as male_count,
-                COUNT(CASE WHEN sex = 'Female' THEN 1 END) as female_count,
-                COUNT(CASE WHEN sex = 'Other' THEN 1 END) as other_count
-            FROM patients WHERE clinic_id = ?
-        """, (clinic_id,))
-        demographics = cursor.fetchone()
+        demographics = rollups.demographics(cursor, clinic_id)
         
         # 2. Treatment Analysis
-        cursor.execute("""
-            SELECT treatment, COUNT(*) as count 
-            FROM patients 
-            WHERE clinic_id = ? AND treatment != '' 
-            GROUP BY treatment 
-            ORDER BY count DESC
-        """, (clinic_id,))
-        treatments = cursor.fetchall()
+        treatments = rollups.treatment_counts(cursor, clinic_id)
         
         # 3. Monthly Registration Trends
-        cursor.execute("""
-            SELECT strftime('%Y-%m', created_at) as month, COUNT(*) as registrations
-            FROM patients 
-            WHERE clinic_id = ? AND created_at IS NOT NULL
-            GROUP BY month
-            ORDER BY month DESC
-            LIMIT 12
-        """, (clinic_id,))
-        monthly_trends = cursor.fetchall()
+        monthly_trends = rollups.monthly_registrations(cursor, clinic_id, 12)
         
         # Generate analytics from available data
         total_patients, avg_age, male_count, female_count, other_count = demographics
@@ -1537,193 +1275,21 @@ def analytics():
         female_percent = round((female_count / total_patients * 100), 1) if total_patients > 0 else 0
         other_percent = round((other_count / total_patients * 100), 1) if total_patients > 0 else 0
         
-        # Create treatment chart data
-        treatment_chart = ""
-        if treatments:
-            for treatment, count in treatments[:10]:  # Top 10 treatments
-                percentage = (count / total_patients * 100) if total_patients > 0 else 0
-                treatment_chart += f"""
-                <div style="margin-bottom: 15px;">
-                    <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
-                        <span style="font-weight: bold;">{treatment if treatment else 'Not Specified'}</span>
-                        <span>{count} patients ({percentage:.1f}%)</span>
-                    </div>
-                    <div style="background: #e9ecef; border-radius: 10px; height: 20px; overflow: hidden;">
-                        <div style="background: linear-gradient(45deg, #007bff, #0056b3); height: 100%; width: {percentage}%; transition: width 0.3s;"></div>
-                    </div>
-                </div>
-                """
-        else:
-            treatment_chart = "<p style='color: #666;'>No treatment data available yet.</p>"
-        
-        # Create monthly trends chart
-        trends_chart = ""
-        if monthly_trends:
-            for month, count in monthly_trends:
-                trends_chart += f"""
-                <div style="display: flex; justify-content: space-between; padding: 10px; border-bottom: 1px solid #eee;">
-                    <span style="font-weight: bold;">{month}</span>
-                    <span style="color: #007bff;">{count} new patients</span>
-                </div>
-                """
-        else:
-            trends_chart = "<p style='color: #666;'>No trend data available yet.</p>"
-        
-        conn.close()
-        
-        return f'''
-        <html>
-        <head>
-            <title>Patient Analytics - {clinic_name}</title>
-            <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-        </head>
-        <body style="font-family: Arial; margin: 0; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); min-height: 100vh; padding: 20px;">
-            <div style="background: white; border-radius: 15px; box-shadow: 0 10px 30px rgba(0,0,0,0.2); max-width: 1200px; margin: 0 auto; overflow: hidden;">
-                
-                <!-- Header -->
-                <div style="background: linear-gradient(45deg, #2c5aa0, #1e3a6f); color: white; padding: 30px; text-align: center;">
-                    <h1 style="margin: 0; font-size: 2.5em;">📊 Patient Analytics Dashboard</h1>
-                    <p style="margin: 10px 0 0 0; font-size: 1.2em; opacity: 0.9;">{clinic_name}</p>
-                </div>
-                
-                <!-- Navigation -->
-                <div style="background: #f8f9fa; padding: 15px; text-align: center; border-bottom: 1px solid #dee2e6;">
-                    {get_back_navigation(clinic_id, "analytics")}
-                </div>
-                
-                <div style="padding: 30px;">
-                    
-                    <!-- 1. Patient Demographics Overview -->
-                    <div style="background: linear-gradient(135deg, #e8f4fd, #cfe2ff); padding: 25px; border-radius: 12px; margin-bottom: 30px;">
-                        <h2 style="color: #2c5aa0; margin-top: 0;">📈 1. Patient Demographics & Distribution</h2>
-                        
-                        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin-bottom: 25px;">
-                            <div style="background: white; padding: 20px; border-radius: 10px; text-align: center; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                                <h3 style="color: #007bff; margin: 0; font-size: 2em;">{total_patients}</h3>
-                                <p style="margin: 5px 0 0 0; color: #666;">Total Patients</p>
-                            </div>
-                            <div style="background: white; padding: 20px; border-radius: 10px; text-align: center; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                                <h3 style="color: #28a745; margin: 0; font-size: 2em;">{avg_age}</h3>
-                                <p style="margin: 5px 0 0 0; color: #666;">Average Age</p>
-                            </div>
-                            <div style="background: white; padding: 20px; border-radius: 10px; text-align: center; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                                <h3 style="color: #6610f2; margin: 0; font-size: 2em;">{male_percent}%</h3>
-                                <p style="margin: 5px 0 0 0; color: #666;">Male Patients</p>
-                            </div>
-                            <div style="background: white; padding: 20px; border-radius: 10px; text-align: center; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                                <h3 style="color: #e83e8c; margin: 0; font-size: 2em;">{female_percent}%</h3>
-                                <p style="margin: 5px 0 0 0; color: #666;">Female Patients</p>
-                            </div>
-                        </div>
-                        
-                        <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                            <h4 style="color: #495057; margin-top: 0;">Gender Distribution Breakdown:</h4>
-                            <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(150px, 1fr)); gap: 15px;">
-                                <div>
-                                    <span style="font-weight: bold;">👨 Male:</span> {male_count} patients ({male_percent}%)
-                                    <div style="background: #e9ecef; border-radius: 10px; height: 15px; margin-top: 5px;">
-                                        <div style="background: #007bff; height: 100%; width: {male_percent}%; border-radius: 10px;"></div>
-                                    </div>
-                                </div>
-                                <div>
-                                    <span style="font-weight: bold;">👩 Female:</span> {female_count} patients ({female_percent}%)
-                                    <div style="background: #e9ecef; border-radius: 10px; height: 15px; margin-top: 5px;">
-                                        <div style="background: #e83e8c; height: 100%; width: {female_percent}%; border-radius: 10px;"></div>
-                                    </div>
-                                </div>
-                                <div>
-                                    <span style="font-weight: bold;">🏳️ Other:</span> {other_count} patients ({other_percent}%)
-                                    <div style="background: #e9ecef; border-radius: 10px; height: 15px; margin-top: 5px;">
-                                        <div style="background: #6c757d; height: 100%; width: {other_percent}%; border-radius: 10px;"></div>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <!-- 2. Treatment Analysis -->
-                    <div style="background: linear-gradient(135deg, #f8f4ff, #e8e8ff); padding: 25px; border-radius: 12px; margin-bottom: 30px;">
-                        <h2 style="color: #6610f2; margin-top: 0;">🦷 2. Treatment & Service Usage Analysis</h2>
-                        
-                        <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                            <h4 style="color: #495057; margin-top: 0;">Most Common Treatments:</h4>
-                            {treatment_chart}
-                        </div>
-                    </div>
-                    
-                    <!-- 3. Registration Trends -->
-                    <div style="background: linear-gradient(135deg, #f0fff4, #d4edda); padding: 25px; border-radius: 12px; margin-bottom: 30px;">
-                        <h2 style="color: #28a745; margin-top: 0;">📅 3. Patient Registration Trends</h2>
-                        
-                        <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                            <h4 style="color: #495057; margin-top: 0;">Monthly Registration History:</h4>
-                            <div style="max-height: 300px; overflow-y: auto;">
-                                {trends_chart}
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <!-- 4. Predictive Analytics & Insights -->
-                    <div style="background: linear-gradient(135deg, #fff5e6, #ffe0b3); padding: 25px; border-radius: 12px; margin-bottom: 30px;">
-                        <h2 style="color: #fd7e14; margin-top: 0;">🔮 4. Predictive Analytics & Insights</h2>
-                        
-                        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px;">
-                            <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                                <h4 style="color: #495057; margin-top: 0;">📊 Growth Prediction</h4>
-                                <p style="color: #666;">Based on current trends, you may see <strong style="color: #28a745;">{max(10, int(total_patients * 0.2))} new patients</strong> next month.</p>
-                            </div>
-                            <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                                <h4 style="color: #495057; margin-top: 0;">🎯 Target Demographics</h4>
-                                <p style="color: #666;">{'Focus on male patients' if male_count < female_count else 'Focus on female patients'} for balanced demographics.</p>
-                            </div>
-                            <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                                <h4 style="color: #495057; margin-top: 0;">💡 Recommendations</h4>
-                                <p style="color: #666;">Consider promoting {'preventive care services' if total_patients > 20 else 'awareness campaigns'} to expand patient base.</p>
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <!-- 5. Advanced Analytics Features -->
-                    <div style="background: linear-gradient(135deg, #f3e5f5, #e1bee7); padding: 25px; border-radius: 12px; margin-bottom: 30px;">
-                        <h2 style="color: #9c27b0; margin-top: 0;">🚀 5. Advanced Analytics Features</h2>
-                        
-                        <div style="background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                            <h4 style="color: #495057; margin-top: 0;">Coming Soon Features:</h4>
-                            <ul style="color: #666; line-height: 1.8;">
-                                <li>📅 <strong>Appointment Analytics:</strong> Track booking patterns, no-shows, and optimal scheduling</li>
-                                <li>💰 <strong>Revenue Analysis:</strong> Financial trends, payment modes, and billing insights</li>
-                                <li>👨‍⚕️ <strong>Doctor Performance:</strong> Treatment success rates, patient satisfaction, and efficiency metrics</li>
-                                <li>🔄 <strong>Patient Retention:</strong> Churn analysis, loyalty tracking, and return visit predictions</li>
-                                <li>🧠 <strong>AI Insights:</strong> Diagnosis patterns, treatment recommendations, and risk predictions</li>
-                                <li>📝 <strong>Feedback Analysis:</strong> Sentiment analysis from patient reviews and satisfaction surveys</li>
-                                <li>📊 <strong>Custom Reports:</strong> Export detailed analytics reports in PDF/Excel format</li>
-                                <li>🔔 <strong>Smart Alerts:</strong> Automated notifications for trends, anomalies, and opportunities</li>
-                            </ul>
-                        </div>
-                    </div>
-                    
-                    <!-- Action Buttons -->
-                    <div style="text-align: center; padding: 20px; background: #f8f9fa; border-radius: 10px;">
-                        <h4 style="color: #495057; margin-top: 0;">📋 Quick Actions</h4>
-                        <div style="display: flex; justify-content: center; gap: 15px; flex-wrap: wrap;">
-                            <a href="/view_patients?clinic_id={clinic_id}" style="background: linear-gradient(45deg, #007bff, #0056b3); color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px; font-weight: bold;">👥 Manage Patients</a>
-                            <a href="/add_patient?clinic_id={clinic_id}" style="background: linear-gradient(45deg, #28a745, #1e7e34); color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px; font-weight: bold;">➕ Add New Patient</a>
-                            <a href="/analytics?clinic_id={clinic_id}" style="background: linear-gradient(45deg, #6610f2, #520dc2); color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px; font-weight: bold;">🔄 Refresh Analytics</a>
-                            <a href="/" style="background: linear-gradient(45deg, #6c757d, #495057); color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px; font-weight: bold;">🏠 Home</a>
-                        </div>
-                    </div>
-                    
-                </div>
-            </div>
-        </body>
-        </html>
-        '''
+        return render_template(
+            "clinic/analytics.html",
+            clinic_id=clinic_id, clinic_name=clinic_name,
+            navigation=Markup(get_back_navigation(clinic_id, "analytics")),
+            total_patients=total_patients, avg_age=avg_age,
+            male_count=male_count, female_count=female_count, other_count=other_count,
+            male_percent=male_percent, female_percent=female_percent, other_percent=other_percent,
+            treatments=treatments, monthly_trends=monthly_trends,
+        )
         
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/'>← Back to Home</a>"
 
 # Google OAuth Routes - Real Implementation
-@app.route("/auth/google")
+@oauth_bp.route("/auth/google")
 def google_auth():
     """Initiate real Google OAuth authentication"""
     
@@ -1733,6 +1299,9 @@ def google_auth():
             # Fall back to demo mode if no real credentials
             return google_auth_demo()
         
+        # Imported here: the Google libraries are most of this module's import time and only OAuth logins use them
+        from google_auth_oauthlib.flow import Flow
+        
         # Create OAuth flow
         flow = Flow.from_client_config(
             {
@@ -1828,7 +1397,7 @@ def google_auth_demo():
     </html>
     '''
 
-@app.route("/auth/google/callback")
+@oauth_bp.route("/auth/google/callback")
 def google_callback():
     """Handle Google OAuth callback - Real Implementation"""
     
@@ -1841,6 +1410,11 @@ def google_callback():
         if request.args.get('state') != session.get('state'):
             return "Error: Invalid state parameter", 400
         
+        import requests
+        from google.auth.transport.requests import Request
+        from google.oauth2 import id_token
+        from google_auth_oauthlib.flow import Flow
+        
         # Create OAuth flow
         flow = Flow.from_client_config(
             {
@@ -1900,7 +1474,7 @@ def process_google_user(google_email, google_name, google_id=None):
     """Process Google user login/registration"""
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Check if clinic already exists with this Google email
@@ -1915,19 +1489,17 @@ def process_google_user(google_email, google_name, google_id=None):
             if google_id:
                 cursor.execute("UPDATE clinics SET google_id = ? WHERE id = ?", (google_id, clinic_id))
                 conn.commit()
+                clinic_cache.invalidate(clinic_id)
             
             # Get patient count
             cursor.execute("SELECT COUNT(*) FROM patients WHERE clinic_id = ?", (clinic_id,))
             patient_count = cursor.fetchone()[0]
-            conn.close()
             
             return generate_google_login_success(google_email, existing_name, clinic_code, clinic_id, patient_count, is_new=False)
         
         else:
             # Register new clinic with Google account
-            cursor.execute("SELECT COUNT(*) FROM clinics")
-            count = cursor.fetchone()[0]
-            next_num = count + 1
+            next_num = sequences.next_clinic_number(cursor)
             
             # Generate codes
             clinic_code = f"CLINIC{next_num:04d}"
@@ -1945,7 +1517,7 @@ def process_google_user(google_email, google_name, google_id=None):
             
             clinic_id = cursor.lastrowid
             conn.commit()
-            conn.close()
+            clinic_cache.invalidate(clinic_id)
             
             return generate_google_login_success(google_email, clinic_name, clinic_code, clinic_id, 0, is_new=True, login_id=login_id, password=password)
             
@@ -2018,13 +1590,12 @@ def generate_google_login_success(google_email, clinic_name, clinic_code, clinic
     </html>
     '''
 
-@app.route("/auth/google/simulate", methods=["POST"])
+@oauth_bp.route("/auth/google/simulate", methods=["POST"])
 def google_auth_simulate():
     """Simulate Google OAuth callback for demo purposes"""
     
     google_email = request.form.get("google_email", "").strip()
     clinic_name = request.form.get("clinic_name", "").strip()
-    location = request.form.get("location", "Online").strip()
     
     if not google_email or not clinic_name:
         return "<h3>❌ Error: Email and clinic name are required!</h3><a href='/auth/google'>← Try Again</a>"
@@ -2037,138 +1608,19 @@ def google_auth_simulate():
     # Use the shared processing function
     return process_google_user(google_email, clinic_name, google_id=None)
 
-@app.route("/advanced_analytics")
+@analytics_bp.route("/advanced_analytics")
+@page_cache.cached("advanced_analytics")
 def advanced_analytics():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
     try:
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        
-        # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
-        if not clinic_info:
-            return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
-        
-        clinic_name = clinic_info[0]
-        
-        # Basic patient stats
-        cursor.execute("SELECT COUNT(*) FROM patients WHERE clinic_id = ?", (clinic_id,))
-        total_patients = cursor.fetchone()[0]
-        
-        # Basic analytics stats
-        cursor.execute("SELECT COUNT(*) FROM patient_analytics WHERE clinic_id = ?", (clinic_id,))
-        total_analytics = cursor.fetchone()[0]
-        
-        # Revenue stats
-        cursor.execute("SELECT SUM(treatment_cost) FROM patient_analytics WHERE clinic_id = ?", (clinic_id,))
-        total_revenue = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
-        return f'''
-        <html>
-        <head>
-            <title>Advanced Analytics - {clinic_name}</title>
-            <style>
-                body {{ font-family: Arial; margin: 20px; background: #f0f8ff; }}
-                .analytics-card {{ background: white; padding: 25px; margin: 20px 0; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.1); }}
-                .metrics-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; margin: 20px 0; }}
-                .metric-box {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 10px; text-align: center; }}
-                .metric-value {{ font-size: 2.5em; font-weight: bold; margin: 10px 0; }}
-            </style>
-        </head>
-        <body>
-            <div class="analytics-card">
-                <h1 style="color: #2c5aa0; text-align: center;">📊 Advanced Analytics Dashboard - {clinic_name}</h1>
-                
-                <div class="metrics-grid">
-                    <div class="metric-box" style="background: linear-gradient(135deg, #28a745, #20c997);">
-                        <div class="metric-value">{total_patients}</div>
-                        <div>Total Patients</div>
-                    </div>
-                    <div class="metric-box" style="background: linear-gradient(135deg, #007bff, #6610f2);">
-                        <div class="metric-value">{total_analytics}</div>
-                        <div>Analytics Records</div>
-                    </div>
-                    <div class="metric-box" style="background: linear-gradient(135deg, #ffc107, #fd7e14);">
-                        <div class="metric-value">₹{total_revenue:,.0f}</div>
-                        <div>Total Revenue</div>
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <h2 style="color: #2c5aa0;">🚀 Advanced Features Available:</h2>
-                    <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; margin: 20px 0;">
-                        <div style="background: #e8f4fd; padding: 20px; border-radius: 8px;">
-                            <h3>📅 Appointment Analytics</h3>
-                            <p>Track booking patterns, no-shows, and optimal scheduling</p>
-                        </div>
-                        <div style="background: #d4edda; padding: 20px; border-radius: 8px;">
-                            <h3>💰 Revenue Analysis</h3>
-                            <p>Financial trends, payment modes, and billing insights</p>
-                        </div>
-                        <div style="background: #fff3cd; padding: 20px; border-radius: 8px;">
-                            <h3>👨‍⚕️ Doctor Performance</h3>
-                            <p>Treatment success rates, patient satisfaction, efficiency metrics</p>
-                        </div>
-                        <div style="background: #f8d7da; padding: 20px; border-radius: 8px;">
-                            <h3>🔄 Patient Retention</h3>
-                            <p>Churn analysis, loyalty tracking, return visit predictions</p>
-                        </div>
-                        <div style="background: #e2e3f0; padding: 20px; border-radius: 8px;">
-                            <h3>🧠 AI Insights</h3>
-                            <p>Diagnosis patterns, treatment recommendations, risk predictions</p>
-                        </div>
-                        <div style="background: #fce4ec; padding: 20px; border-radius: 8px;">
-                            <h3>📝 Feedback Analysis</h3>
-                            <p>Sentiment analysis from patient reviews and satisfaction surveys</p>
-                        </div>
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="/add_patient?clinic_id={clinic_id}" style="background: #28a745; color: white; padding: 15px 25px; text-decoration: none; border-radius: 8px; margin: 10px; font-size: 16px;">➕ Add Patient with Analytics</a>
-                    <a href="/view_patients?clinic_id={clinic_id}" style="background: #007bff; color: white; padding: 15px 25px; text-decoration: none; border-radius: 8px; margin: 10px; font-size: 16px;">👥 View Patients</a>
-                    <a href="/analytics?clinic_id={clinic_id}" style="background: #6610f2; color: white; padding: 15px 25px; text-decoration: none; border-radius: 8px; margin: 10px; font-size: 16px;">📊 Basic Analytics</a>
-                    <a href="/dashboard?clinic_id={clinic_id}" style="background: #6c757d; color: white; padding: 15px 25px; text-decoration: none; border-radius: 8px; margin: 10px; font-size: 16px;">🏠 Dashboard</a>
-                </div>
-            </div>
-        </body>
-        </html>
-        '''
-        
-    except Exception as e:
-        return f'''
-        <html>
-        <body style="font-family: Arial; margin: 40px;">
-            <div style="background: #f8d7da; padding: 20px; border-radius: 8px; border: 1px solid #f5c6cb;">
-                <h3 style="color: #721c24;">❌ Analytics Error</h3>
-                <p style="color: #721c24;">Error: {str(e)}</p>
-                <a href="/dashboard?clinic_id={clinic_id}" style="background: #dc3545; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">← Back to Dashboard</a>
-            </div>
-        </body>
-        </html>
-        '''
-
-if __name__ == "__main__":
-    init_database()
-    ngrok_tunnel_url = start_ngrok()
-    app.run(debug=True, host="0.0.0.0", port=5000)
-    clinic_id = request.args.get("clinic_id")
-    if not clinic_id:
-        return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
-    
-    try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
         
@@ -2186,61 +1638,12 @@ if __name__ == "__main__":
         """, (clinic_id,))
         appointment_stats = cursor.fetchone() or (0, 0, 0, 0, 0)
         
-        # 💰 Revenue Analysis
-        cursor.execute("""
-            SELECT 
-                SUM(final_amount) as total_revenue,
-                AVG(final_amount) as avg_transaction,
-                COUNT(*) as total_transactions,
-                SUM(CASE WHEN payment_method = 'Cash' THEN final_amount ELSE 0 END) as cash_revenue,
-                SUM(CASE WHEN payment_method = 'Card' THEN final_amount ELSE 0 END) as card_revenue,
-                SUM(CASE WHEN payment_method = 'UPI' THEN final_amount ELSE 0 END) as upi_revenue,
-                SUM(CASE WHEN payment_method = 'Insurance' THEN final_amount ELSE 0 END) as insurance_revenue
-            FROM revenue_analytics WHERE clinic_id = ?
-        """, (clinic_id,))
-        revenue_stats = cursor.fetchone() or (0, 0, 0, 0, 0, 0, 0)
-        
-        # 👨‍⚕️ Doctor Performance
-        cursor.execute("""
-            SELECT 
-                doctor_name,
-                patients_treated,
-                success_rate,
-                patient_satisfaction,
-                revenue_generated,
-                efficiency_score
-            FROM doctor_performance 
-            WHERE clinic_id = ? 
-            ORDER BY efficiency_score DESC
-        """, (clinic_id,))
-        doctor_performance = cursor.fetchall()
-        
-        # 🔄 Patient Retention Analysis
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_patients,
-                COUNT(CASE WHEN total_visits > 1 THEN 1 END) as returning_patients,
-                AVG(total_visits) as avg_visits_per_patient,
-                AVG(total_spent) as avg_spent_per_patient
-            FROM patients WHERE clinic_id = ?
-        """, (clinic_id,))
-        retention_stats = cursor.fetchone() or (0, 0, 0, 0)
+        # 💰 Revenue Analysis (from the monthly revenue rollup)
+        revenue_stats = rollups.revenue_summary(cursor, clinic_id) or (0, 0, 0, 0, 0, 0, 0)
         
-        # 🧠 AI Insights & Diagnosis Patterns
-        cursor.execute("""
-            SELECT 
-                diagnosis, 
-                COUNT(*) as frequency,
-                AVG(treatment_cost) as avg_cost,
-                AVG(treatment_success_rate) as success_rate,
-                AVG(satisfaction_rating) as satisfaction
-            FROM patient_analytics 
-            WHERE clinic_id = ? AND diagnosis IS NOT NULL AND diagnosis != ''
-            GROUP BY diagnosis
-            ORDER BY frequency DESC
-            LIMIT 10
-        """, (clinic_id,))
-        diagnosis_patterns = cursor.fetchall()
+        # 🔄 Patient Retention + 🧠 Diagnosis Patterns (one pass over patients and one over patient_analytics)
+        summary = analytics_summary.clinic_summary(cursor, clinic_id, extended=True)
+        diagnosis_patterns = summary.diagnoses
         
         # 📝 Feedback Analysis
         cursor.execute("""
@@ -2264,7 +1667,7 @@ if __name__ == "__main__":
         active_alerts = cursor.fetchall()
         
         # Calculate retention rate
-        retention_rate = (retention_stats[1] / retention_stats[0] * 100) if retention_stats[0] > 0 else 0
+        retention_rate = summary.retention_rate
         
         # Calculate appointment efficiency
         appointment_efficiency = (appointment_stats[1] / appointment_stats[0] * 100) if appointment_stats[0] > 0 else 0
@@ -2277,11 +1680,11 @@ if __name__ == "__main__":
                 <div style="background: #f8f9fa; padding: 15px; margin: 10px 0; border-radius: 8px; border-left: 4px solid #007bff;">
                     <div style="display: flex; justify-content: space-between; align-items: center;">
                         <div>
-                            <h4 style="margin: 0; color: #2c5aa0;">{diag[0]}</h4>
-                            <p style="margin: 5px 0; color: #6c757d;">Frequency: {diag[1]} cases | Success Rate: {diag[3]:.1f}%</p>
+                            <h4 style="margin: 0; color: #2c5aa0;">{diag.diagnosis}</h4>
+                            <p style="margin: 5px 0; color: #6c757d;">Frequency: {diag.frequency} cases | Success Rate: {diag.success_rate:.1f}%</p>
                         </div>
                         <div style="text-align: right;">
-                            <p style="margin: 0; font-size: 1.2em; color: #28a745;">₹{diag[2]:,.0f}</p>
+                            <p style="margin: 0; font-size: 1.2em; color: #28a745;">₹{diag.avg_cost:,.0f}</p>
                             <small style="color: #6c757d;">Avg Cost</small>
                         </div>
                     </div>
@@ -2308,7 +1711,6 @@ if __name__ == "__main__":
         else:
             alerts_html = '<p style="text-align: center; color: #28a745; padding: 20px;">✅ No active alerts - Everything looks good!</p>'
         
-        conn.close()
         
         return f'''
         <html>
@@ -2407,7 +1809,7 @@ if __name__ == "__main__":
                 <!-- Key Performance Indicators -->
                 <div class="metrics-grid">
                     <div class="metric-box" style="background: linear-gradient(135deg, #28a745, #20c997);">
-                        <div class="metric-value">{retention_stats[0]}</div>
+                        <div class="metric-value">{summary.total_patients}</div>
                         <div class="metric-label">Total Patients</div>
                     </div>
                     <div class="metric-box" style="background: linear-gradient(135deg, #007bff, #6610f2);">
@@ -2551,150 +1953,70 @@ if __name__ == "__main__":
         </html>
         '''
 
-@app.route("/generate_report")
+# report_queries reports this app's report page can download
+DOWNLOADABLE_REPORTS = ("comprehensive", "financial")
+
+@reports_bp.route("/generate_report")
 def generate_report():
     clinic_id = request.args.get("clinic_id")
     report_type = request.args.get("type", "comprehensive")
+    # html (default) or a download: csv, xlsx, jsonl
+    export_format = request.args.get("format", "html")
     
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
         
         clinic_name = clinic_info[0]
         
+        if export_format != "html" and export_format not in report_export.FORMATS:
+            return f"<h3>❌ Error: Unknown export format '{export_format}'</h3><a href='/advanced_analytics?clinic_id={clinic_id}'>← Back to Analytics</a>"
+        
+        download_name = report_export.filename(clinic_name, report_type, export_format) if export_format != "html" else None
+        # Large downloads are written by a job worker; the page polls until the file is ready
+        if export_format != "html" and request.args.get("background") and report_type in DOWNLOADABLE_REPORTS:
+            job = job_queue.submit_export(DATABASE, report_type, clinic_id, export_format, download_name)
+            return job_queue.pending_page(job, f"Preparing {report_type.title()} Report",
+                                          f"/generate_report?clinic_id={clinic_id}&type={report_type}")
+        
         # Generate different types of reports
         if report_type == "comprehensive":
             # Comprehensive report with all analytics
-            cursor.execute("""
-                SELECT 
-                    p.patient_code, p.name, p.age, p.sex, p.treatment,
-                    pa.visit_date, pa.diagnosis, pa.treatment_cost,
-                    pa.satisfaction_rating, pa.doctor_assigned
-                FROM patients p
-                LEFT JOIN patient_analytics pa ON p.id = pa.patient_id
-                WHERE p.clinic_id = ?
-                ORDER BY p.created_at DESC
-            """, (clinic_id,))
-            report_data = cursor.fetchall()
-            
-            report_html = f'''
-            <html>
-            <head>
-                <title>Comprehensive Report - {clinic_name}</title>
-                <style>
-                    body {{ font-family: Arial; margin: 20px; }}
-                    .report-header {{ text-align: center; background: #f8f9fa; padding: 20px; border-radius: 8px; }}
-                    .report-table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                    .report-table th, .report-table td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-                    .report-table th {{ background: #007bff; color: white; }}
-                    .print-btn {{ background: #28a745; color: white; padding: 10px 20px; border: none; border-radius: 5px; margin: 10px; cursor: pointer; }}
-                    @media print {{ .no-print {{ display: none; }} }}
-                </style>
-            </head>
-            <body>
-                <div class="report-header">
-                    <h1>📊 Comprehensive Analytics Report</h1>
-                    <h2>{clinic_name}</h2>
-                    <p>Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-                </div>
-                
-                <div class="no-print" style="text-align: center; margin: 20px 0;">
-                    <button class="print-btn" onclick="window.print()">🖨️ Print Report</button>
-                    <button class="print-btn" onclick="exportToCSV()" style="background: #007bff;">📊 Export CSV</button>
-                    <a href="/advanced_analytics?clinic_id={clinic_id}" class="print-btn" style="text-decoration: none; background: #6c757d;">← Back to Analytics</a>
-                </div>
-                
-                <table class="report-table">
-                    <thead>
-                        <tr>
-                            <th>Patient ID</th>
-                            <th>Name</th>
-                            <th>Age</th>
-                            <th>Gender</th>
-                            <th>Treatment</th>
-                            <th>Visit Date</th>
-                            <th>Diagnosis</th>
-                            <th>Cost (₹)</th>
-                            <th>Rating</th>
-                            <th>Doctor</th>
-                        </tr>
-                    </thead>
-                    <tbody>'''
-        
-        # Add table rows
-        for row in report_data:
-            report_html += f'''
-                        <tr>
-                            <td>{row[0] or ""}</td>
-                            <td>{row[1] or ""}</td>
-                            <td>{row[2] or ""}</td>
-                            <td>{row[3] or ""}</td>
-                            <td>{row[4] or ""}</td>
-                            <td>{row[5] or ""}</td>
-                            <td>{row[6] or ""}</td>
-                            <td>{row[7] or ""}</td>
-                            <td>{row[8] or ""}</td>
-                            <td>{row[9] or ""}</td>
-                        </tr>'''
-        
-        report_html += '''
-                    </tbody>
-                </table>
-                
-                <script>
-                    function exportToCSV() {{
-                        const table = document.querySelector('.report-table');
-                        let csv = '';
-                        for (let row of table.rows) {{
-                            const cols = Array.from(row.cells).map(cell => cell.textContent);
-                            csv += cols.join(',') + '\\n';
-                        }}
-                        const blob = new Blob([csv], {{ type: 'text/csv' }});
-                        const url = window.URL.createObjectURL(blob);
-                        const a = document.createElement('a');
-                        a.href = url;
-                        a.download = '{clinic_name}_comprehensive_report.csv';
-                        a.click();
-                    }}
-                </script>
-            </body>
-            </html>
-            '''
-            
-            conn.close()
-            return report_html
+            report_queries.execute(cursor, "comprehensive", clinic_id)
+            columns = report_queries.REPORTS["comprehensive"].columns
+            if export_format != "html":
+                return report_export.export_response(cursor, columns, export_format, download_name)
+            # Rows are rendered and sent a batch at a time as the cursor steps through them
+            row_batches = templating.render_batches("clinic/_comprehensive_report_rows.html", report_export.iter_batches(cursor))
+            return templating.stream("clinic/comprehensive_report.html", clinic_id=clinic_id, clinic_name=clinic_name,
+                                     columns=columns, generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                     row_batches=row_batches)
             
         elif report_type == "financial":
             # Financial report
-            cursor.execute("""
-                SELECT 
-                    transaction_date, service_type, final_amount, 
-                    payment_method, payment_status
-                FROM revenue_analytics
-                WHERE clinic_id = ?
-                ORDER BY transaction_date DESC
-            """, (clinic_id,))
-            financial_data = cursor.fetchall()
+            if export_format != "html":
+                report_queries.execute(cursor, "financial", clinic_id)
+                return report_export.export_response(cursor, report_queries.REPORTS["financial"].columns,
+                                                     export_format, download_name)
+            # The page shows totals only; the revenue rollup has them without reading the transactions
+            total_revenue, _, total_transactions = rollups.revenue_summary(cursor, clinic_id)[:3]
             
-            total_revenue = sum(row[2] for row in financial_data)
-            
-            conn.close()
             return f'''
             <html>
             <head><title>Financial Report - {clinic_name}</title></head>
             <body style="font-family: Arial; margin: 20px;">
                 <h1>💰 Financial Report - {clinic_name}</h1>
                 <p><strong>Total Revenue:</strong> ₹{total_revenue:,.2f}</p>
-                <p><strong>Total Transactions:</strong> {len(financial_data)}</p>
+                <p><strong>Total Transactions:</strong> {total_transactions}</p>
+                <p><a href="/generate_report?clinic_id={clinic_id}&type=financial&format=csv&background=1">📊 Download CSV</a> | <a href="/generate_report?clinic_id={clinic_id}&type=financial&format=xlsx&background=1">📗 Download Excel</a></p>
                 <!-- Add detailed financial breakdown here -->
                 <a href="/advanced_analytics?clinic_id={clinic_id}">← Back to Analytics</a>
             </body>
@@ -2702,15 +2024,115 @@ def generate_report():
             '''
         
         else:
-            conn.close()
             return f"<h3>Report type '{report_type}' is under development.</h3><a href='/advanced_analytics?clinic_id={clinic_id}'>← Back to Analytics</a>"
         
     except Exception as e:
         return f"<h3>❌ Error generating report: {str(e)}</h3><a href='/advanced_analytics?clinic_id={clinic_id}'>← Back to Analytics</a>"
 
+@reports_bp.route("/schedule_reports", methods=["GET", "POST"])
+def schedule_reports():
+    clinic_id = request.args.get("clinic_id")
+    if not clinic_id:
+        return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
+    
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
+        if not clinic_info:
+            return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
+        
+        if request.method == "POST":
+            report_type = request.form.get("report_type", "comprehensive")
+            frequency = request.form.get("schedule_frequency", "weekly")
+            if report_type not in report_scheduler.SOURCES or frequency not in report_scheduler.FREQUENCIES:
+                return f"<h3>❌ Error: Unsupported report type or frequency</h3><a href='/schedule_reports?clinic_id={clinic_id}'>← Back</a>"
+            # Only keep the columns and filters this report type's table actually has
+            available = {key for key, _ in report_scheduler.SOURCES[report_type][2]}
+            columns = [key for key in request.form.getlist("columns") if key in available]
+            filters = {key: request.form[key] for key in ("treatment", "doctor_assigned", "payment_status")
+                       if key in available and request.form.get(key)}
+            if request.form.get("window_days"):
+                filters["window_days"] = int(request.form["window_days"])
+            # The scheduler process picks it up in its next off-peak window
+            cursor.execute("""
+                INSERT INTO custom_reports (clinic_id, report_name, report_type, filters, columns, created_by,
+                                            is_scheduled, schedule_frequency)
+                VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+            """, (clinic_id, request.form.get("report_name") or f"{report_type.title()} ({frequency})", report_type,
+                  json.dumps(filters), json.dumps(columns) if columns else None, clinic_info.name, frequency))
+            conn.commit()
+            return redirect(f"/schedule_reports?clinic_id={clinic_id}")
+        
+        report_rows = ""
+        for report_id, name, report_type, is_scheduled, frequency, last_generated, row_count, scan_ms, batch_reports, error in report_scheduler.latest_runs(cursor, clinic_id):
+            if error:
+                status = f"❌ {error}"
+            elif last_generated and os.path.exists(report_scheduler.output_path(report_id)):
+                status = f"<a href='/schedule_reports/{report_id}?clinic_id={clinic_id}'>⬇️ Open</a> ({row_count} rows, {scan_ms:.0f} ms scan shared by {batch_reports})"
+            else:
+                status = "⏳ Waiting for the next off-peak run"
+            report_rows += f'''
+                <tr>
+                    <td>{name}</td>
+                    <td>{report_type}</td>
+                    <td>{frequency if is_scheduled else "Not scheduled"}</td>
+                    <td>{last_generated or "Never"}</td>
+                    <td>{status}</td>
+                </tr>'''
+        
+        column_boxes = "".join(
+            f'<label style="margin-right: 12px;"><input type="checkbox" name="columns" value="{key}"> {label}</label>'
+            for key, label in report_scheduler.SOURCES["comprehensive"][2])
+        
+        return f'''
+        <html>
+        <head><title>Scheduled Reports - {clinic_info.name}</title></head>
+        <body style="font-family: Arial; margin: 20px; background: #f8f9fa;">
+            <div style="background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">
+                <h2 style="color: #2c5aa0;">⏰ Scheduled Reports - {clinic_info.name}</h2>
+                <p style="color: #666;">Reports are generated off-peak ({report_scheduler.OFF_PEAK_HOURS}h) and open instantly from the last run.</p>
+                <table style="width: 100%; border-collapse: collapse;" border="1" cellpadding="8">
+                    <thead><tr style="background: #007bff; color: white;"><th>Report</th><th>Type</th><th>Frequency</th><th>Last Generated</th><th>Latest Output</th></tr></thead>
+                    <tbody>{report_rows or "<tr><td colspan='5' style='text-align: center; color: #666;'>No scheduled reports yet.</td></tr>"}</tbody>
+                </table>
+                
+                <h3 style="color: #2c5aa0; margin-top: 30px;">➕ Schedule a Report</h3>
+                <form method="POST" style="line-height: 2.2;">
+                    Name: <input name="report_name" placeholder="Weekly visits"><br>
+                    Type: <select name="report_type"><option value="comprehensive">Comprehensive</option><option value="financial">Financial</option></select>
+                    Frequency: <select name="schedule_frequency"><option>daily</option><option selected>weekly</option><option>monthly</option></select>
+                    Data window (days, 0 = all history): <input name="window_days" type="number" min="0" style="width: 70px;"><br>
+                    Only treatment: <input name="treatment"> Only doctor: <input name="doctor_assigned"> Only payment status: <input name="payment_status"><br>
+                    Columns (comprehensive; none = all): {column_boxes}<br>
+                    <button type="submit" style="background: #28a745; color: white; padding: 10px 20px; border: none; border-radius: 5px;">⏰ Schedule</button>
+                </form>
+                <p style="margin-top: 20px;"><a href="/advanced_analytics?clinic_id={clinic_id}">← Back to Analytics</a></p>
+            </div>
+        </body>
+        </html>
+        '''
+    except Exception as e:
+        return f"<h3>❌ Error: {str(e)}</h3><a href='/advanced_analytics?clinic_id={clinic_id}'>← Back to Analytics</a>"
+
+@reports_bp.route("/schedule_reports/<int:report_id>")
+def scheduled_report_output(report_id):
+    clinic_id = request.args.get("clinic_id")
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT report_name FROM custom_reports WHERE id = ? AND clinic_id = ?", (report_id, clinic_id))
+    report = cursor.fetchone()
+    path = report_scheduler.output_path(report_id)
+    if not report or not os.path.exists(path):
+        return f"<h3>❌ Error: This report has not been generated yet.</h3><a href='/schedule_reports?clinic_id={clinic_id}'>← Back</a>", 404
+    return send_file(path, mimetype="text/csv", as_attachment=True,
+                     download_name=report_export.filename(report[0], "scheduled", "csv"))
+
 if __name__ == "__main__":
     print("🦷 Initializing Ultra Simple Dental Clinic App...")
     init_db()
     print("🚀 Starting server on http://127.0.0.1:5000")
     print("✅ Registration system is now error-free!")
+    app = create_app()
     app.run(host="127.0.0.1", port=5000, debug=True)
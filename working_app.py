@@ -1,16 +1,58 @@
-from flask import Flask, request, redirect, url_for, session, render_template_string
+from flask import Blueprint, Flask, request, redirect, url_for, session, render_template_string
 import sqlite3
 import os
 from datetime import datetime, timedelta
 import secrets
 import json
-
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
+import db_pool
+import addresses
+import schema_indexes
+import patient_search
+import patient_suggest
+import page_cache
+import clinic_cache
+import templating
+import report_export
+import report_queries
+import job_queue
+import pagination
+import analytics_summary
+import sql_metrics
+import metrics
+from db_pool import get_db
+from factory import register_features
 
 # Database configuration
 DATABASE = "dental_clinic.db"
 
+# Feature blueprints; create_app() registers the ones a deployment serves
+auth_bp = Blueprint("auth", __name__)
+patients_bp = Blueprint("patients", __name__)
+analytics_bp = Blueprint("analytics", __name__)
+reports_bp = Blueprint("reports", __name__)
+FEATURES = {"auth": auth_bp, "patients": patients_bp, "analytics": analytics_bp, "reports": reports_bp}
+
+def create_app(features=None):
+    """The clinic app over dental_clinic.db with the named FEATURES, all of them by default"""
+    app = Flask(__name__)
+    app.secret_key = secrets.token_hex(16)
+    db_pool.init_app(app, DATABASE)
+    sql_metrics.init_app(app)
+    patient_suggest.init_app(app)
+    page_cache.init_app(app)
+    clinic_cache.init_app(app)
+    templating.init_app(app)
+    job_queue.init_app(app)
+    metrics.init_app(app, queue_stats=job_queue.stats)
+    return register_features(app, FEATURES, features)
+
+def __getattr__(name):
+    # `gunicorn working_app:app` and other module.app users get every feature, built on first access
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def init_database():
     """Initialize the database with all necessary tables"""
     conn = sqlite3.connect(DATABASE)
@@ -135,10 +177,22 @@ def init_database():
         FOREIGN KEY (clinic_id) REFERENCES clinics (id)
     )''')
     
+    # Parsed village/city/state columns and their location rollup, backfilled once on older databases
+    addresses.migrate(conn)
+    
+    # Composite indexes for the clinic_id-filtered query shapes
+    schema_indexes.ensure_indexes(cursor)
+    
+    # Full-text patient search index, maintained by triggers on patients
+    patient_search.ensure_schema(cursor)
+    
+    # Page cache generations, shared by every worker through this database
+    page_cache.ensure_schema(cursor)
+    
     conn.commit()
     conn.close()
 
-@app.route("/")
+@auth_bp.route("/")
 def home():
     return '''
     <html>
@@ -187,7 +241,7 @@ def home():
     </html>
     '''
 
-@app.route("/register", methods=["GET", "POST"])
+@auth_bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
         name = request.form["name"]
@@ -197,12 +251,12 @@ def register():
         address = request.form.get("address", "")
         
         try:
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute("INSERT INTO clinics (name, email, password, phone, address) VALUES (?, ?, ?, ?, ?)",
                          (name, email, password, phone, address))
             conn.commit()
-            conn.close()
+            clinic_cache.invalidate(cursor.lastrowid)
             return redirect("/")
         except sqlite3.IntegrityError:
             return "<h3>❌ Error: Email already exists!</h3><a href='/register'>← Try Again</a>"
@@ -257,17 +311,16 @@ def register():
     </html>
     '''
 
-@app.route("/login", methods=["POST"])
+@auth_bp.route("/login", methods=["POST"])
 def login():
     email = request.form["email"]
     password = request.form["password"]
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute("SELECT id, name FROM clinics WHERE email = ? AND password = ?", (email, password))
         clinic = cursor.fetchone()
-        conn.close()
         
         if clinic:
             session["clinic_id"] = clinic[0]
@@ -278,19 +331,19 @@ def login():
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/'>← Try Again</a>"
 
-@app.route("/dashboard")
+@auth_bp.route("/dashboard")
+@page_cache.cached("dashboard")
 def dashboard():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return redirect("/")
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
         
@@ -304,7 +357,6 @@ def dashboard():
         cursor.execute("SELECT name, treatment, created_at FROM patients WHERE clinic_id = ? ORDER BY created_at DESC LIMIT 5", (clinic_id,))
         recent_patients = cursor.fetchall()
         
-        conn.close()
         
         recent_patients_html = ""
         for patient in recent_patients:
@@ -371,7 +423,7 @@ def dashboard():
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/'>← Back to Home</a>"
 
-@app.route("/add_patient", methods=["GET", "POST"])
+@patients_bp.route("/add_patient", methods=["GET", "POST"])
 def add_patient():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
@@ -404,17 +456,19 @@ def add_patient():
             last_cleaning_date = request.form.get("last_cleaning_date", "")
             preferred_appointment_time = request.form.get("preferred_appointment_time", "")
             
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute("""INSERT INTO patients (
                 clinic_id, patient_code, name, age, sex, phone, treatment,
-                dob, email, address, emergency_contact_name, emergency_contact_phone,
+                dob, email, address, address_village, address_city, address_state,
+                emergency_contact_name, emergency_contact_phone,
                 medical_history, current_medications, allergies, insurance_provider,
                 insurance_number, previous_dental_work, chief_complaint, pain_level,
                 last_cleaning_date, preferred_appointment_time
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                          (clinic_id, patient_code, name, age, sex, phone, treatment,
-                          dob, email, address, emergency_contact_name, emergency_contact_phone,
+                          dob, email, address, *addresses.parse(address),
+                          emergency_contact_name, emergency_contact_phone,
                           medical_history, current_medications, allergies, insurance_provider,
                           insurance_number, previous_dental_work, chief_complaint, pain_level,
                           last_cleaning_date, preferred_appointment_time))
@@ -431,8 +485,9 @@ def add_patient():
                              (clinic_id, patient_id, datetime.now().strftime('%Y-%m-%d'),
                               treatment, float(treatment_cost), 5, "Dr. Smith"))
             
+            page_cache.invalidate(cursor, clinic_id)
             conn.commit()
-            conn.close()
+            patient_suggest.refresh_patient(cursor, clinic_id, patient_code)
             
             return redirect(f"/view_patients?clinic_id={clinic_id}")
         except Exception as e:
@@ -617,88 +672,24 @@ def add_patient():
     </html>
     '''
 
-@app.route("/view_patients")
+@patients_bp.route("/view_patients")
 def view_patients():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return redirect("/")
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? ORDER BY created_at DESC", (clinic_id,))
-        patients = cursor.fetchall()
-        conn.close()
-        
-        patients_html = ""
-        for patient in patients:
-            patients_html += f'''
-            <tr>
-                <td>{patient[0]}</td>
-                <td>{patient[1]}</td>
-                <td>{patient[2] or 'N/A'}</td>
-                <td>{patient[3] or 'N/A'}</td>
-                <td>{patient[4] or 'N/A'}</td>
-                <td>{patient[5] or 'N/A'}</td>
-                <td>{patient[6][:10]}</td>
-                <td>
-                    <a href="/edit_patient?clinic_id={clinic_id}&patient_code={patient[0]}" class="btn-edit">✏️ Edit</a>
-                    <a href="/view_patient_detail?clinic_id={clinic_id}&patient_code={patient[0]}" class="btn-view">👁️ View</a>
-                </td>
-            </tr>
-            '''
-        
-        return f'''
-        <html>
-        <head>
-            <title>All Patients</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; background: #f8f9fa; }}
-                .container {{ background: white; padding: 30px; border-radius: 15px; box-shadow: 0 10px 30px rgba(0,0,0,0.1); }}
-                .table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                .table th, .table td {{ border: 1px solid #dee2e6; padding: 12px; text-align: left; }}
-                .table th {{ background: #007bff; color: white; }}
-                .table tr:nth-child(even) {{ background: #f8f9fa; }}
-                .btn {{ padding: 10px 20px; background: #007bff; color: white; text-decoration: none; border-radius: 5px; margin: 10px; display: inline-block; }}
-                .btn:hover {{ background: #0056b3; }}
-                .btn-edit {{ padding: 5px 10px; background: #28a745; color: white; text-decoration: none; border-radius: 3px; margin: 2px; display: inline-block; font-size: 12px; }}
-                .btn-edit:hover {{ background: #218838; }}
-                .btn-view {{ padding: 5px 10px; background: #17a2b8; color: white; text-decoration: none; border-radius: 3px; margin: 2px; display: inline-block; font-size: 12px; }}
-                .btn-view:hover {{ background: #138496; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h2>👥 All Patients</h2>
-                <table class="table">
-                    <thead>
-                        <tr>
-                            <th>Patient Code</th>
-                            <th>Name</th>
-                            <th>Age</th>
-                            <th>Gender</th>
-                            <th>Phone</th>
-                            <th>Treatment</th>
-                            <th>Added Date</th>
-                            <th>Actions</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {patients_html if patients_html else "<tr><td colspan='8' style='text-align: center; color: #666;'>No patients found. <a href='/add_patient?clinic_id=" + clinic_id + "'>Add your first patient!</a></td></tr>"}
-                    </tbody>
-                </table>
-                <div style="text-align: center; margin-top: 20px;">
-                    <a href="/add_patient?clinic_id={clinic_id}" class="btn">➕ Add New Patient</a>
-                    <a href="/dashboard?clinic_id={clinic_id}" class="btn">🏠 Back to Dashboard</a>
-                </div>
-            </div>
-        </body>
-        </html>
-        '''
+        # Rows stream from the cursor in batches instead of piling up in one list
+        batches = iter(lambda: cursor.fetchmany(pagination.STREAM_CHUNK_SIZE), [])
+        row_batches = templating.render_batches("clinic/_all_patient_rows.html", batches, clinic_id=clinic_id)
+        return templating.stream("clinic/all_patients.html", clinic_id=clinic_id, row_batches=row_batches)
     except Exception as e:
         return f"<h3>❌ Error: {str(e)}</h3><a href='/dashboard?clinic_id={clinic_id}'>← Back to Dashboard</a>"
 
-@app.route("/search_patients", methods=["GET", "POST"])
+@patients_bp.route("/search_patients", methods=["GET", "POST"])
 def search_patients():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
@@ -710,27 +701,15 @@ def search_patients():
     
     if request.method == "POST":
         search_query = request.form.get("search_query", "")
-        search_type = request.form.get("search_type", "name")
+        search_type = request.form.get("search_type", "all")
+        search_limit = patient_search.clamp_limit(request.form.get("limit", patient_search.DEFAULT_LIMIT))
         
         try:
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             
-            if search_type == "name":
-                cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? AND name LIKE ? ORDER BY created_at DESC", 
-                             (clinic_id, f"%{search_query}%"))
-            elif search_type == "phone":
-                cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? AND phone LIKE ? ORDER BY created_at DESC", 
-                             (clinic_id, f"%{search_query}%"))
-            elif search_type == "patient_code":
-                cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? AND patient_code LIKE ? ORDER BY created_at DESC", 
-                             (clinic_id, f"%{search_query}%"))
-            elif search_type == "treatment":
-                cursor.execute("SELECT patient_code, name, age, sex, phone, treatment, created_at FROM patients WHERE clinic_id = ? AND treatment LIKE ? ORDER BY created_at DESC", 
-                             (clinic_id, f"%{search_query}%"))
-            
-            patients = cursor.fetchall()
-            conn.close()
+            # Ranked FTS5 prefix search instead of leading-wildcard LIKE scans
+            patients = patient_search.search(cursor, clinic_id, search_query, search_type, search_limit)
             
             if patients:
                 for patient in patients:
@@ -751,7 +730,7 @@ def search_patients():
                     '''
                 
                 results_section = f'''
-                <h3>Search Results for "{search_query}":</h3>
+                <h3>Top {len(patients)} results for "{search_query}":</h3>
                 <table class="table">
                     <thead>
                         <tr>
@@ -815,10 +794,13 @@ def search_patients():
                     <div class="form-group">
                         <label for="search_type">Search By:</label>
                         <select id="search_type" name="search_type">
+                            <option value="all">All Fields</option>
                             <option value="name">Patient Name</option>
                             <option value="phone">Phone Number</option>
                             <option value="patient_code">Patient Code</option>
                             <option value="treatment">Treatment</option>
+                            <option value="address">Address</option>
+                            <option value="medical_history">Medical History</option>
                         </select>
                     </div>
                     <div class="form-group">
@@ -838,36 +820,30 @@ def search_patients():
     </html>
     '''
 
-@app.route("/advanced_analytics")
+@analytics_bp.route("/advanced_analytics")
+@page_cache.cached("advanced_analytics")
 def advanced_analytics():
     clinic_id = request.args.get("clinic_id")
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
         
         clinic_name = clinic_info[0]
         
-        # Get analytics data
-        cursor.execute("SELECT COUNT(*) FROM patients WHERE clinic_id = ?", (clinic_id,))
-        total_patients = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM patient_analytics WHERE clinic_id = ?", (clinic_id,))
-        total_visits = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT SUM(treatment_cost) FROM patient_analytics WHERE clinic_id = ?", (clinic_id,))
-        total_revenue = cursor.fetchone()[0] or 0
-        
-        cursor.execute("SELECT AVG(satisfaction_rating) FROM patient_analytics WHERE clinic_id = ?", (clinic_id,))
-        avg_satisfaction = cursor.fetchone()[0] or 0
+        # Get analytics data (one pass over patients and one over patient_analytics)
+        summary = analytics_summary.clinic_summary(cursor, clinic_id)
+        total_patients = summary.total_patients
+        total_visits = summary.total_visits
+        total_revenue = summary.total_revenue
+        avg_satisfaction = summary.avg_satisfaction
         
         # Get recent analytics
         cursor.execute("""
@@ -879,7 +855,6 @@ def advanced_analytics():
         """, (clinic_id,))
         recent_analytics = cursor.fetchall()
         
-        conn.close()
         
         recent_html = ""
         for item in recent_analytics:
@@ -981,104 +956,45 @@ def advanced_analytics():
         </html>
         '''
 
-@app.route("/generate_report")
+@reports_bp.route("/generate_report")
 def generate_report():
     clinic_id = request.args.get("clinic_id")
+    # html (default) or a download: csv, xlsx, jsonl
+    export_format = request.args.get("format", "html")
     if not clinic_id:
         return "<h3>❌ Error: Invalid clinic access!</h3><a href='/'>← Back to Home</a>"
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get clinic info
-        cursor.execute("SELECT name FROM clinics WHERE id = ?", (clinic_id,))
-        clinic_info = cursor.fetchone()
+        clinic_info = clinic_cache.get_clinic(cursor, clinic_id)
         if not clinic_info:
             return "<h3>❌ Error: Clinic not found!</h3><a href='/'>← Back to Home</a>"
         
         clinic_name = clinic_info[0]
         
-        # Get comprehensive report data
-        cursor.execute("""
-            SELECT p.patient_code, p.name, p.age, p.sex, p.treatment,
-                   pa.visit_date, pa.diagnosis, pa.treatment_cost, pa.satisfaction_rating
-            FROM patients p
-            LEFT JOIN patient_analytics pa ON p.id = pa.patient_id
-            WHERE p.clinic_id = ?
-            ORDER BY p.created_at DESC
-        """, (clinic_id,))
-        report_data = cursor.fetchall()
-        
-        conn.close()
-        
-        report_rows = ""
-        for row in report_data:
-            report_rows += f'''
-            <tr>
-                <td>{row[0]}</td>
-                <td>{row[1]}</td>
-                <td>{row[2] or 'N/A'}</td>
-                <td>{row[3] or 'N/A'}</td>
-                <td>{row[4] or 'N/A'}</td>
-                <td>{row[5] or 'N/A'}</td>
-                <td>{row[6] or 'N/A'}</td>
-                <td>₹{row[7] or 0:.2f}</td>
-                <td>{'⭐' * int(row[8] or 0)}</td>
-            </tr>
-            '''
+        if export_format != "html" and export_format not in report_export.FORMATS:
+            return f"<h3>❌ Error: Unknown export format '{export_format}'</h3><a href='/dashboard?clinic_id={clinic_id}'>← Back to Dashboard</a>"
         
-        return f'''
-        <html>
-        <head>
-            <title>Comprehensive Report - {clinic_name}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                .header {{ text-align: center; background: #f8f9fa; padding: 20px; border-radius: 8px; margin-bottom: 20px; }}
-                .table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-                .table th, .table td {{ border: 1px solid #ddd; padding: 8px; text-align: left; font-size: 12px; }}
-                .table th {{ background: #007bff; color: white; }}
-                .btn {{ padding: 10px 20px; margin: 10px; background: #28a745; color: white; border: none; border-radius: 5px; cursor: pointer; text-decoration: none; display: inline-block; }}
-                .btn:hover {{ background: #218838; }}
-                .btn-back {{ background: #6c757d; }}
-                .btn-back:hover {{ background: #545b62; }}
-                @media print {{ .no-print {{ display: none; }} }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>📄 Comprehensive Report</h1>
-                <h2>{clinic_name}</h2>
-                <p>Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-            </div>
-            
-            <table class="table">
-                <thead>
-                    <tr>
-                        <th>Patient Code</th>
-                        <th>Name</th>
-                        <th>Age</th>
-                        <th>Gender</th>
-                        <th>Treatment</th>
-                        <th>Visit Date</th>
-                        <th>Diagnosis</th>
-                        <th>Cost</th>
-                        <th>Rating</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {report_rows if report_rows else "<tr><td colspan='9' style='text-align: center; color: #666;'>No data available for report.</td></tr>"}
-                </tbody>
-            </table>
-            
-            <div class="no-print" style="text-align: center; margin-top: 30px;">
-                <button onclick="window.print()" class="btn">🖨️ Print Report</button>
-                <a href="/advanced_analytics?clinic_id={clinic_id}" class="btn btn-back">← Back to Analytics</a>
-            </div>
-        </body>
-        '''
+        # Get comprehensive report data
+        download_name = report_export.filename(clinic_name, "comprehensive", export_format) if export_format != "html" else None
+        if export_format != "html" and request.args.get("background"):
+            job = job_queue.submit_export(DATABASE, "visits", clinic_id, export_format, download_name)
+            return job_queue.pending_page(job, "Preparing Comprehensive Report", f"/generate_report?clinic_id={clinic_id}")
+        report_queries.execute(cursor, "visits", clinic_id)
+        if export_format != "html":
+            return report_export.export_response(cursor, report_queries.REPORTS["visits"].columns, export_format, download_name)
+        # Rows are rendered and sent a batch at a time as the cursor steps through them
+        row_batches = templating.render_batches("clinic/_visits_report_rows.html", report_export.iter_batches(cursor))
+        return templating.stream("clinic/visits_report.html", clinic_id=clinic_id, clinic_name=clinic_name,
+                                 columns=report_queries.REPORTS["visits"].columns,
+                                 generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), row_batches=row_batches)
+    except Exception as e:
+        return f"<h3>❌ Error generating report: {str(e)}</h3><a href='/advanced_analytics?clinic_id={clinic_id}'>← Back to Analytics</a>"
 
-@app.route("/edit_patient", methods=["GET", "POST"])
+@patients_bp.route("/edit_patient", methods=["GET", "POST"])
 def edit_patient():
     clinic_id = request.args.get("clinic_id")
     patient_code = request.args.get("patient_code")
@@ -1110,22 +1026,24 @@ def edit_patient():
             last_cleaning_date = request.form.get("last_cleaning_date", "")
             preferred_appointment_time = request.form.get("preferred_appointment_time", "")
             
-            conn = sqlite3.connect(DATABASE)
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute("""UPDATE patients SET 
                 name=?, age=?, sex=?, phone=?, treatment=?, dob=?, email=?, address=?,
+                address_village=?, address_city=?, address_state=?,
                 emergency_contact_name=?, emergency_contact_phone=?, medical_history=?,
                 current_medications=?, allergies=?, insurance_provider=?, insurance_number=?,
                 previous_dental_work=?, chief_complaint=?, pain_level=?, last_cleaning_date=?,
                 preferred_appointment_time=?
                 WHERE clinic_id=? AND patient_code=?""",
-                         (name, age, sex, phone, treatment, dob, email, address,
+                         (name, age, sex, phone, treatment, dob, email, address, *addresses.parse(address),
                           emergency_contact_name, emergency_contact_phone, medical_history,
                           current_medications, allergies, insurance_provider, insurance_number,
                           previous_dental_work, chief_complaint, pain_level, last_cleaning_date,
                           preferred_appointment_time, clinic_id, patient_code))
+            page_cache.invalidate(cursor, clinic_id)
             conn.commit()
-            conn.close()
+            patient_suggest.refresh_patient(cursor, clinic_id, patient_code)
             
             return f'''
             <html>
@@ -1145,11 +1063,10 @@ def edit_patient():
     
     # GET request - show edit form
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM patients WHERE clinic_id = ? AND patient_code = ?", (clinic_id, patient_code))
         patient = cursor.fetchone()
-        conn.close()
         
         if not patient:
             return f"<h3>❌ Patient not found!</h3><a href='/view_patients?clinic_id={clinic_id}'>← Back to Patients</a>"
@@ -1245,7 +1162,7 @@ def edit_patient():
     except Exception as e:
         return f"<h3>❌ Error loading patient: {str(e)}</h3><a href='/view_patients?clinic_id={clinic_id}'>← Back to Patients</a>"
 
-@app.route("/view_patient_detail")
+@patients_bp.route("/view_patient_detail")
 def view_patient_detail():
     clinic_id = request.args.get("clinic_id")
     patient_code = request.args.get("patient_code")
@@ -1254,7 +1171,7 @@ def view_patient_detail():
         return redirect("/")
     
     try:
-        conn = sqlite3.connect(DATABASE)
+        conn = get_db()
         cursor = conn.cursor()
         
         # Get patient details
@@ -1268,7 +1185,6 @@ def view_patient_detail():
         cursor.execute("SELECT * FROM patient_analytics WHERE clinic_id = ? AND patient_id = ?", (clinic_id, patient[0]))
         analytics = cursor.fetchall()
         
-        conn.close()
         
         analytics_html = ""
         if analytics:
@@ -1378,4 +1294,5 @@ if __name__ == "__main__":
     init_database()
     print("🦷 Dental Clinic Management System Starting...")
     print("🌐 Database initialized successfully!")
+    app = create_app()
     app.run(debug=True, host="0.0.0.0", port=5000)